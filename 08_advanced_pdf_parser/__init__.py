@@ -10,10 +10,39 @@ from .table_extractor import TableExtractor
 from .image_ocr import ImageOCR
 from .layout_analyzer import LayoutAnalyzer
 from .advanced_loader import AdvancedPDFLoader
+from .extraction_stats import ExtractionStatsStore
+from .ocr_cache import OCRResultCache
+from .image_preprocess import OCRPreprocessor
+from .ocr_pool import OCRWorkerPool
+from .ocr_result import OCRPageResult
+from .ocr_backends import OCRBackend, create_backend
+from .dedup import ChunkDeduplicator
+from .bm25_index import BM25Index, BM25IndexWriter
+from .result_store import ResultReader, write_result
+from .jsonl_export import ShardedJSONLWriter
+from .ingest_ledger import IngestLedger
+from .sandbox import DocumentSandbox
+from .concurrency import ConcurrencyController
 
 __all__ = [
     "TableExtractor",
     "ImageOCR", 
     "LayoutAnalyzer",
-    "AdvancedPDFLoader"
+    "AdvancedPDFLoader",
+    "ExtractionStatsStore",
+    "OCRResultCache",
+    "OCRPreprocessor",
+    "OCRWorkerPool",
+    "OCRPageResult",
+    "OCRBackend",
+    "create_backend",
+    "ChunkDeduplicator",
+    "BM25Index",
+    "BM25IndexWriter",
+    "ResultReader",
+    "write_result",
+    "ShardedJSONLWriter",
+    "IngestLedger",
+    "DocumentSandbox",
+    "ConcurrencyController"
 ]
\ No newline at end of file
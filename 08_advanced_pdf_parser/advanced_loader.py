@@ -1,28 +1,70 @@
 """
 高级 PDF 加载器
-整合表格提取、OCR 识别、版面分析，提供统一的加载接口
+整合表格提取、OCR 识别、版面分析，提供统一的加载接口（LangChain BaseLoader）
 """
 
-from typing import List, Dict, Optional
+from typing import List, Dict, Set, Tuple, Union, Iterator, AsyncIterator, Callable, Optional, Sequence
 from pathlib import Path
+import os
+import time
+import asyncio
+import tempfile
+import threading
+import contextlib
 import logging
 
+import numpy as np
+import pdfplumber
+from langchain_core.document_loaders import BaseLoader
+from langchain_core.documents import Document
+
 from table_extractor import TableExtractor
 from image_ocr import ImageOCR
-from layout_analyzer import LayoutAnalyzer
+from image_preprocess import OCRPreprocessor
+from ocr_result import to_text_results
+from layout_analyzer import LayoutAnalyzer, TextBlock
+from chunker import StructuredChunker, table_rows
+from result_store import write_result, ResultReader
+from jsonl_export import page_records
+from ingest_ledger import IngestLedger, discover_inputs
+from deadlines import StageDeadlines, abandoned_threads
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-class AdvancedPDFLoader:
+class AdvancedPDFLoader(BaseLoader):
     """高级 PDF 加载器"""
     
+    DOCUMENT_MODES = ("page", "block", "chunk")
+    
     def __init__(self, 
                  enable_table_extraction: bool = True,
                  enable_ocr: bool = True,
                  enable_layout_analysis: bool = True,
-                 ocr_lang: str = 'ch'):
+                 ocr_lang: str = 'ch',
+                 table_stats_path: Optional[str] = None,
+                 layout_backend: Optional[str] = None,
+                 ocr_batch_size: Optional[int] = None,
+                 ocr_cache_path: Optional[str] = None,
+                 ocr_target_dpi: Optional[float] = None,
+                 ocr_worker_pool=None,
+                 ocr_text_score_threshold: float = 0.0,
+                 ocr_only_uncovered: bool = True,
+                 ocr_backend: str = 'paddle',
+                 ocr_backend_kwargs: Optional[Dict] = None,
+                 ocr_mode: str = 'images',
+                 ocr_render_dpi: float = 300.0,
+                 chunk_deduplicator=None,
+                 file_path: Optional[str] = None,
+                 document_mode: str = 'page',
+                 chunk_size: int = 1000,
+                 chunk_overlap: int = 200,
+                 tokenizer: Optional[Callable[[str], Sequence]] = None,
+                 document_timeout: Optional[float] = None,
+                 stage_timeouts: Optional[Dict[str, float]] = None,
+                 sandbox=None,
+                 concurrency=None):
         """
         初始化高级加载器
         
@@ -31,27 +73,92 @@ class AdvancedPDFLoader:
             enable_ocr: 是否启用 OCR
             enable_layout_analysis: 是否启用版面分析
             ocr_lang: OCR 语言（'ch': 中文, 'en': 英文）
+            table_stats_path: 表格提取统计文件路径（启用按来源自适应选择提取方法）
+            layout_backend: 版面分析文本后端（'pymupdf' 或 'pdfplumber'）
+                   使用 'pdfplumber' 且启用表格提取时，表格查找与文本块提取共享同一次页面解析；
+                   None 表示启用表格提取时使用 'pdfplumber'（每页只解析一次），否则使用 'pymupdf'
+            ocr_batch_size: OCR 批量识别的每批文本行数量（None 表示逐张图片识别）
+            ocr_cache_path: 跨文档 OCR 结果缓存路径（按图片内容摘要复用识别结果）
+            ocr_target_dpi: OCR 前将图片归一化到的有效 DPI（同时灰度化、超大图切片），None 表示使用原图
+            ocr_worker_pool: 共享的 OCR 工作进程池（OCRWorkerPool），多个加载器可共用同一组已加载模型的进程
+            ocr_text_score_threshold: 文字可能性预筛阈值，低于该值的图片跳过 OCR（0 表示不预筛）
+            ocr_only_uncovered: 启用版面分析时，只对未被文本层覆盖的图片区域执行 OCR
+            ocr_backend: OCR 推理后端（'paddle' / 'onnx' / 'tesseract' / 'stub'）
+            ocr_backend_kwargs: 传给 OCR 后端的额外参数
+            ocr_mode: OCR 模式（'images' 识别内嵌图片，'render' 整页渲染后识别，'auto' 按页自动选择）
+            ocr_render_dpi: 整页渲染的分辨率
+            chunk_deduplicator: 分块近重复去重器（ChunkDeduplicator），可跨加载器共享同一持久索引
+            file_path: lazy_load / load() 使用的 PDF 文件路径（LangChain BaseLoader 接口，按关键字传入）
+            document_mode: lazy_load 产出 Document 的粒度（'page' 每页、'block' 每个文本块/表格、'chunk' 每个分块）
+            chunk_size: document_mode='chunk' 时的块大小
+            chunk_overlap: document_mode='chunk' 时的块重叠大小
+            tokenizer: document_mode='chunk' 时的分词函数，None 表示按字符计数
+            document_timeout: parse() 单个文档的时限（秒），None 表示不限
+            stage_timeouts: parse() 各阶段时限（秒）{'tables', 'layout', 'ocr'}，
+                   超时的阶段被放弃，返回其余阶段的结果并在 metadata['deadlines'] 中标记
+            sandbox: 隔离解析池（DocumentSandbox），指定后 parse() / batch_load / ingest 在工作子进程中解析，
+                   各模块与时限按 sandbox.loader_kwargs 在子进程中配置
+            concurrency: 自适应并发控制器（ConcurrencyController），指定后 batch_load / ingest 并发处理文档，
+                   并按控制器的当前上限限制表格与 OCR 阶段的并发数（OCR 后端不是线程安全时 OCR 阶段固定为 1）；
+                   同时指定 sandbox 时阶段在子进程中运行，阶段闸门不生效，只控制文档并发数
         """
+        if document_mode not in self.DOCUMENT_MODES:
+            raise ValueError(f"不支持的 Document 粒度: {document_mode}（可选: {list(self.DOCUMENT_MODES)}）")
+        
+        self.file_path = file_path
+        self.document_mode = document_mode
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.tokenizer = tokenizer
         self.enable_table_extraction = enable_table_extraction
         self.enable_ocr = enable_ocr
         self.enable_layout_analysis = enable_layout_analysis
+        self.ocr_batch_size = ocr_batch_size
+        self.ocr_only_uncovered = ocr_only_uncovered
+        self.ocr_mode = ocr_mode
+        self.chunk_deduplicator = chunk_deduplicator
+        self.document_timeout = document_timeout
+        self.stage_timeouts = stage_timeouts
+        self.sandbox = sandbox
+        self.concurrency = concurrency
+        self._export_lock = threading.Lock()
+        self._modules_lock = threading.Lock()  # 保护模块替换（见 _current_modules / _rebuild_abandoned）
+        StageDeadlines(document_timeout, stage_timeouts)  # 提前校验阶段名称
         
-        # 初始化各模块
+        # 初始化各模块（保留构造函数：阶段超时被放弃后重建该模块，见 _rebuild_abandoned）
+        self._module_factories: Dict[str, Callable] = {}
         if enable_table_extraction:
-            self.table_extractor = TableExtractor()
+            self._module_factories["table_extractor"] = lambda: TableExtractor(stats_path=table_stats_path)
+            self.table_extractor = self._module_factories["table_extractor"]()
             logger.info("✅ 表格提取模块已加载")
         
         if enable_ocr:
-            self.ocr = ImageOCR(lang=ocr_lang)
+            def build_ocr():
+                preprocessor = OCRPreprocessor(target_dpi=ocr_target_dpi) if ocr_target_dpi else None
+                return ImageOCR(lang=ocr_lang, cache_path=ocr_cache_path, preprocessor=preprocessor,
+                                worker_pool=ocr_worker_pool,
+                                text_score_threshold=ocr_text_score_threshold,
+                                backend=ocr_backend, backend_kwargs=ocr_backend_kwargs,
+                                render_dpi=ocr_render_dpi)
+            self._module_factories["ocr"] = build_ocr
+            self.ocr = build_ocr()
             logger.info("✅ OCR 模块已加载")
         
         if enable_layout_analysis:
-            self.layout_analyzer = LayoutAnalyzer()
+            if layout_backend is None:
+                layout_backend = 'pdfplumber' if enable_table_extraction else 'pymupdf'
+            self._module_factories["layout_analyzer"] = lambda: LayoutAnalyzer(backend=layout_backend)
+            self.layout_analyzer = self._module_factories["layout_analyzer"]()
             logger.info("✅ 版面分析模块已加载")
+        
+        # 各文档共用同一个 OCR 实例：后端不能被多个线程同时调用时，OCR 阶段逐个文档执行
+        if concurrency is not None and sandbox is None and enable_ocr and not self.ocr.thread_safe:
+            concurrency.cap_stage("ocr", 1)
+            logger.info("🎛️ OCR 后端不是线程安全的，OCR 阶段并发数固定为 1")
     
-    def load(self, pdf_path: str) -> Dict:
+    def parse(self, pdf_path: str) -> Dict:
         """
-        加载并解析 PDF 文档
+        加载并解析 PDF 文档（整篇结果字典）
         
         Args:
             pdf_path: PDF 文件路径
@@ -60,9 +167,10 @@ class AdvancedPDFLoader:
             解析结果字典，包含以下字段：
             - text: 文本内容（按阅读顺序）
             - tables: 提取的表格列表
-            - ocr_results: OCR 识别结果
+            - ocr_results: OCR 识别结果（纯文本视图 {page_num: [texts]}）
+            - ocr_pages: OCR 列式结果 {page_num: OCRPageResult}（检测框、置信度等）
             - layout: 版面分析结果
-            - metadata: 元数据
+            - metadata: 元数据（设置了时限时含 deadlines: {partial, timed_out, stage_seconds, ...}）
         """
         logger.info(f"🚀 开始加载 PDF: {pdf_path}")
         
@@ -70,10 +178,14 @@ class AdvancedPDFLoader:
             logger.error(f"❌ 文件不存在: {pdf_path}")
             return {}
         
+        if self.sandbox is not None:
+            return self.sandbox.parse(pdf_path)
+        
         result = {
             "text": "",
             "tables": [],
             "ocr_results": {},
+            "ocr_pages": {},
             "layout": {},
             "metadata": {
                 "file_path": pdf_path,
@@ -81,10 +193,45 @@ class AdvancedPDFLoader:
             }
         }
         
+        deadlines = StageDeadlines(self.document_timeout, self.stage_timeouts)
+        # 本文档使用的模块实例：其他文档的阶段超时重建模块时，本文档仍使用解析开始时取得的实例
+        modules = self._current_modules()
+        
+        # 0. 共享页面解析：pdfplumber 表格扫描的同时提取文本块
+        table_results = None
+        shared_blocks = None
+        if (self.enable_table_extraction and self.enable_layout_analysis 
+                and modules["layout_analyzer"].backend == 'pdfplumber'):
+            logger.info("📋 执行表格提取（共享页面解析）...")
+            collected_blocks = []
+            scanned_pages = set()
+            page_count = []
+            shared_analyzer = modules["layout_analyzer"]
+            
+            def collect_blocks(page):
+                if not page_count:
+                    page_count.append(len(page.pdf.pages))
+                collected_blocks.extend(shared_analyzer.extract_text_blocks_from_plumber_page(page))
+                scanned_pages.add(page.page_number)
+            
+            table_results = deadlines.run("tables", modules["table_extractor"].extract_all,
+                                          pdf_path, page_callback=collect_blocks,
+                                          hold=self._stage_gate("tables"))
+            self._rebuild_abandoned(deadlines, "tables", modules, ("table_extractor", "layout_analyzer"))
+            
+            # 只有每一页都已提取文本块时才复用；pdfplumber 未运行（如被自适应策略跳过）、
+            # 超时放弃或有页面失败时，由版面分析自行提取
+            if table_results is not None and page_count and len(scanned_pages) == page_count[0]:
+                shared_blocks = collected_blocks
+        
         # 1. 版面分析（获取结构化文本）
+        layout_result = None
         if self.enable_layout_analysis:
             logger.info("📊 执行版面分析...")
-            layout_result = self.layout_analyzer.analyze_layout(pdf_path)
+            layout_result = deadlines.run("layout", modules["layout_analyzer"].analyze_layout,
+                                          pdf_path, blocks=shared_blocks)
+            self._rebuild_abandoned(deadlines, "layout", modules, ("layout_analyzer",))
+        if layout_result is not None:
             result["layout"] = layout_result
             
             # 提取按阅读顺序排列的文本
@@ -98,10 +245,13 @@ class AdvancedPDFLoader:
             logger.info(f"✅ 提取文本 {len(result['text'])} 字符")
         
         # 2. 表格提取
-        if self.enable_table_extraction:
+        if self.enable_table_extraction and table_results is None and "tables" not in deadlines.timed_out:
             logger.info("📋 执行表格提取...")
-            table_results = self.table_extractor.extract_all(pdf_path)
-            
+            table_results = deadlines.run("tables", modules["table_extractor"].extract_all, pdf_path,
+                                          hold=self._stage_gate("tables"))
+            self._rebuild_abandoned(deadlines, "tables", modules, ("table_extractor",))
+        
+        if table_results is not None:
             # 合并所有方法提取的表格
             all_tables = []
             for method, tables in table_results.items():
@@ -111,10 +261,30 @@ class AdvancedPDFLoader:
             logger.info(f"✅ 提取 {len(all_tables)} 个表格")
         
         # 3. OCR 识别（针对扫描版或图片）
+        ocr_pages = None
         if self.enable_ocr:
             logger.info("🔍 执行 OCR 识别...")
-            ocr_results = self.ocr.process_pdf(pdf_path, confidence_threshold=0.6)
+            # 文本层覆盖检查：已有文本层的区域不再 OCR
+            text_boxes = None
+            if self.ocr_only_uncovered and result["layout"]:
+                text_boxes = modules["layout_analyzer"].text_boxes_by_page(result["layout"].get("blocks", []))
+            
+            ocr_pages = deadlines.run("ocr", modules["ocr"].process_pdf_structured,
+                                      pdf_path, confidence_threshold=0.6,
+                                      batch_size=self.ocr_batch_size,
+                                      text_boxes=text_boxes,
+                                      mode=self.ocr_mode,
+                                      hold=self._stage_gate("ocr"))
+            self._rebuild_abandoned(deadlines, "ocr", modules, ("ocr",))
+        
+        if ocr_pages is not None:
+            ocr_results = to_text_results(ocr_pages)
             result["ocr_results"] = ocr_results
+            result["ocr_pages"] = ocr_pages
+            failed_pages = sorted(page for page, page_result in ocr_pages.items() if page_result.failed)
+            if failed_pages:
+                result["metadata"]["ocr_failed_pages"] = failed_pages
+                logger.warning(f"⚠️ 第 {failed_pages} 页有图片识别失败，OCR 结果不完整")
             
             # 如果文本为空，尝试使用 OCR 结果
             if not result["text"].strip() and ocr_results:
@@ -124,78 +294,680 @@ class AdvancedPDFLoader:
                 result["text"] = "\n".join(ocr_text_parts)
                 logger.info(f"✅ 使用 OCR 文本 {len(result['text'])} 字符")
         
+        if deadlines.enabled:
+            result["metadata"]["deadlines"] = deadlines.report()
+            if deadlines.timed_out:
+                logger.warning(f"⏰ 部分结果：超时阶段 {deadlines.timed_out}")
+        
         logger.info(f"🎉 PDF 加载完成")
         return result
     
-    def load_and_split(self, 
-                      pdf_path: str, 
-                      chunk_size: int = 1000, 
-                      chunk_overlap: int = 200) -> List[Dict]:
+    def _current_modules(self) -> Dict:
+        """当前的表格、OCR、版面模块实例（未启用的为 None），parse() 开始时取得并在整个文档中使用"""
+        with self._modules_lock:
+            return {name: getattr(self, name, None) for name in ("table_extractor", "ocr", "layout_analyzer")}
+    
+    def _rebuild_abandoned(self, deadlines: StageDeadlines, stage: str, modules: Dict, names: Tuple[str, ...]):
         """
-        加载 PDF 并分块（适用于 RAG 系统）
+        阶段超时被放弃时，后台线程仍在使用该阶段的模块（OCR 模型、提取统计、已打开的页面句柄）：
+        重建这些模块，本文档的后续阶段（modules）与之后开始的文档使用新实例，不再与卡住的线程共用。
+        替换在锁内进行，只替换仍是被放弃实例的模块（并发文档已重建过的直接沿用）；
+        正在解析的其他文档持有自己的 modules，不会中途换用新实例。OCR 新实例沿用原实例的缓存与累计统计
+        """
+        if stage not in deadlines.abandoned:
+            return
+        with self._modules_lock:
+            for name in names:
+                stale = modules[name]
+                if getattr(self, name) is stale:
+                    fresh = self._module_factories[name]()
+                    if name == "ocr":
+                        fresh.share_state(stale)
+                    setattr(self, name, fresh)
+                modules[name] = getattr(self, name)
+        logger.warning(f"♻️ 阶段 {stage} 已被放弃，重建模块 {list(names)}"
+                       f"（进程内共 {abandoned_threads()} 个被放弃的阶段线程，需要回收时使用 DocumentSandbox）")
+    
+    def _stage_gate(self, stage: str):
+        """阶段并发闸门（未配置并发控制器时直接放行）"""
+        if self.concurrency is None:
+            return contextlib.nullcontext()
+        return self.concurrency.stage(stage)
+    
+    def load(self, pdf_path: Optional[str] = None) -> Union[List[Document], Dict]:
+        """
+        加载 PDF
+        
+        Args:
+            pdf_path: 指定时按旧接口返回 parse(pdf_path) 的结果字典；
+                      None 时按 LangChain 语义返回 file_path 的 Document 列表
+            
+        Returns:
+            Document 列表或解析结果字典
+        """
+        if pdf_path is not None:
+            return self.parse(pdf_path)
+        return list(self.lazy_load())
+    
+    def lazy_load(self) -> Iterator[Document]:
+        """
+        流式产出 Document（按 document_mode 逐页 / 逐块 / 逐分块），内存中只保留当前页
+        
+        Yields:
+            Document，metadata 中包含来源、页码、块类型、表格与 OCR 信息
+        """
+        if self.file_path is None:
+            raise ValueError("lazy_load 需要在构造时指定 file_path")
+        
+        pdf_path = str(self.file_path)
+        if not Path(pdf_path).exists():
+            logger.error(f"❌ 文件不存在: {pdf_path}")
+            return
+        
+        base = {"source": pdf_path, "file_name": Path(pdf_path).name}
+        
+        if self.document_mode == "chunk":
+            for chunk in self.iter_chunks(pdf_path, self.chunk_size, self.chunk_overlap, tokenizer=self.tokenizer):
+                metadata = dict(chunk["metadata"])
+                metadata.update(base)
+                metadata["bboxes"] = [[page, list(bbox)] for page, bbox in metadata.get("bboxes", [])]
+                metadata["ocr"] = "ocr" in metadata.get("block_types", [])
+                yield Document(page_content=chunk["text"], metadata=metadata)
+            return
+        
+        if self.document_mode == "block":
+            for element in self.iter_elements(pdf_path):
+                yield self._element_document(element, base)
+            return
+        
+        # 按页聚合（iter_elements 按页顺序产出）
+        page_num, page_elements = None, []
+        for element in self.iter_elements(pdf_path):
+            element_page = element.page if isinstance(element, TextBlock) else element.attrs.get('page', 0)
+            if page_elements and element_page != page_num:
+                yield self._page_document(page_num, page_elements, base)
+                page_elements = []
+            page_num = element_page
+            page_elements.append(element)
+        
+        if page_elements:
+            yield self._page_document(page_num, page_elements, base)
+    
+    async def alazy_load(self) -> AsyncIterator[Document]:
+        """
+        异步流式产出 Document（解析在线程池中执行，不阻塞事件循环）
+        
+        Yields:
+            Document
+        """
+        loop = asyncio.get_running_loop()
+        iterator = self.lazy_load()
+        done = object()
+        while True:
+            document = await loop.run_in_executor(None, next, iterator, done)
+            if document is done:
+                break
+            yield document
+    
+    @staticmethod
+    def _element_text(element) -> str:
+        """文本块或表格的文本内容（表格按行展开）"""
+        if isinstance(element, TextBlock):
+            return element.text
+        header, rows = table_rows(element)
+        return "\n".join([header] + rows)
+    
+    def _element_document(self, element, base: Dict) -> Document:
+        """单个文本块 / 表格 → Document"""
+        if isinstance(element, TextBlock):
+            metadata = dict(base, page=element.page, block_type=element.block_type,
+                            bbox=list(element.bbox), column=element.column, font_size=element.font_size)
+        else:
+            metadata = dict(base, page=element.attrs.get('page', 0), block_type="table",
+                            table_shape=list(element.shape),
+                            table_columns=[str(c) for c in element.columns])
+            if element.attrs.get('bbox'):
+                metadata["bbox"] = list(element.attrs['bbox'])
+            if 'accuracy' in element.attrs:
+                metadata["table_accuracy"] = float(element.attrs['accuracy'])
+        return Document(page_content=self._element_text(element), metadata=metadata)
+    
+    def _page_document(self, page_num: int, elements: List, base: Dict) -> Document:
+        """同一页的元素 → Document"""
+        blocks = [e for e in elements if isinstance(e, TextBlock)]
+        tables = [e for e in elements if not isinstance(e, TextBlock)]
+        
+        metadata = dict(base, page=page_num,
+                        block_types=list(dict.fromkeys(
+                            [b.block_type for b in blocks] + (["table"] if tables else []))),
+                        layout_columns=max((b.column for b in blocks), default=-1) + 1,
+                        tables=len(tables),
+                        ocr=any(b.block_type == "ocr" for b in blocks))
+        if tables:
+            metadata["table_bboxes"] = [list(t.attrs['bbox']) for t in tables if t.attrs.get('bbox')]
+        
+        return Document(page_content="\n\n".join(self._element_text(e) for e in elements), metadata=metadata)
+    
+    def iter_elements(self, pdf_path: str) -> Iterator:
+        """
+        按阅读顺序逐页产出正文元素（生成器，后续页面尚未解析时已可消费前面的页面）
+        
+        每页的标题/正文块与表格按纵向位置合并，落在表格区域内的文本块由表格代替；
+        含图片（或 render / auto 模式下需整页渲染）的页面在产出前逐页 OCR，与 parse() 相同只识别
+        未被该页文本层覆盖的区域（ocr_only_uncovered），识别结果作为该页的 OCR 文本块（block_type='ocr'）
+        按纵向位置并入。未启用版面分析时没有文本层可供检查，整篇 OCR 一次后按页并入
+        
+        Args:
+            pdf_path: PDF 文件路径
+            
+        Yields:
+            TextBlock 或表格 DataFrame（attrs 中记录 page 与 bbox）
+        """
+        ocr_blocks: Dict[int, TextBlock] = {}
+        recognize = None
+        
+        if self.enable_ocr and self.enable_layout_analysis:
+            candidates = self.ocr.ocr_candidate_pages(pdf_path, mode=self.ocr_mode)
+            memo: Dict[str, List] = {}  # 跨页重复的图片只识别一次
+            
+            def recognize_page(page_num: int, blocks: List[TextBlock]) -> Optional[TextBlock]:
+                if page_num not in candidates:
+                    return None
+                return next(self._ocr_blocks(pdf_path, pages={page_num}, text_blocks=blocks, memo=memo), None)
+            
+            recognize = recognize_page
+        elif self.enable_ocr:
+            ocr_blocks = {block.page: block for block in self._ocr_blocks(pdf_path)}
+        
+        yield from self._merge_page_ocr(self._iter_pages(pdf_path), ocr_blocks, recognize)
+    
+    def _merge_page_ocr(self,
+                        pages: Iterator[Tuple[int, List[TextBlock], List]],
+                        ocr_blocks: Dict[int, TextBlock],
+                        recognize: Optional[Callable[[int, List[TextBlock]], Optional[TextBlock]]] = None) -> Iterator:
+        """
+        页面流与每页 OCR 文本块合并为元素流
+        
+        Args:
+            pages: (页码, 文本块, 表格) 流（按页码递增）
+            ocr_blocks: 已识别的 {页码: OCR 文本块}（没有文本与表格的页面按页码顺序插入）
+            recognize: 逐页识别函数 (页码, 该页文本块) -> OCR 文本块，在产出该页前调用
+        """
+        for page_num, blocks, tables in pages:
+            for earlier in sorted(p for p in ocr_blocks if p < page_num):
+                yield ocr_blocks.pop(earlier)
+            
+            ocr_block = ocr_blocks.pop(page_num, None)
+            if ocr_block is None and recognize is not None:
+                ocr_block = recognize(page_num, blocks)
+            
+            # OCR 块插在首个起点低于它的元素之前；没有位置信息时放在页末
+            ocr_top = ocr_block.bbox[1] if ocr_block is not None and any(ocr_block.bbox) else float('inf')
+            for element in self._page_elements(blocks, tables):
+                if ocr_block is not None and self._element_top(element) > ocr_top:
+                    yield ocr_block
+                    ocr_block = None
+                yield element
+            if ocr_block is not None:
+                yield ocr_block
+        
+        for page_num in sorted(ocr_blocks):
+            yield ocr_blocks[page_num]
+    
+    def _iter_pages(self, pdf_path: str) -> Iterator[Tuple[int, List[TextBlock], List]]:
+        """
+        逐页产出 (页码, 阅读顺序文本块, 表格)
+        
+        pdfplumber 版面后端与表格提取同时启用时，两者在同一次页面解析中完成（不经过自适应方法选择）；
+        否则表格先按自适应策略整体提取，文本块逐页产出
+        """
+        if (self.enable_table_extraction and self.enable_layout_analysis
+                and self.layout_analyzer.backend == 'pdfplumber'):
+            with pdfplumber.open(pdf_path) as pdf:
+                for page in pdf.pages:
+                    try:
+                        tables = self.table_extractor.extract_tables_from_plumber_page(page)
+                        blocks = self.layout_analyzer.extract_text_blocks_from_plumber_page(page)
+                    finally:
+                        page.close()
+                    yield page.page_number, self.layout_analyzer.layout_page(blocks), tables
+            return
+        
+        tables_by_page = {}
+        if self.enable_table_extraction:
+            for tables in self.table_extractor.extract_all(pdf_path).values():
+                for table in tables:
+                    tables_by_page.setdefault(table.attrs.get('page', 0), []).append(table)
+        
+        if self.enable_layout_analysis:
+            for page_num, blocks in self.layout_analyzer.iter_page_blocks(pdf_path):
+                yield page_num, blocks, tables_by_page.pop(page_num, [])
+        
+        # 没有对应文本页的表格（缺少页码或未启用版面分析）
+        for page_num in sorted(tables_by_page):
+            yield page_num, [], tables_by_page[page_num]
+    
+    @staticmethod
+    def _page_elements(blocks: List[TextBlock], tables: List) -> Iterator:
+        """单页文本块与表格按阅读顺序合并（表格插在首个起点不高于它的文本块之前）"""
+        table_boxes = [t.attrs['bbox'] for t in tables if t.attrs.get('bbox')]
+        
+        def in_table(bbox) -> bool:
+            cx, cy = (bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2
+            return any(x0 <= cx <= x1 and y0 <= cy <= y1 for x0, y0, x1, y1 in table_boxes)
+        
+        pending = sorted(tables, key=lambda t: t.attrs['bbox'][1] if t.attrs.get('bbox') else float('inf'))
+        
+        for block in blocks:
+            if block.block_type not in ["title", "body"] or in_table(block.bbox):
+                continue
+            while pending and pending[0].attrs.get('bbox') and pending[0].attrs['bbox'][1] <= block.bbox[1]:
+                yield pending.pop(0)
+            yield block
+        
+        yield from pending
+    
+    def _ocr_blocks(self,
+                    pdf_path: str,
+                    pages: Optional[Set[int]] = None,
+                    text_blocks: Optional[List[TextBlock]] = None,
+                    memo: Optional[Dict[str, List]] = None) -> Iterator[TextBlock]:
+        """
+        OCR 结果 → 每页一个文本块（行间以换行连接，bbox 为识别行的外接框）
+        
+        Args:
+            pdf_path: PDF 文件路径
+            pages: 只识别这些页，None 表示全部页面
+            text_blocks: 这些页的文本层文本块（ocr_only_uncovered 时被覆盖的图片区域不再识别）
+            memo: 同一文档逐页调用间共享的识别结果
+        """
+        text_boxes = None
+        if self.ocr_only_uncovered and text_blocks is not None:
+            text_boxes = self.layout_analyzer.text_boxes_by_page(text_blocks)
+        ocr_pages = self.ocr.process_pdf_structured(pdf_path, confidence_threshold=0.6,
+                                                    batch_size=self.ocr_batch_size,
+                                                    text_boxes=text_boxes,
+                                                    mode=self.ocr_mode,
+                                                    pages=pages,
+                                                    memo=memo)
+        yield from self._ocr_page_blocks(ocr_pages)
+    
+    @staticmethod
+    def _element_top(element) -> float:
+        """文本块或表格的上边界（表格缺少 bbox 时视为页末）"""
+        if isinstance(element, TextBlock):
+            return element.bbox[1]
+        bbox = element.attrs.get('bbox')
+        return bbox[1] if bbox else float('inf')
+    
+    @staticmethod
+    def _ocr_page_blocks(ocr_pages: Dict) -> Iterator[TextBlock]:
+        """{page_num: OCRPageResult} → 每页一个 OCR 文本块"""
+        for page_num, page_result in sorted(ocr_pages.items()):
+            texts = page_result.texts()
+            if not texts:
+                continue
+            
+            bbox = (0.0, 0.0, 0.0, 0.0)
+            located = ~np.isnan(page_result.page_boxes).any(axis=(1, 2))
+            if located.any():
+                points = page_result.page_boxes[located].reshape(-1, 2)
+                bbox = (*map(float, points.min(axis=0)), *map(float, points.max(axis=0)))
+            
+            yield TextBlock(text="\n".join(texts), bbox=bbox, page=page_num,
+                            block_type="ocr", column=0, font_size=0.0, font_name="")
+    
+    def iter_chunks(self,
+                    pdf_path: str,
+                    chunk_size: int = 1000,
+                    chunk_overlap: int = 200,
+                    tokenizer: Optional[Callable[[str], Sequence]] = None) -> Iterator[Dict]:
+        """
+        流式分块：边解析页面边产出文本块，内存中不保留整篇文档文本
         
         Args:
             pdf_path: PDF 文件路径
-            chunk_size: 块大小（字符数）
-            chunk_overlap: 块重叠大小
+            chunk_size: 块大小（字符数；指定 tokenizer 时为 token 数）
+            chunk_overlap: 块重叠大小（需小于 chunk_size）
+            tokenizer: 分词函数 text -> tokens，None 表示按字符计数
             
         Returns:
-            文本块列表，每个块包含 text 和 metadata
+            块生成器，每个块包含 text 和 metadata（页码、bbox、块类型等；
+            配置去重器时近重复块被折叠为保留块 metadata['duplicates'] 中的反向引用）
         """
-        # 加载 PDF
-        result = self.load(pdf_path)
+        # 参数在调用时立即校验，而不是等到首次迭代
+        chunker = StructuredChunker(chunk_size, chunk_overlap, tokenizer=tokenizer)
         
-        if not result.get("text"):
-            logger.warning("⚠️ 未提取到文本内容")
-            return []
+        if not Path(pdf_path).exists():
+            logger.error(f"❌ 文件不存在: {pdf_path}")
+            return iter([])
+        
+        chunks = chunker.chunk(self.iter_elements(pdf_path), source=Path(pdf_path).name)
+        
+        # 近重复分块在向量化之前折叠（持久索引按完整路径区分文档，不同目录下的同名文件互不影响）
+        if self.chunk_deduplicator is not None:
+            chunks = self.chunk_deduplicator.dedup(chunks, source=str(Path(pdf_path).resolve()))
+        
+        return chunks
+    
+    def save_result(self, result: Dict, output_dir: str) -> str:
+        """
+        把解析结果保存为二进制容器（{文件名}.pdfr），供 open_result / rechunk 复用
+        
+        Args:
+            result: parse() 的结果
+            output_dir: 输出目录
+            
+        Returns:
+            容器文件路径
+        """
+        file_name = Path(result["metadata"]["file_name"]).stem
+        return write_result(result, str(Path(output_dir) / f"{file_name}.pdfr"))
+    
+    @staticmethod
+    def open_result(result_path: str) -> Dict:
+        """
+        从二进制容器还原 parse() 形状的结果（不重新解析 PDF）
         
-        # 简单分块（按字符数）
-        text = result["text"]
-        chunks = []
+        Args:
+            result_path: save_result 写出的容器
+            
+        Returns:
+            解析结果字典
+        """
+        with ResultReader(result_path) as reader:
+            return reader.to_result()
+    
+    def rechunk(self,
+                result_path: str,
+                chunk_size: int = 1000,
+                chunk_overlap: int = 200,
+                tokenizer: Optional[Callable[[str], Sequence]] = None) -> Iterator[Dict]:
+        """
+        从二进制容器重新分块（逐页内存映射读取，不重新解析 PDF）
         
-        start = 0
-        while start < len(text):
-            end = start + chunk_size
-            chunk_text = text[start:end]
+        Args:
+            result_path: save_result 写出的容器
+            chunk_size: 块大小（字符数；指定 tokenizer 时为 token 数）
+            chunk_overlap: 块重叠大小（需小于 chunk_size）
+            tokenizer: 分词函数 text -> tokens，None 表示按字符计数
             
-            chunks.append({
-                "text": chunk_text,
-                "metadata": {
-                    "source": result["metadata"]["file_name"],
-                    "chunk_id": len(chunks),
-                    "start_char": start,
-                    "end_char": end
-                }
-            })
+        Returns:
+            块生成器（格式同 iter_chunks）
+        """
+        chunker = StructuredChunker(chunk_size, chunk_overlap, tokenizer=tokenizer)
+        reader = ResultReader(result_path)
+        source = reader.metadata.get("file_name", Path(result_path).name)
+        
+        chunks = chunker.chunk(self._stored_elements(reader), source=source)
+        if self.chunk_deduplicator is not None:
+            # 与 iter_chunks 使用相同的文档键：原 PDF 的完整路径
+            document = reader.metadata.get("file_path") or result_path
+            chunks = self.chunk_deduplicator.dedup(chunks, source=str(Path(document).resolve()))
+        return chunks
+    
+    def _stored_elements(self, reader: ResultReader) -> Iterator:
+        """容器中的元素流（与 iter_elements 规则一致，parse() 的 OCR 结果已做过覆盖检查），结束时关闭容器"""
+        try:
+            ocr_blocks = {block.page: block for block in self._ocr_page_blocks(
+                {int(page): reader.ocr_page(int(page)) for page in reader.directory["ocr"]})}
+            yield from self._merge_page_ocr(reader.iter_pages(), ocr_blocks)
+        finally:
+            reader.close()
+    
+    def load_and_split(self, 
+                      pdf_path: Optional[str] = None, 
+                      chunk_size: int = 1000, 
+                      chunk_overlap: int = 200,
+                      tokenizer: Optional[Callable[[str], Sequence]] = None) -> List:
+        """
+        加载 PDF 并分块（适用于 RAG 系统）
+        
+        按阅读顺序整块装箱，不切断标题、表格行与句子，参见 iter_chunks；
+        传入 LangChain TextSplitter（或不传参数）时按 BaseLoader 语义切分 lazy_load 的 Document
+        
+        Args:
+            pdf_path: PDF 文件路径（或 TextSplitter）
+            chunk_size: 块大小（字符数；指定 tokenizer 时为 token 数）
+            chunk_overlap: 块重叠大小（需小于 chunk_size）
+            tokenizer: 分词函数 text -> tokens，None 表示按字符计数
             
-            start = end - chunk_overlap
+        Returns:
+            文本块列表，每个块包含 text 和 metadata（TextSplitter 模式下为 Document 列表）
+        """
+        if pdf_path is None or not isinstance(pdf_path, (str, os.PathLike)):
+            return super().load_and_split(pdf_path)
+        
+        chunks = list(self.iter_chunks(str(pdf_path), chunk_size, chunk_overlap, tokenizer=tokenizer))
+        
+        if not chunks:
+            logger.warning("⚠️ 未提取到文本内容")
         
-        logger.info(f"✅ 分块完成，共 {len(chunks)} 个块")
         return chunks
     
-    def batch_load(self, pdf_paths: List[str]) -> List[Dict]:
+    def batch_load(self, 
+                   pdf_paths: List[str], 
+                   exporter=None, 
+                   export_mode: str = 'page') -> List[Dict]:
         """
         批量加载多个 PDF 文件
         
         Args:
             pdf_paths: PDF 文件路径列表
+            exporter: JSONL 分片写入器（ShardedJSONLWriter），指定后记录边处理边写出，
+                      返回列表中不再保留解析结果，只保留 metadata（含 exported_records）
+            export_mode: 导出粒度（'page' 每页一条，'chunk' 每个分块一条，使用构造时的分块参数）
             
         Returns:
             解析结果列表
         """
+        if export_mode not in ("page", "chunk"):
+            raise ValueError(f"不支持的导出粒度: {export_mode}（可选: ['page', 'chunk']）")
+        
+        def process(pdf_path: str) -> Dict:
+            if exporter is None:
+                return self.parse(pdf_path)
+            return {"metadata": self._export_file(pdf_path, exporter, export_mode)}
+        
         results = []
         
-        for i, pdf_path in enumerate(pdf_paths):
-            logger.info(f"📂 处理文件 {i+1}/{len(pdf_paths)}: {pdf_path}")
+        if self.concurrency is not None:
+            # 并发处理，结果按输入顺序返回
+            ordered = {}
+            for (i, pdf_path), result, error in self.concurrency.map(lambda item: process(item[1]),
+                                                                     enumerate(pdf_paths)):
+                if error is not None:
+                    logger.error(f"❌ 处理失败: {pdf_path}: {error}")
+                else:
+                    ordered[i] = result
+            results = [ordered[i] for i in sorted(ordered)]
+            logger.info(f"🎛️ 并发控制: {self.concurrency.summary()}")
+        else:
+            for i, pdf_path in enumerate(pdf_paths):
+                logger.info(f"📂 处理文件 {i+1}/{len(pdf_paths)}: {pdf_path}")
+                try:
+                    results.append(process(pdf_path))
+                except Exception as e:
+                    logger.error(f"❌ 处理失败: {e}")
+                    continue
+
+        logger.info(f"✅ 批量处理完成，成功 {len(results)}/{len(pdf_paths)} 个文件")
+        return results
+    
+    def _export_file(self, pdf_path: str, exporter, export_mode: str,
+                     committed: Optional[Callable[[int], None]] = None,
+                     content_hash: Optional[str] = None) -> Dict:
+        """
+        解析单个文件并把逐页 / 逐分块记录写入导出器，返回 metadata（含 exported_records）
+        
+        committed 在记录所在分片写完后调用（见 ShardedJSONLWriter.write_all）；
+        content_hash 为入库账本已计算的内容摘要，隔离模式下直接交给隔离池，不再重新读取文件
+        """
+        if export_mode == "chunk" and self.sandbox is not None:
+            # 隔离模式：子进程写出临时容器，父进程从容器分块
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                result_path = self.sandbox.parse_to(pdf_path, tmp_dir, content_hash=content_hash)
+                records = self.rechunk(result_path, self.chunk_size, self.chunk_overlap, tokenizer=self.tokenizer)
+                metadata = {"file_path": pdf_path, "file_name": Path(pdf_path).name,
+                            "exported_records": self._write_records(exporter, records, committed)}
+            return metadata
+        
+        if export_mode == "chunk":
+            records = self.iter_chunks(pdf_path, self.chunk_size, self.chunk_overlap,
+                                       tokenizer=self.tokenizer)
+            metadata = {"file_path": pdf_path, "file_name": Path(pdf_path).name}
+        else:
+            if self.sandbox is not None and content_hash is not None:
+                result = self.sandbox.parse(pdf_path, content_hash=content_hash)
+            else:
+                result = self.parse(pdf_path)
+            if not result:
+                raise FileNotFoundError(pdf_path)
+            records = page_records(result)
+            metadata = result["metadata"]
+        
+        metadata["exported_records"] = self._write_records(exporter, records, committed)
+        return metadata
+    
+    def _write_records(self, exporter, records, committed: Optional[Callable[[int], None]] = None) -> int:
+        """
+        写入导出器
+        
+        并发处理或需要确认落盘（入库）时先在当前线程生成全部记录，再加锁写出：
+        同一文档的记录保持连续，解析中途失败的文档也不会留下部分记录
+        """
+        if self.concurrency is None and committed is None:
+            return exporter.write_all(records)
+        records = list(records)
+        with self._export_lock:
+            return exporter.write_all(records, committed)
+    
+    def ingest(self,
+               source: Union[str, List[str]],
+               ledger: IngestLedger,
+               output_dir: Optional[str] = None,
+               exporter=None,
+               export_mode: str = 'page',
+               pattern: str = '*.pdf',
+               wait_for_retries: bool = False) -> Dict:
+        """
+        可断点续跑的目录 / 清单入库
+        
+        每个文件的状态、内容摘要、耗时和输出位置记录在账本中：重新运行时跳过已完成且未变化的文件，
+        内容与已完成文件相同的其他路径记为重复并跳过，失败文件按退避时间在之后的运行（或本次等待后）重试。
+        写入导出器时，文件要等记录所在分片写完并登记到清单后才在账本中标记完成，本次运行结束时写完当前分片；
+        中途中断的文件在下次运行重新处理，续写的导出器（同一输出目录）不会丢失或重复已完成文件的记录
+        
+        Args:
+            source: 目录、清单文件（见 discover_inputs）或文件路径列表
+            ledger: 入库进度账本（IngestLedger）
+            output_dir: 解析结果容器（.pdfr）输出目录，未指定 exporter 时必填
+            exporter: JSONL 分片写入器，指定后记录写入导出器（账本中的输出位置为导出目录）
+            export_mode: 导出粒度（'page' / 'chunk'）
+            pattern: 目录模式下的文件名匹配模式
+            wait_for_retries: 本次运行结束前是否等待退避时间到期并重试失败文件
+        
+        Returns:
+            {'processed', 'skipped', 'duplicates', 'failed', 'deferred', 'ledger': 账本汇总}
+        """
+        if exporter is None and output_dir is None:
+            raise ValueError("需要指定 output_dir 或 exporter")
+        if export_mode not in ("page", "chunk"):
+            raise ValueError(f"不支持的导出粒度: {export_mode}（可选: ['page', 'chunk']）")
+        
+        paths = source if isinstance(source, list) else discover_inputs(source, pattern)
+        wanted = set(paths)
+        stats = {"processed": 0, "skipped": 0, "duplicates": 0, "failed": 0, "deferred": 0}
+        pending = paths
+        
+        def process(pdf_path: str) -> str:
             try:
-                result = self.load(pdf_path)
-                results.append(result)
+                return self._ingest_file(pdf_path, ledger, output_dir, exporter, export_mode)
             except Exception as e:
-                logger.error(f"❌ 处理失败: {e}")
-                continue
+                # _ingest_file 之外抛出的异常（如账本写入失败）：计为失败，不中断本次运行
+                logger.error(f"❌ 入库失败: {pdf_path}: {type(e).__name__}: {e}")
+                return "failed"
         
-        logger.info(f"✅ 批量处理完成，成功 {len(results)}/{len(pdf_paths)} 个文件")
-        return results
+        while pending:
+            stats["deferred"] = 0
+            if self.concurrency is not None:
+                outcomes = []
+                for pdf_path, outcome, error in self.concurrency.map(process, pending):
+                    if error is not None:
+                        logger.error(f"❌ 入库失败: {pdf_path}: {error}")
+                        outcome = "failed"
+                    outcomes.append(outcome)
+            else:
+                outcomes = map(process, pending)
+            for outcome in outcomes:
+                if outcome in stats:
+                    stats[outcome] += 1
+            
+            retry_at = ledger.next_retry(paths) if wait_for_retries else None
+            if retry_at is None:
+                break
+            wait = max(retry_at - time.time(), 0)
+            logger.info(f"⏳ 等待 {wait:.0f} 秒后重试失败文件")
+            time.sleep(wait)
+            pending = [f["path"] for f in ledger.failures() if f["path"] in wanted]
+        
+        if exporter is not None:
+            with self._export_lock:
+                exporter.flush()
+        
+        summary = ledger.summary()
+        if self.concurrency is not None:
+            logger.info(f"🎛️ 并发控制: {self.concurrency.summary()}")
+        logger.info(f"✅ 入库完成: 处理 {stats['processed']}，跳过 {stats['skipped']}，"
+                    f"重复 {stats['duplicates']}，失败 {stats['failed']}（账本共 {summary['done']} 个已完成）")
+        return {**stats, "ledger": summary}
+    
+    def _ingest_file(self, pdf_path: str, ledger: IngestLedger, output_dir: Optional[str],
+                     exporter, export_mode: str) -> str:
+        """
+        入库单个文件（按账本判断是否处理，结果与失败写回账本）
+        
+        Returns:
+            'processed' / 'skipped' / 'duplicates' / 'deferred' / 'exhausted' / 'failed'
+        """
+        try:
+            claim = ledger.claim(pdf_path)
+        except OSError as e:
+            logger.error(f"❌ 无法读取文件 {pdf_path}: {e}")
+            return "failed"
+        
+        if claim["action"] == "done":
+            return "skipped"
+        if claim["action"] == "duplicate":
+            logger.info(f"♻️ 内容重复，跳过: {pdf_path}（与 {claim['duplicate_of']} 相同）")
+            return "duplicates"
+        if claim["action"] in ("deferred", "exhausted"):
+            return claim["action"]
+        
+        logger.info(f"📂 入库文件（第 {claim['attempt']} 次尝试）: {pdf_path}")
+        try:
+            if exporter is not None:
+                # 记录所在分片写完后才标记完成：中断时仍在未写完分片中的文件保持 running，下次运行重新处理
+                self._export_file(pdf_path, exporter, export_mode,
+                                  committed=lambda count: ledger.complete(pdf_path, str(exporter.output_dir), count),
+                                  content_hash=claim["content_hash"])
+            elif self.sandbox is not None:
+                # 账本已计算内容摘要，隔离池直接用于隔离记录
+                ledger.complete(pdf_path, self.sandbox.parse_to(pdf_path, output_dir,
+                                                                content_hash=claim["content_hash"]))
+            else:
+                result = self.parse(pdf_path)
+                if not result:
+                    raise FileNotFoundError(pdf_path)
+                ledger.complete(pdf_path, self.save_result(result, output_dir))
+            return "processed"
+        except Exception as e:
+            retry_at = ledger.fail(pdf_path, f"{type(e).__name__}: {e}")
+            if retry_at is None:
+                logger.error(f"❌ 入库失败，已用尽重试次数: {pdf_path}: {e}")
+            else:
+                logger.error(f"❌ 入库失败，{retry_at - time.time():.0f} 秒后可重试: {pdf_path}: {e}")
+            return "failed"
     
     def export_results(self, result: Dict, output_dir: str):
         """
@@ -239,7 +1011,7 @@ class AdvancedPDFLoader:
 
 def compare_with_basic_loader(pdf_path: str):
     """
-    对比基础加载器和高级加载器的效果
+    对比基础加载器和高级加载器的效果（两者都是 BaseLoader，按同一方式统计 Document）
     
     Args:
         pdf_path: PDF 文件路径
@@ -250,37 +1022,36 @@ def compare_with_basic_loader(pdf_path: str):
     print("📊 基础加载器 vs 高级加载器对比")
     print("="*60)
     
-    # 基础加载器
-    print("\n1️⃣ 基础加载器（PyPDFLoader）:")
-    try:
-        basic_loader = PyPDFLoader(pdf_path)
-        basic_docs = basic_loader.load()
-        basic_text = "\n".join([doc.page_content for doc in basic_docs])
-        print(f"   提取文本: {len(basic_text)} 字符")
-        print(f"   文档数: {len(basic_docs)}")
-        print(f"   表格提取: ❌ 不支持")
-        print(f"   OCR: ❌ 不支持")
-        print(f"   版面分析: ❌ 不支持")
-    except Exception as e:
-        print(f"   ❌ 加载失败: {e}")
-    
-    # 高级加载器
-    print("\n2️⃣ 高级加载器（AdvancedPDFLoader）:")
-    try:
-        advanced_loader = AdvancedPDFLoader()
-        result = advanced_loader.load(pdf_path)
-        print(f"   提取文本: {len(result['text'])} 字符")
-        print(f"   表格提取: ✅ 提取 {len(result['tables'])} 个表格")
-        print(f"   OCR: ✅ 识别 {len(result['ocr_results'])} 页图片")
-        print(f"   版面分析: ✅ 检测 {result['layout']['summary'].get('max_columns', 0)} 列布局")
+    loaders = [
+        ("1️⃣ 基础加载器（PyPDFLoader）", lambda: PyPDFLoader(pdf_path)),
+        ("2️⃣ 高级加载器（AdvancedPDFLoader）", lambda: AdvancedPDFLoader(file_path=pdf_path))
+    ]
+    
+    text_lengths = []
+    for title, create_loader in loaders:
+        print(f"\n{title}:")
+        try:
+            docs = create_loader().load()
+        except Exception as e:
+            print(f"   ❌ 加载失败: {e}")
+            continue
         
+        text_length = sum(len(doc.page_content) for doc in docs)
+        text_lengths.append(text_length)
+        num_tables = sum(doc.metadata.get("tables", 0) for doc in docs)
+        ocr_pages = sum(1 for doc in docs if doc.metadata.get("ocr"))
+        max_columns = max((doc.metadata.get("layout_columns", 0) for doc in docs), default=0)
+        
+        print(f"   提取文本: {text_length} 字符")
+        print(f"   文档数: {len(docs)}")
+        print(f"   表格提取: {'✅ 提取 ' + str(num_tables) + ' 个表格' if num_tables else '❌ 无'}")
+        print(f"   OCR: {'✅ 识别 ' + str(ocr_pages) + ' 页' if ocr_pages else '❌ 无'}")
+        print(f"   版面分析: {'✅ 检测 ' + str(max_columns) + ' 列布局' if max_columns else '❌ 无'}")
+    
+    if len(text_lengths) == 2 and text_lengths[0]:
+        improvement = (text_lengths[1] - text_lengths[0]) / text_lengths[0] * 100
         print(f"\n📈 提升效果:")
-        if basic_text:
-            improvement = (len(result['text']) - len(basic_text)) / len(basic_text) * 100
-            print(f"   文本提取量提升: {improvement:.1f}%")
-        print(f"   额外功能: 表格结构化、图片文字识别、版面理解")
-    except Exception as e:
-        print(f"   ❌ 加载失败: {e}")
+        print(f"   文本提取量提升: {improvement:.1f}%")
 
 
 def demo():
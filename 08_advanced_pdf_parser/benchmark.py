@@ -0,0 +1,242 @@
+"""
+PDF 智能解析器 - 性能基准脚本
+对比不同处理路径的吞吐，结果直接打印到终端
+
+用法:
+    python benchmark.py ocr test_data/scanned_doc.pdf
+    python benchmark.py pipeline test_data/scanned_doc.pdf
+    python benchmark.py onnx test_data/ocr_images models/onnx
+    python benchmark.py render test_data/scanned_doc.pdf
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# 添加当前目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from PIL import Image
+
+from image_ocr import ImageOCR
+
+
+def print_stats_table(title: str, rows: list):
+    """打印吞吐对比表"""
+    print("\n" + "="*78)
+    print(f"⏱️ {title}")
+    print("="*78)
+    print(f"{'模式':<24}{'图片数':>8}{'文本行':>8}{'耗时(s)':>10}{'图/秒':>10}{'行/秒':>10}")
+    print("-"*78)
+    for stats in rows:
+        print(f"{stats['mode']:<24}{stats['images']:>8}{stats['lines']:>8}"
+              f"{stats['elapsed']:>10.2f}{stats['images_per_sec']:>10.2f}{stats['lines_per_sec']:>10.2f}")
+
+
+def benchmark_ocr(pdf_path: str, batch_sizes: tuple = (8, 16, 32)):
+    """
+    对比逐张识别与批量识别、先提取后识别与流水线的吞吐
+    
+    Args:
+        pdf_path: 扫描版 PDF 路径
+        batch_sizes: 待测试的批大小
+    """
+    ocr = ImageOCR(lang='ch')
+    rows = []
+    
+    # 预热：首次调用包含模型加载与内存分配
+    ocr.process_pdf(pdf_path)
+    
+    for pipeline_depth in (0, 4):
+        ocr.pipeline_depth = pipeline_depth
+        
+        # 逐张图片识别
+        ocr.process_pdf(pdf_path)
+        rows.append(ocr.last_run_stats)
+        
+        # 批量路径
+        for batch_size in batch_sizes:
+            ocr.process_pdf(pdf_path, batch_size=batch_size)
+            rows.append(ocr.last_run_stats)
+    
+    print_stats_table(f"OCR 吞吐对比: {Path(pdf_path).name}", rows)
+
+
+def benchmark_pipeline(pdf_path: str, backend: str = 'paddle', batch_size: int = 16):
+    """
+    区分流水线开销与模型开销：同一文档分别用确定性桩后端和真实后端跑一遍，
+    桩后端耗时即提取/预处理/缓存/映射等流水线开销，两者之差近似为模型推理开销
+    
+    Args:
+        pdf_path: 扫描版 PDF 路径
+        backend: 真实 OCR 后端名称
+        batch_size: 批量识别的每批文本行数量
+    """
+    rows = []
+    for name in ("stub", backend):
+        ocr = ImageOCR(lang='ch', backend=name)
+        ocr.process_pdf(pdf_path, batch_size=batch_size)  # 预热
+        ocr.process_pdf(pdf_path, batch_size=batch_size)
+        stats = dict(ocr.last_run_stats)
+        stats["mode"] = f"{name}/{stats['mode']}"
+        rows.append(stats)
+        ocr.close()
+    
+    print_stats_table(f"流水线 vs 模型开销: {Path(pdf_path).name}", rows)
+    model_seconds = rows[1]["elapsed"] - rows[0]["elapsed"]
+    print(f"\n流水线开销: {rows[0]['elapsed']:.2f}s, 模型开销(估算): {model_seconds:.2f}s")
+
+
+def benchmark_render(pdf_path: str, dpis: tuple = (200, 300)):
+    """
+    对比内嵌图片识别与整页渲染识别的单页成本
+    
+    Args:
+        pdf_path: 扫描版 PDF 路径
+        dpis: 待测试的渲染分辨率
+    """
+    configs = [("images", 300, "gray")]
+    configs += [("render", dpi, colorspace) for dpi in dpis for colorspace in ("gray", "rgb")]
+    configs += [("auto", 300, "gray")]
+    
+    ocr = ImageOCR(lang='ch')
+    ocr.process_pdf(pdf_path)  # 预热
+    
+    print("\n" + "="*78)
+    print(f"⏱️ 单页 OCR 成本: {Path(pdf_path).name}")
+    print("="*78)
+    print(f"{'模式':<20}{'页数':>6}{'文本行':>8}{'渲染(s)':>10}{'总耗时(s)':>11}{'秒/页':>10}")
+    print("-"*78)
+    for mode, dpi, colorspace in configs:
+        ocr.render_dpi, ocr.render_colorspace = dpi, colorspace
+        ocr.process_pdf(pdf_path, mode=mode)
+        stats = ocr.last_run_stats
+        if not stats:
+            continue
+        label = mode if mode == "images" else f"{mode}@{dpi}/{colorspace}"
+        print(f"{label:<20}{stats['pages']:>6}{stats['lines']:>8}{stats['render_seconds']:>10.2f}"
+              f"{stats['elapsed']:>11.2f}{stats['seconds_per_page']:>10.2f}")
+
+
+def char_accuracy(predicted: str, reference: str) -> float:
+    """字符准确率：1 - 编辑距离 / 参考文本长度"""
+    if not reference:
+        return 1.0 if not predicted else 0.0
+    
+    previous = list(range(len(predicted) + 1))
+    for i, ref_char in enumerate(reference, 1):
+        current = [i]
+        for j, pred_char in enumerate(predicted, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (ref_char != pred_char)))
+        previous = current
+    
+    return max(0.0, 1.0 - previous[-1] / len(reference))
+
+
+def benchmark_backends(image_dir: str, model_dir: str, threads: tuple = (1, 4)):
+    """
+    固定图片集上对比 Paddle 推理与 ONNX Runtime（FP32 / INT8）的精度与延迟
+    
+    image_dir 下每张图片可附带同名 .txt 标注（逐行文本）；没有标注时以 Paddle 结果为参考，
+    Paddle 不可用时没有标注的图片不计入准确率（全部没有参考时显示 N/A）。
+    model_dir 需包含 det.onnx、rec.onnx、ppocr_keys_v1.txt，可选 cls.onnx
+    
+    Args:
+        image_dir: 图片目录
+        model_dir: ONNX 模型目录
+        threads: 待测试的算子内线程数
+    """
+    image_paths = sorted(p for p in Path(image_dir).iterdir()
+                         if p.suffix.lower() in (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff"))
+    if not image_paths:
+        print(f"⚠️ 目录中没有图片: {image_dir}")
+        return
+    
+    model_dir = Path(model_dir)
+    onnx_kwargs = {
+        "det_model_path": str(model_dir / "det.onnx"),
+        "rec_model_path": str(model_dir / "rec.onnx"),
+        "rec_char_dict_path": str(model_dir / "ppocr_keys_v1.txt"),
+    }
+    if (model_dir / "cls.onnx").exists():
+        onnx_kwargs["cls_model_path"] = str(model_dir / "cls.onnx")
+    
+    configs = [("paddle", "paddle", {})]
+    for quantize in (False, True):
+        for n in threads:
+            label = f"onnx-{'int8' if quantize else 'fp32'}-t{n}"
+            configs.append((label, "onnx", dict(onnx_kwargs, quantize=quantize, intra_op_threads=n)))
+    
+    references = {
+        path: path.with_suffix(".txt").read_text(encoding="utf-8").replace("\n", "")
+        for path in image_paths if path.with_suffix(".txt").exists()
+    }
+    
+    rows = []
+    for label, backend, kwargs in configs:
+        ocr = ImageOCR(lang='ch', backend=backend, backend_kwargs=kwargs)
+        if ocr.backend is None:
+            print(f"⚠️ 跳过 {label}: 后端初始化失败")
+            continue
+        ocr.backend.warmup()
+        
+        texts, latencies = {}, []
+        for path in image_paths:
+            start = time.perf_counter()
+            lines = ocr.recognize_text(Image.open(path))
+            latencies.append(time.perf_counter() - start)
+            texts[path] = "".join(text for text, _ in lines)
+        ocr.close()
+        
+        if label == "paddle":
+            # 无人工标注的图片以 Paddle 结果为参考
+            for path in image_paths:
+                references.setdefault(path, texts[path])
+        
+        scored = [p for p in image_paths if p in references]
+        accuracy = (sum(char_accuracy(texts[p], references[p]) for p in scored) / len(scored)
+                    if scored else None)
+        rows.append((label, accuracy, 1000 * sum(latencies) / len(latencies),
+                     1000 * sorted(latencies)[int(0.95 * (len(latencies) - 1))],
+                     len(latencies) / sum(latencies)))
+    
+    print("\n" + "="*70)
+    print(f"⏱️ OCR 推理后端对比: {Path(image_dir).name}（{len(image_paths)} 张，{len(references)} 份参考文本）")
+    print("="*70)
+    print(f"{'后端':<20}{'字符准确率':>10}{'平均(ms)':>10}{'P95(ms)':>10}{'图/秒':>10}")
+    print("-"*70)
+    for label, accuracy, mean_ms, p95_ms, per_sec in rows:
+        accuracy_cell = f"{accuracy:>10.2%}" if accuracy is not None else f"{'N/A':>10}"
+        print(f"{label:<20}{accuracy_cell}{mean_ms:>10.1f}{p95_ms:>10.1f}{per_sec:>10.2f}")
+
+
+def main():
+    """命令行入口"""
+    if len(sys.argv) < 3:
+        print(__doc__)
+        return
+    
+    target, pdf_path = sys.argv[1], sys.argv[2]
+    
+    if not Path(pdf_path).exists():
+        print(f"⚠️ 测试文件不存在: {pdf_path}")
+        return
+    
+    if target == "ocr":
+        benchmark_ocr(pdf_path)
+    elif target == "render":
+        benchmark_render(pdf_path)
+    elif target == "pipeline":
+        benchmark_pipeline(pdf_path)
+    elif target == "onnx":
+        if len(sys.argv) < 4:
+            print(__doc__)
+            return
+        benchmark_backends(pdf_path, sys.argv[3])
+    else:
+        print(f"⚠️ 未知的基准项: {target}")
+
+
+if __name__ == "__main__":
+    main()
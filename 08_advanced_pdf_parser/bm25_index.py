@@ -0,0 +1,410 @@
+"""
+本地 BM25 倒排索引模块
+入库时消费分块流构建磁盘倒排索引：中日韩文本按字二元组切分、拉丁文本按词切分，
+倒排表以 varint 差分压缩存储，查询时内存映射加载，新文档以追加段的方式写入
+"""
+
+import os
+import re
+import json
+import mmap
+import logging
+from pathlib import Path
+from typing import List, Dict, Tuple, Iterable, Iterator, Callable
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+
+# 中日韩字符范围：假名、CJK 扩展 A、CJK 统一汉字、韩文音节、兼容汉字
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+_TOKEN = re.compile(f"([{_CJK}]+)|[^\\W_{_CJK}]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    中日韩连续字符切为重叠二元组（单字保留为一元），其余按字母数字词切分并小写
+    
+    Args:
+        text: 文本
+    
+    Returns:
+        词项列表
+    """
+    tokens = []
+    for match in _TOKEN.finditer(text.lower()):
+        run = match.group()
+        if match.group(1):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def varint_encode(values: np.ndarray) -> bytes:
+    """
+    非负整数数组 → LEB128 varint 字节串（向量化）
+    
+    Args:
+        values: 非负整数数组（小于 2^35）
+    
+    Returns:
+        编码后的字节串
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    if values.size == 0:
+        return b""
+    
+    nbytes = np.ones(values.size, dtype=np.int64)
+    for k in range(1, 5):
+        nbytes += values >= np.uint64(1 << (7 * k))
+    
+    offsets = np.cumsum(nbytes) - nbytes
+    out = np.empty(int(nbytes.sum()), dtype=np.uint8)
+    for k in range(int(nbytes.max())):
+        mask = nbytes > k
+        byte = (values[mask] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        byte |= np.where(nbytes[mask] > k + 1, np.uint64(0x80), np.uint64(0))
+        out[offsets[mask] + k] = byte.astype(np.uint8)
+    return out.tobytes()
+
+
+def varint_decode(buffer) -> np.ndarray:
+    """
+    LEB128 varint 字节 → 整数数组（向量化）
+    
+    Args:
+        buffer: 字节串 / memoryview / uint8 数组
+    
+    Returns:
+        (n,) int64
+    """
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    if data.size == 0:
+        return np.zeros(0, dtype=np.int64)
+    
+    ends = (data & 0x80) == 0
+    starts = np.flatnonzero(np.concatenate(([True], ends[:-1])))
+    group = np.cumsum(np.concatenate(([0], ends[:-1].astype(np.int64))))
+    shift = (np.arange(data.size) - starts[group]) * 7
+    parts = (data & 0x7F).astype(np.int64) << shift
+    return np.add.reduceat(parts, starts)
+
+
+class _Segment:
+    """只读索引段（倒排表与文档存储内存映射）"""
+    
+    def __init__(self, index_dir: Path, name: str):
+        self.name = name
+        prefix = index_dir / name
+        
+        terms = (prefix.with_suffix(".terms")).read_text(encoding="utf-8").split("\n")
+        term_info = np.load(prefix.with_suffix(".tinfo.npy"))
+        # 词项 → (倒排表偏移, 字节数, 文档频率)
+        self.terms = {term: i for i, term in enumerate(terms) if term}
+        self.term_info = term_info
+        
+        self.doc_lengths = np.load(prefix.with_suffix(".dl.npy"), mmap_mode="r")
+        self.doc_offsets = np.load(prefix.with_suffix(".offsets.npy"), mmap_mode="r")
+        
+        self._files = []
+        self.postings = self._map(prefix.with_suffix(".post"))
+        self.store = self._map(prefix.with_suffix(".store"))
+    
+    def _map(self, path: Path):
+        """只读内存映射（空文件返回空字节串）"""
+        f = open(path, "rb")
+        self._files.append(f)
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    
+    @property
+    def num_docs(self) -> int:
+        return len(self.doc_lengths)
+    
+    def doc_freq(self, term: str) -> int:
+        i = self.terms.get(term)
+        return 0 if i is None else int(self.term_info[i, 2])
+    
+    def postings_of(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        词项倒排表
+        
+        Returns:
+            (文档编号 int64, 词频 int64)
+        """
+        i = self.terms.get(term)
+        if i is None:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        
+        offset, length, df = (int(v) for v in self.term_info[i])
+        values = varint_decode(memoryview(self.postings)[offset:offset + length])
+        return np.cumsum(values[:df]), values[df:]
+    
+    def document(self, doc_id: int) -> Dict:
+        """读取文档存储中的分块 {'text', 'metadata'}"""
+        start = int(self.doc_offsets[doc_id])
+        end = int(self.doc_offsets[doc_id + 1])
+        return json.loads(bytes(self.store[start:end]).decode("utf-8"))
+    
+    def close(self):
+        for obj in (self.postings, self.store):
+            if isinstance(obj, mmap.mmap):
+                obj.close()
+        for f in self._files:
+            f.close()
+
+
+class BM25IndexWriter:
+    """BM25 索引写入器（内存缓冲，达到阈值后写出为新段，可随时追加）"""
+    
+    def __init__(self,
+                 index_dir: str,
+                 max_buffer_docs: int = 10000,
+                 tokenizer: Callable[[str], List[str]] = tokenize):
+        """
+        打开（或创建）索引目录
+        
+        Args:
+            index_dir: 索引目录
+            max_buffer_docs: 内存中缓冲的分块数，达到后写出一个段
+            tokenizer: 分词函数（需与查询端一致）
+        """
+        self.index_dir = Path(index_dir)
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self.max_buffer_docs = max_buffer_docs
+        self.tokenizer = tokenizer
+        self.manifest = _read_manifest(self.index_dir)
+        
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._doc_lengths: List[int] = []
+        self._docs: List[bytes] = []
+    
+    def add(self, chunk: Dict):
+        """
+        加入一个分块
+        
+        Args:
+            chunk: {'text', 'metadata'}（load_and_split / iter_chunks 的输出格式）
+        """
+        tokens = self.tokenizer(chunk["text"])
+        doc_id = len(self._doc_lengths)
+        
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for term, tf in counts.items():
+            self._postings.setdefault(term, []).append((doc_id, tf))
+        
+        self._doc_lengths.append(len(tokens))
+        self._docs.append(json.dumps({"text": chunk["text"], "metadata": chunk.get("metadata", {})},
+                                     ensure_ascii=False, default=str).encode("utf-8"))
+        
+        if len(self._doc_lengths) >= self.max_buffer_docs:
+            self.flush()
+    
+    def add_all(self, chunks: Iterable[Dict]) -> int:
+        """
+        加入分块流并写出缓冲
+        
+        Returns:
+            加入的分块数
+        """
+        count = 0
+        for chunk in chunks:
+            self.add(chunk)
+            count += 1
+        self.flush()
+        return count
+    
+    def tee(self, chunks: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        边建索引边透传分块（与向量化等下游步骤共用同一个分块流）
+        
+        Yields:
+            原样输出的分块
+        """
+        try:
+            for chunk in chunks:
+                self.add(chunk)
+                yield chunk
+        finally:
+            self.flush()
+    
+    def flush(self):
+        """把缓冲写出为一个新段并原子更新清单"""
+        if not self._doc_lengths:
+            return
+        
+        name = f"seg_{self.manifest['next_segment']:06d}"
+        prefix = self.index_dir / name
+        
+        terms = sorted(self._postings)
+        term_info = np.zeros((len(terms), 3), dtype=np.int64)
+        offset = 0
+        with open(prefix.with_suffix(".post"), "wb") as f:
+            for i, term in enumerate(terms):
+                entries = self._postings[term]
+                doc_ids = np.fromiter((d for d, _ in entries), dtype=np.int64, count=len(entries))
+                tfs = np.fromiter((t for _, t in entries), dtype=np.int64, count=len(entries))
+                # 文档编号差分后与词频一起 varint 编码
+                encoded = varint_encode(np.concatenate((np.diff(doc_ids, prepend=0), tfs)))
+                f.write(encoded)
+                term_info[i] = (offset, len(encoded), len(entries))
+                offset += len(encoded)
+        
+        (prefix.with_suffix(".terms")).write_text("\n".join(terms), encoding="utf-8")
+        np.save(prefix.with_suffix(".tinfo.npy"), term_info)
+        np.save(prefix.with_suffix(".dl.npy"), np.asarray(self._doc_lengths, dtype=np.uint32))
+        
+        offsets = np.zeros(len(self._docs) + 1, dtype=np.int64)
+        with open(prefix.with_suffix(".store"), "wb") as f:
+            for i, doc in enumerate(self._docs):
+                f.write(doc)
+                offsets[i + 1] = offsets[i] + len(doc)
+        np.save(prefix.with_suffix(".offsets.npy"), offsets)
+        
+        self.manifest["segments"].append({
+            "name": name,
+            "num_docs": len(self._doc_lengths),
+            "total_length": int(sum(self._doc_lengths))
+        })
+        self.manifest["next_segment"] += 1
+        _write_manifest(self.index_dir, self.manifest)
+        
+        logger.info(f"💾 BM25 索引段已写出: {name}（{len(self._doc_lengths)} 个分块，{len(terms)} 个词项）")
+        
+        self._postings = {}
+        self._doc_lengths = []
+        self._docs = []
+
+
+class BM25Index:
+    """BM25 查询端（各段内存映射加载，refresh 后可见新追加的段）"""
+    
+    def __init__(self,
+                 index_dir: str,
+                 k1: float = 1.2,
+                 b: float = 0.75,
+                 tokenizer: Callable[[str], List[str]] = tokenize):
+        """
+        打开索引
+        
+        Args:
+            index_dir: 索引目录
+            k1: 词频饱和参数
+            b: 文档长度归一化参数
+            tokenizer: 分词函数（需与写入端一致）
+        """
+        self.index_dir = Path(index_dir)
+        self.k1 = k1
+        self.b = b
+        self.tokenizer = tokenizer
+        self.segments: List[_Segment] = []
+        # 各段文档长度归一化项缓存（平均长度随追加段变化，refresh 时清空）
+        self._norms: Dict[str, np.ndarray] = {}
+        self.refresh()
+    
+    def refresh(self):
+        """重新读取清单，加载新追加的段"""
+        manifest = _read_manifest(self.index_dir)
+        loaded = {segment.name for segment in self.segments}
+        for entry in manifest["segments"]:
+            if entry["name"] not in loaded:
+                self.segments.append(_Segment(self.index_dir, entry["name"]))
+        
+        self.num_docs = sum(entry["num_docs"] for entry in manifest["segments"])
+        total_length = sum(entry["total_length"] for entry in manifest["segments"])
+        self.avg_length = total_length / self.num_docs if self.num_docs else 0.0
+        self._norms = {}
+    
+    def _norm(self, segment: _Segment) -> np.ndarray:
+        """k1 · (1 - b + b · dl / avgdl)"""
+        norm = self._norms.get(segment.name)
+        if norm is None:
+            norm = self.k1 * (1 - self.b + self.b * np.asarray(segment.doc_lengths, dtype=np.float32) / self.avg_length)
+            self._norms[segment.name] = norm
+        return norm
+    
+    def search(self, query: str, top_k: int = 10) -> List[Dict]:
+        """
+        BM25 检索
+        
+        Args:
+            query: 查询文本
+            top_k: 返回结果数
+        
+        Returns:
+            [{'score', 'text', 'metadata'}]，按得分降序
+        """
+        terms = list(dict.fromkeys(self.tokenizer(query)))
+        if not terms or not self.num_docs:
+            return []
+        
+        # 全局文档频率（跨段汇总）
+        idf = {}
+        for term in terms:
+            df = sum(segment.doc_freq(term) for segment in self.segments)
+            if df:
+                idf[term] = np.log(1.0 + (self.num_docs - df + 0.5) / (df + 0.5))
+        
+        candidates = []
+        for seg_idx, segment in enumerate(self.segments):
+            scores = None
+            for term, weight in idf.items():
+                doc_ids, tfs = segment.postings_of(term)
+                if not len(doc_ids):
+                    continue
+                if scores is None:
+                    scores = np.zeros(segment.num_docs, dtype=np.float32)
+                    norm = self._norm(segment)
+                scores[doc_ids] += weight * tfs * (self.k1 + 1) / (tfs + norm[doc_ids])
+            
+            if scores is None:
+                continue
+            
+            hits = np.flatnonzero(scores)
+            if len(hits) > top_k:
+                hits = hits[np.argpartition(-scores[hits], top_k)[:top_k]]
+            candidates.extend((float(scores[i]), seg_idx, int(i)) for i in hits)
+        
+        candidates.sort(key=lambda c: -c[0])
+        results = []
+        for score, seg_idx, doc_id in candidates[:top_k]:
+            doc = self.segments[seg_idx].document(doc_id)
+            doc["score"] = score
+            results.append(doc)
+        return results
+    
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+        self.segments = []
+
+
+def _read_manifest(index_dir: Path) -> Dict:
+    """读取索引清单（不存在时返回空清单）"""
+    path = index_dir / "manifest.json"
+    if not path.exists():
+        return {"version": INDEX_VERSION, "segments": [], "next_segment": 0}
+    
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != INDEX_VERSION:
+        raise ValueError(f"不支持的索引版本: {manifest.get('version')}（当前 {INDEX_VERSION}）")
+    return manifest
+
+
+def _write_manifest(index_dir: Path, manifest: Dict):
+    """原子写入清单（先写临时文件再替换），读端不会看到写了一半的段列表"""
+    tmp_path = index_dir / "manifest.json.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, index_dir / "manifest.json")
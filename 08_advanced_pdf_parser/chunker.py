@@ -0,0 +1,286 @@
+"""
+结构感知分块模块
+按阅读顺序流式消费文本块与表格，整块装入块大小预算，超长文本块按句子切分、超长表格按行切分，
+块大小可按字符或可插拔分词器的 token 计数
+"""
+
+import re
+import logging
+from dataclasses import dataclass
+from typing import List, Dict, Tuple, Iterable, Iterator, Callable, Optional, Sequence
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 句末标点（中文标点后直接断开，英文标点后需跟空白）
+_SENTENCE_SPLIT = re.compile(r"(?<=[。！？；])|(?<=[.!?;])\s+|\n+")
+_CJK_PUNCT = "。！？；，、：”’）》"
+
+
+def table_rows(table) -> Tuple[str, List[str]]:
+    """
+    表格 DataFrame → 文本行
+    
+    Returns:
+        (表头行, 数据行)，单元格以 ' | ' 分隔
+    """
+    def cell(value) -> str:
+        if value is None or (isinstance(value, float) and value != value):
+            return ""
+        return str(value).replace("\n", " ")
+    
+    table = table.fillna("")
+    header = " | ".join(cell(c) for c in table.columns)
+    rows = [" | ".join(cell(v) for v in row) for row in table.itertuples(index=False)]
+    return header, rows
+
+
+@dataclass
+class _Unit:
+    """分块的最小装箱单位（整块、句子或表格行组）"""
+    text: str
+    page: int
+    bbox: Optional[Tuple[float, float, float, float]]
+    block_type: str
+    block_id: int  # 来源元素编号，同一元素切出的单位之间用 sep 连接
+    sep: str
+    size: int
+    start: int  # 在文档文本流中的起始字符偏移
+
+
+class StructuredChunker:
+    """流式结构感知分块器"""
+    
+    BLOCK_SEPARATOR = "\n\n"
+    
+    def __init__(self,
+                 chunk_size: int = 1000,
+                 chunk_overlap: int = 200,
+                 tokenizer: Optional[Callable[[str], Sequence]] = None,
+                 title_break_ratio: float = 0.5):
+        """
+        初始化分块器
+        
+        Args:
+            chunk_size: 块大小上限（字符数；指定 tokenizer 时为 token 数）
+            chunk_overlap: 相邻块重叠上限，以整句/整块为单位回带，需小于 chunk_size
+            tokenizer: 分词函数 text -> tokens（如 tiktoken 的 encode），None 表示按字符计数
+            title_break_ratio: 当前块已达到该比例时，遇到标题先结束当前块
+        """
+        if chunk_size <= 0:
+            raise ValueError(f"chunk_size 必须为正数: {chunk_size}")
+        if chunk_overlap < 0 or chunk_overlap >= chunk_size:
+            raise ValueError(f"chunk_overlap 需满足 0 <= chunk_overlap < chunk_size: {chunk_overlap}")
+        
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.tokenizer = tokenizer
+        self.title_break_ratio = title_break_ratio
+        self._separator_size = self.length(self.BLOCK_SEPARATOR)
+    
+    def length(self, text: str) -> int:
+        """文本大小（字符数或 token 数）"""
+        if self.tokenizer is None:
+            return len(text)
+        return len(self.tokenizer(text))
+    
+    def _hard_split(self, text: str, limit: Optional[int] = None) -> List[str]:
+        """无句子边界可用时按大小硬切（token 模式按比例估算切点后收缩），limit 默认为块大小"""
+        limit = limit or self.chunk_size
+        pieces = []
+        while text:
+            size = self.length(text)
+            if size <= limit:
+                pieces.append(text)
+                break
+            cut = max(1, len(text) * limit // size)
+            while cut > 1 and self.length(text[:cut]) > limit:
+                cut = max(1, cut * 9 // 10)
+            pieces.append(text[:cut])
+            text = text[cut:]
+        return pieces
+    
+    def _split_sentences(self, text: str) -> List[Tuple[str, str]]:
+        """
+        文本 → 不超过块大小的句子
+        
+        Returns:
+            [(句子, 与前一句的连接符)]
+        """
+        result = []
+        for sentence in _SENTENCE_SPLIT.split(text):
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+            for piece in self._hard_split(sentence):
+                if not result:
+                    sep = ""
+                elif result[-1][0][-1] in _CJK_PUNCT or not piece[0].isascii():
+                    sep = ""
+                else:
+                    sep = " "
+                result.append((piece, sep))
+        return result
+    
+    def _element_pieces(self, element) -> Iterator[Tuple[str, str, int, Optional[Tuple], str]]:
+        """
+        元素 → 装箱片段
+        
+        Yields:
+            (文本, 连接符, 页码, bbox, 块类型)，同一元素内连续片段共享元素编号
+        """
+        if hasattr(element, "block_type"):
+            text = element.text.strip()
+            if not text:
+                return
+            if self.length(text) <= self.chunk_size:
+                yield text, "", element.page, element.bbox, element.block_type
+                return
+            for sentence, sep in self._split_sentences(text):
+                yield sentence, sep, element.page, element.bbox, element.block_type
+            return
+        
+        # 表格（DataFrame）：整表放得下则整表，否则按行分组，每组重复表头；
+        # 行组预算为块大小减去表头，放不下的单行按剩余预算硬切。表头本身占满块大小时不再重复表头
+        page = element.attrs.get("page", 0)
+        bbox = element.attrs.get("bbox")
+        header, rows = table_rows(element)
+        text = "\n".join([header] + rows)
+        if self.length(text) <= self.chunk_size:
+            yield text, "", page, bbox, "table"
+            return
+        
+        prefix = [header]
+        budget = self.chunk_size - self.length(header) - 1
+        if budget <= 0:
+            prefix, rows, budget = [], [header] + rows, self.chunk_size
+        
+        group, group_size = [], 0
+        for row in rows:
+            for piece in self._hard_split(row, budget):
+                piece_size = self.length(piece)
+                if group and group_size + 1 + piece_size > budget:
+                    yield "\n".join(prefix + group), self.BLOCK_SEPARATOR, page, bbox, "table"
+                    group, group_size = [], 0
+                group_size += piece_size + (1 if group else 0)
+                group.append(piece)
+        if group:
+            yield "\n".join(prefix + group), self.BLOCK_SEPARATOR, page, bbox, "table"
+    
+    def _units(self, elements: Iterable) -> Iterator[_Unit]:
+        """元素流 → 装箱单位流，同时累计文档文本流中的字符偏移"""
+        offset = 0
+        for block_id, element in enumerate(elements):
+            first = True
+            for text, sep, page, bbox, block_type in self._element_pieces(element):
+                if first:
+                    sep = self.BLOCK_SEPARATOR
+                    if offset:
+                        offset += len(sep)
+                else:
+                    offset += len(sep)
+                yield _Unit(text, page, bbox, block_type, block_id, sep,
+                            self.length(text), offset)
+                offset += len(text)
+                first = False
+    
+    def _size(self, units: List[_Unit]) -> int:
+        """单位列表连接后的大小（连接符按块分隔符估算）"""
+        if not units:
+            return 0
+        return sum(u.size for u in units) + self._separator_size * (len(units) - 1)
+    
+    def _emit(self, units: List[_Unit], chunk_id: int, source: Optional[str]) -> Dict:
+        """单位列表 → 块字典"""
+        parts = [units[0].text]
+        for prev, unit in zip(units, units[1:]):
+            sep = unit.sep if unit.block_id == prev.block_id else self.BLOCK_SEPARATOR
+            parts.append(sep)
+            parts.append(unit.text)
+        
+        pages = sorted({u.page for u in units})
+        block_types = list(dict.fromkeys(u.block_type for u in units))
+        bboxes = []
+        for unit in units:
+            entry = (unit.page, unit.bbox)
+            if unit.bbox is not None and (not bboxes or bboxes[-1] != entry):
+                bboxes.append(entry)
+        
+        metadata = {
+            "chunk_id": chunk_id,
+            "page": pages[0],
+            "pages": pages,
+            "block_types": block_types,
+            "bboxes": bboxes,
+            "start_char": units[0].start,
+            "end_char": units[-1].start + len(units[-1].text),
+            "size": self._size(units)
+        }
+        if source is not None:
+            metadata = {"source": source, **metadata}
+        
+        return {"text": "".join(parts), "metadata": metadata}
+    
+    def _overlap(self, units: List[_Unit]) -> List[_Unit]:
+        """从块尾回带的整句/整块（总大小不超过 chunk_overlap）"""
+        carried = []
+        size = 0
+        for unit in reversed(units):
+            added = unit.size + (self._separator_size if carried else 0)
+            if size + added > self.chunk_overlap:
+                break
+            carried.insert(0, unit)
+            size += added
+        return carried
+    
+    def chunk(self, elements: Iterable, source: Optional[str] = None) -> Iterator[Dict]:
+        """
+        流式分块
+        
+        Args:
+            elements: 按阅读顺序排列的元素（TextBlock 或 attrs 中带 page/bbox 的表格 DataFrame），可为生成器
+            source: 写入 metadata 的来源名称
+        
+        Yields:
+            {'text': 块文本, 'metadata': {chunk_id, page, pages, block_types, bboxes, start_char, end_char, size}}
+        """
+        current: List[_Unit] = []
+        carried = 0  # current 开头来自上一块的回带单位数
+        chunk_id = 0
+        
+        for unit in self._units(elements):
+            starts_section = unit.block_type == "title" and unit.sep == self.BLOCK_SEPARATOR
+            overflow = self._size(current + [unit]) > self.chunk_size
+            section_break = (starts_section and len(current) > carried
+                             and self._size(current) >= self.chunk_size * self.title_break_ratio)
+            
+            if len(current) > carried and (overflow or section_break):
+                # 块尾的标题随后续正文进入下一块，不单独留在块尾
+                tail = []
+                while len(current) > carried + 1 and current[-1].block_type == "title":
+                    tail.insert(0, current.pop())
+                
+                yield self._emit(current, chunk_id, source)
+                chunk_id += 1
+                
+                carry = [] if section_break else self._overlap(current)
+                current, carried = carry + tail, len(carry)
+            
+            # 回带单位放不下时从前往后丢弃
+            while carried and self._size(current + [unit]) > self.chunk_size:
+                current.pop(0)
+                carried -= 1
+            
+            # 标题与下一单位合计仍超限时，标题单独成块
+            if current and self._size(current + [unit]) > self.chunk_size:
+                yield self._emit(current, chunk_id, source)
+                chunk_id += 1
+                current = []
+            
+            current.append(unit)
+        
+        if len(current) > carried:
+            yield self._emit(current, chunk_id, source)
+            chunk_id += 1
+        
+        logger.info(f"✅ 分块完成，共 {chunk_id} 个块")
@@ -0,0 +1,333 @@
+"""
+自适应并发控制模块
+批量处理时周期性采样系统 CPU 利用率、内存占用与各阶段排队深度，动态调整同时处理的文档数
+以及 OCR / 表格阶段的并发数：内存超过上限时成倍收缩，CPU 未跑满且有积压时逐个增加（AIMD），
+每次调整记录决策日志供调参。阶段闸门只约束本进程中的阶段：文档交给 DocumentSandbox 子进程解析时
+阶段不经过闸门（其排队深度恒为 0），子进程数（pool_size）即各阶段并发上限
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Dict, Tuple, Callable, Iterable, Iterator, Optional, Any
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class _Gate:
+    """上限可动态调整的并发闸门（记录运行数与排队数）"""
+    
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+    
+    def acquire(self):
+        with self._cond:
+            self.waiting += 1
+            try:
+                while self.active >= self.limit:
+                    self._cond.wait()
+            finally:
+                self.waiting -= 1
+            self.active += 1
+    
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+    
+    def resize(self, limit: int):
+        """调整上限：增大时立即放行排队者，减小时不打断运行中的任务，随任务结束逐步生效"""
+        with self._cond:
+            self.limit = limit
+            self._cond.notify_all()
+    
+    def __enter__(self):
+        self.acquire()
+        return self
+    
+    def __exit__(self, *exc):
+        self.release()
+
+
+def _read_cpu_times() -> Optional[Tuple[int, int]]:
+    """/proc/stat 中的 (空闲, 总计) CPU 时间"""
+    try:
+        with open("/proc/stat") as f:
+            values = [int(v) for v in f.readline().split()[1:]]
+    except (OSError, ValueError):
+        return None
+    idle = values[3] + (values[4] if len(values) > 4 else 0)
+    return idle, sum(values)
+
+
+def _read_memory_fraction() -> Optional[float]:
+    """/proc/meminfo 中已用内存比例（1 - MemAvailable / MemTotal）"""
+    try:
+        info = {}
+        with open("/proc/meminfo") as f:
+            for line in f:
+                key, value = line.split(":", 1)
+                info[key] = int(value.split()[0])
+        return 1.0 - info["MemAvailable"] / info["MemTotal"]
+    except (OSError, KeyError, ValueError, ZeroDivisionError):
+        return None
+
+
+class SystemSampler:
+    """系统 CPU 与内存采样（优先使用 psutil，否则读取 /proc，均不可用时退回负载均值）"""
+    
+    def __init__(self):
+        try:
+            import psutil
+            self._psutil = psutil
+            psutil.cpu_percent(interval=None)  # 建立基准
+        except ImportError:
+            self._psutil = None
+        self._last_cpu = _read_cpu_times()
+    
+    def cpu(self) -> float:
+        """自上次采样以来的系统 CPU 利用率（0~1）"""
+        if self._psutil is not None:
+            return self._psutil.cpu_percent(interval=None) / 100.0
+        
+        current = _read_cpu_times()
+        if current is not None and self._last_cpu is not None:
+            idle = current[0] - self._last_cpu[0]
+            total = current[1] - self._last_cpu[1]
+            self._last_cpu = current
+            return 1.0 - idle / total if total > 0 else 0.0
+        
+        if hasattr(os, "getloadavg"):
+            return min(os.getloadavg()[0] / (os.cpu_count() or 1), 1.0)
+        return 0.0
+    
+    def memory(self) -> float:
+        """系统已用内存比例（0~1）"""
+        if self._psutil is not None:
+            return self._psutil.virtual_memory().percent / 100.0
+        fraction = _read_memory_fraction()
+        return fraction if fraction is not None else 0.0
+
+
+class ConcurrencyController:
+    """批量处理的自适应并发控制器"""
+    
+    STAGES = ("tables", "ocr")
+    
+    def __init__(self,
+                 min_workers: int = 1,
+                 max_workers: Optional[int] = None,
+                 initial_workers: Optional[int] = None,
+                 memory_ceiling: float = 0.85,
+                 memory_margin: float = 0.05,
+                 target_cpu: float = 0.9,
+                 interval: float = 2.0,
+                 cooldown: int = 3,
+                 stage_caps: Optional[Dict[str, int]] = None,
+                 log_path: Optional[str] = None,
+                 sampler: Optional[SystemSampler] = None):
+        """
+        初始化控制器
+        
+        Args:
+            min_workers: 同时处理文档数下限
+            max_workers: 同时处理文档数上限（默认 CPU 核数；使用 DocumentSandbox 时不应超过其 pool_size）
+            initial_workers: 初始文档并发数（默认 min_workers）
+            memory_ceiling: 系统内存占用上限（比例），超出时文档与 OCR / 表格并发数减半
+            memory_margin: 距上限不足该比例时不再增加并发
+            target_cpu: 目标 CPU 利用率，低于该值且有排队时增加并发
+            interval: 采样与调整间隔（秒）
+            cooldown: 收缩后暂停增加的采样周期数（避免来回振荡）
+            stage_caps: 阶段并发数的固定上限 {'ocr': 1}（如 OCR 后端不能被多个线程同时调用），
+                        调整时不会超过；也可用 cap_stage 设置
+            log_path: 决策日志（JSONL）路径，None 表示只写入 logger 与内存中的 decisions
+            sampler: 系统采样器
+        """
+        self.min_workers = max(1, min_workers)
+        self.max_workers = max(self.min_workers, max_workers or os.cpu_count() or 1)
+        initial = initial_workers or self.min_workers
+        self.memory_ceiling = memory_ceiling
+        self.memory_margin = memory_margin
+        self.target_cpu = target_cpu
+        self.interval = interval
+        self.cooldown = cooldown
+        self.log_path = log_path
+        self.sampler = sampler or SystemSampler()
+        
+        self.documents = _Gate(min(max(initial, self.min_workers), self.max_workers))
+        self.stage_caps: Dict[str, int] = {}
+        self.stages: Dict[str, _Gate] = {stage: _Gate(self.documents.limit) for stage in self.STAGES}
+        for stage, cap in (stage_caps or {}).items():
+            self.cap_stage(stage, cap)
+        self.decisions: deque = deque(maxlen=1000)
+        self._hold = 0
+        self._queued = 0  # 已提交但尚未开始的文档数（由 map 维护）
+        self._queued_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    @contextmanager
+    def stage(self, name: str):
+        """阶段并发闸门（未受控的阶段直接放行）"""
+        gate = self.stages.get(name)
+        if gate is None:
+            yield
+            return
+        with gate:
+            yield
+    
+    def cap_stage(self, name: str, cap: int):
+        """
+        为阶段设置固定的并发上限（AIMD 调整不会超过该值）
+        
+        Args:
+            name: 阶段名称（'tables' 或 'ocr'）
+            cap: 并发上限（≥ 1）
+        """
+        if name not in self.stages:
+            raise ValueError(f"未知的阶段: {name}（可选: {list(self.STAGES)}）")
+        self.stage_caps[name] = max(1, cap)
+        gate = self.stages[name]
+        if gate.limit > self.stage_caps[name]:
+            gate.resize(self.stage_caps[name])
+    
+    def limits(self) -> Dict[str, int]:
+        """当前并发上限 {'documents', 'tables', 'ocr'}"""
+        return {"documents": self.documents.limit, **{k: g.limit for k, g in self.stages.items()}}
+    
+    def queues(self) -> Dict[str, int]:
+        """当前排队深度 {'documents', 'tables', 'ocr'}（沙箱解析时阶段不经过本进程的闸门，恒为 0）"""
+        return {"documents": self.documents.waiting + self._queued,
+                **{k: g.waiting for k, g in self.stages.items()}}
+    
+    def step(self) -> Dict:
+        """
+        采样一次并调整并发上限
+        
+        Returns:
+            决策记录 {'time', 'cpu', 'memory', 'active', 'queues', 'limits', 'action', 'reason'}
+        """
+        cpu, memory = self.sampler.cpu(), self.sampler.memory()
+        queues = self.queues()
+        limits = self.limits()
+        action, reason = "hold", "steady"
+        
+        if memory >= self.memory_ceiling:
+            # 乘性收缩：已在运行的文档不被打断，随其结束逐步降到新上限
+            self.documents.resize(max(self.min_workers, self.documents.limit // 2))
+            for gate in self.stages.values():
+                gate.resize(max(1, gate.limit // 2))
+            self._hold = self.cooldown
+            action, reason = "decrease", f"内存 {memory:.0%} 超过上限 {self.memory_ceiling:.0%}"
+        elif self._hold > 0:
+            self._hold -= 1
+            reason = "收缩后冷却"
+        elif memory >= self.memory_ceiling - self.memory_margin:
+            reason = f"内存 {memory:.0%} 接近上限"
+        elif cpu < self.target_cpu:
+            grown = []
+            if queues["documents"] > 0 and self.documents.limit < self.max_workers:
+                self.documents.resize(self.documents.limit + 1)
+                grown.append("documents")
+            for name, gate in self.stages.items():
+                if queues[name] > 0 and gate.limit < min(self.documents.limit,
+                                                         self.stage_caps.get(name, self.max_workers)):
+                    gate.resize(gate.limit + 1)
+                    grown.append(name)
+            if grown:
+                action, reason = "increase", f"CPU {cpu:.0%} 低于目标且有排队: {grown}"
+            else:
+                reason = "无排队"
+        else:
+            reason = f"CPU {cpu:.0%} 已达目标"
+        
+        decision = {
+            "time": round(time.time(), 3),
+            "cpu": round(cpu, 3),
+            "memory": round(memory, 3),
+            "active": {"documents": self.documents.active, **{k: g.active for k, g in self.stages.items()}},
+            "queues": queues,
+            "limits": self.limits(),
+            "action": action,
+            "reason": reason
+        }
+        self.decisions.append(decision)
+        
+        if decision["limits"] != limits:
+            level = logging.WARNING if action == "decrease" else logging.INFO
+            logger.log(level, f"🎛️ 并发调整 {limits} → {decision['limits']}（{reason}）")
+        if self.log_path:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(decision, ensure_ascii=False) + "\n")
+        return decision
+    
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.step()
+            except Exception as e:
+                logger.error(f"❌ 并发控制采样失败: {e}")
+    
+    def start(self):
+        """启动后台采样线程"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="concurrency-controller", daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        """停止后台采样线程"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+    
+    def map(self, func: Callable, items: Iterable) -> Iterator[Tuple[Any, Any, Optional[BaseException]]]:
+        """
+        在受控并发下对每个条目执行 func（按完成顺序产出）
+        
+        线程池按 max_workers 创建，实际同时执行数由文档闸门的当前上限决定
+        
+        Yields:
+            (条目, 返回值, 异常)
+        """
+        items = list(items)
+        
+        def run(item):
+            with self._queued_lock:
+                self._queued -= 1
+            with self.documents:
+                return func(item)
+        
+        self._queued = len(items)
+        self.start()
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="doc") as executor:
+                futures = {executor.submit(run, item): item for item in items}
+                for future in as_completed(futures):
+                    error = future.exception()
+                    yield futures[future], (None if error else future.result()), error
+        finally:
+            self.stop()
+            self._queued = 0
+    
+    def summary(self) -> Dict:
+        """决策汇总 {'limits', 'decisions', 'increases', 'decreases', 'peak_memory', 'mean_cpu'}"""
+        decisions = list(self.decisions)
+        return {
+            "limits": self.limits(),
+            "decisions": len(decisions),
+            "increases": sum(d["action"] == "increase" for d in decisions),
+            "decreases": sum(d["action"] == "decrease" for d in decisions),
+            "peak_memory": max((d["memory"] for d in decisions), default=None),
+            "mean_cpu": round(sum(d["cpu"] for d in decisions) / len(decisions), 3) if decisions else None
+        }
@@ -0,0 +1,159 @@
+"""
+解析时限模块
+为单个文档及各处理阶段（表格、版面、OCR）设置时限：阶段在独立的守护线程中运行，由调用方等待，
+超时后放弃该阶段并继续后续阶段。线程无法被强制终止，被放弃的阶段仍在后台运行到自行结束：
+调用方不应再把该阶段使用的模块交给其他文档（AdvancedPDFLoader 会重建该模块），
+需要真正回收卡死阶段时在 DocumentSandbox 子进程中解析（放弃过阶段的子进程返回结果后即被结束）
+"""
+
+import time
+import logging
+import threading
+import contextlib
+from typing import Dict, List, Set, Callable, ContextManager, Optional, Any
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+STAGES = ("tables", "layout", "ocr")
+
+# 被放弃但仍在运行的阶段线程（进程内全局）
+_abandoned_lock = threading.Lock()
+_abandoned: Set[threading.Thread] = set()
+
+
+def abandoned_threads() -> int:
+    """当前进程中被放弃但仍在运行的阶段线程数"""
+    with _abandoned_lock:
+        return len(_abandoned)
+
+
+class StageDeadlines:
+    """单个文档的阶段时限控制（每个文档新建一个实例）"""
+    
+    def __init__(self,
+                 document_timeout: Optional[float] = None,
+                 stage_timeouts: Optional[Dict[str, float]] = None):
+        """
+        初始化时限
+        
+        Args:
+            document_timeout: 整个文档的时限（秒），None 表示不限；
+                              每个阶段实际可用时间为阶段时限与文档剩余时间中的较小值
+            stage_timeouts: 各阶段时限（秒）{'tables': 60, 'layout': 30, 'ocr': 300}，未列出的阶段不限
+        """
+        unknown = set(stage_timeouts or {}) - set(STAGES)
+        if unknown:
+            raise ValueError(f"未知的阶段: {sorted(unknown)}（可选: {list(STAGES)}）")
+        
+        self.document_timeout = document_timeout
+        self.stage_timeouts = dict(stage_timeouts or {})
+        self.started = time.monotonic()
+        
+        self.timed_out: List[str] = []
+        self.abandoned: List[str] = []  # 超时时线程仍在运行的阶段（timed_out 的子集）
+        self.stage_seconds: Dict[str, float] = {}
+    
+    @property
+    def enabled(self) -> bool:
+        """是否设置了任何时限"""
+        return self.document_timeout is not None or bool(self.stage_timeouts)
+    
+    def remaining(self) -> Optional[float]:
+        """文档剩余时间（秒），未设置文档时限时返回 None"""
+        if self.document_timeout is None:
+            return None
+        return max(self.document_timeout - (time.monotonic() - self.started), 0.0)
+    
+    def budget(self, stage: str) -> Optional[float]:
+        """阶段可用时间：阶段时限与文档剩余时间中的较小值，均未设置时返回 None"""
+        limits = [t for t in (self.stage_timeouts.get(stage), self.remaining()) if t is not None]
+        return min(limits) if limits else None
+    
+    def run(self, stage: str, func: Callable, *args,
+            hold: Optional[ContextManager] = None, **kwargs) -> Any:
+        """
+        在时限内执行一个阶段
+        
+        未设置时限时直接在当前线程执行；否则在守护线程中执行，超时后不再等待（线程无法强制终止，
+        会在后台继续运行直到自行结束，其结果被丢弃），阶段记入 timed_out 与 abandoned 并返回 None。
+        阶段自身抛出的异常原样抛给调用方
+        
+        Args:
+            stage: 阶段名称
+            func: 阶段函数
+            hold: 阶段占用的资源（如并发闸门），在开始计时前进入，阶段函数实际结束时才退出——
+                  阶段被放弃时由后台线程结束时退出，资源占用不会少算
+        
+        Returns:
+            阶段函数的返回值，超时返回 None
+        """
+        hold = hold if hold is not None else contextlib.nullcontext()
+        hold.__enter__()
+        budget = self.budget(stage)
+        start = time.perf_counter()
+        
+        if budget is None:
+            try:
+                return func(*args, **kwargs)
+            finally:
+                hold.__exit__(None, None, None)
+                self.stage_seconds[stage] = round(time.perf_counter() - start, 3)
+        
+        if budget <= 0:
+            hold.__exit__(None, None, None)
+            logger.warning(f"⏰ 文档时限已用尽，跳过阶段: {stage}")
+            self.timed_out.append(stage)
+            self.stage_seconds[stage] = 0.0
+            return None
+        
+        outcome: Dict[str, Any] = {}
+        
+        def target():
+            try:
+                outcome["value"] = func(*args, **kwargs)
+            except BaseException as e:
+                outcome["error"] = e
+            finally:
+                hold.__exit__(None, None, None)
+                # 与调用方的放弃判定互斥：已登记为放弃的线程结束时注销
+                with _abandoned_lock:
+                    outcome["done"] = True
+                    _abandoned.discard(threading.current_thread())
+        
+        worker = threading.Thread(target=target, name=f"stage-{stage}", daemon=True)
+        worker.start()
+        worker.join(budget)
+        self.stage_seconds[stage] = round(time.perf_counter() - start, 3)
+        
+        with _abandoned_lock:
+            abandoned = not outcome.get("done")
+            if abandoned:
+                _abandoned.add(worker)
+        
+        if abandoned:
+            logger.warning(f"⏰ 阶段 {stage} 超过时限 {budget:.1f} 秒，已放弃"
+                           f"（后台线程结束前仍占用资源，当前共 {abandoned_threads()} 个被放弃的阶段线程）")
+            self.timed_out.append(stage)
+            self.abandoned.append(stage)
+            return None
+        
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome.get("value")
+    
+    def report(self) -> Dict:
+        """
+        写入结果 metadata 的时限信息
+        
+        Returns:
+            {'partial', 'timed_out', 'abandoned', 'stage_seconds', 'document_timeout', 'stage_timeouts'}
+        """
+        return {
+            "partial": bool(self.timed_out),
+            "timed_out": list(self.timed_out),
+            "abandoned": list(self.abandoned),
+            "stage_seconds": dict(self.stage_seconds),
+            "document_timeout": self.document_timeout,
+            "stage_timeouts": dict(self.stage_timeouts)
+        }
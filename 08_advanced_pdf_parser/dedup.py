@@ -0,0 +1,423 @@
+"""
+近重复分块去重模块
+字符 shingle → MinHash 签名 → LSH 分桶检索候选 → 签名估计相似度确认，
+在向量化之前折叠文档内（及可选的跨批次持久索引中）近似重复的分块
+"""
+
+import re
+import json
+import time
+import zlib
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import List, Dict, Tuple, Iterable, Iterator, Optional
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_WHITESPACE = re.compile(r"\s+")
+
+
+class ChunkDeduplicator:
+    """MinHash/LSH 近重复分块去重器"""
+    
+    def __init__(self,
+                 threshold: float = 0.85,
+                 num_perm: int = 128,
+                 bands: int = 16,
+                 shingle_size: int = 5,
+                 index_path: Optional[str] = None,
+                 seed: int = 1):
+        """
+        初始化去重器
+        
+        Args:
+            threshold: 判定为重复的最低估计 Jaccard 相似度
+            num_perm: MinHash 置换数（签名长度）
+            bands: LSH 分段数（每段 num_perm / bands 行，段数越多召回越高、候选越多）
+            shingle_size: 字符 shingle 长度（按字符切分，中英文通用）
+            index_path: 跨批次持久索引路径（SQLite），None 表示只在文档内去重
+            seed: 置换参数随机种子（持久索引要求前后一致）
+        """
+        if num_perm % bands != 0:
+            raise ValueError(f"num_perm ({num_perm}) 必须能被 bands ({bands}) 整除")
+        
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.seed = seed
+        
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+        
+        # 最近一次 dedup 调用的统计与累计避免的向量化次数
+        self.last_stats: Dict = {}
+        self.total_avoided = 0
+        
+        self._lock = threading.Lock()
+        self._conn = None
+        if index_path:
+            self._open_index(Path(index_path))
+    
+    def _open_index(self, index_path: Path):
+        """打开持久索引，并校验签名参数与已有索引一致"""
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(index_path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS dedup_meta ("
+            "  key TEXT PRIMARY KEY,"
+            "  value TEXT NOT NULL"
+            ")"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunk_signatures ("
+            "  id INTEGER PRIMARY KEY,"
+            "  source TEXT NOT NULL,"
+            "  chunk_id INTEGER NOT NULL,"
+            "  signature BLOB NOT NULL,"
+            "  created REAL NOT NULL"
+            ")"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunk_bands ("
+            "  band INTEGER NOT NULL,"
+            "  key BLOB NOT NULL,"
+            "  sig_id INTEGER NOT NULL"
+            ")"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunk_duplicates ("
+            "  source TEXT NOT NULL,"
+            "  chunk_id INTEGER NOT NULL,"
+            "  canonical_id INTEGER NOT NULL,"
+            "  similarity REAL NOT NULL,"
+            "  signature BLOB,"
+            "  chunk TEXT,"
+            "  PRIMARY KEY (source, chunk_id)"
+            ")"
+        )
+        # 旧索引的重复记录没有签名与分块内容，补齐列（这些旧记录的规范块消失时无法重新收录）
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(chunk_duplicates)")}
+        for column, kind in (("signature", "BLOB"), ("chunk", "TEXT")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE chunk_duplicates ADD COLUMN {column} {kind}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunk_bands ON chunk_bands(band, key)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunk_bands_sig ON chunk_bands(sig_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunk_source ON chunk_signatures(source)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunk_canonical ON chunk_duplicates(canonical_id)")
+        
+        params = f"{self.num_perm}/{self.bands}/{self.shingle_size}/{self.seed}"
+        row = self._conn.execute("SELECT value FROM dedup_meta WHERE key = 'params'").fetchone()
+        if row is None:
+            self._conn.execute("INSERT INTO dedup_meta (key, value) VALUES ('params', ?)", (params,))
+        elif row[0] != params:
+            self._conn.close()
+            self._conn = None
+            raise ValueError(f"去重索引参数不一致: 索引为 {row[0]}，当前为 {params}")
+        self._conn.commit()
+    
+    def shingles(self, text: str) -> np.ndarray:
+        """
+        文本 → 字符 shingle 哈希（空白归一化、小写）
+        
+        Returns:
+            去重后的 32 位哈希 (n,) uint64
+        """
+        text = _WHITESPACE.sub(" ", text).strip().lower()
+        k = self.shingle_size
+        if len(text) <= k:
+            grams = [text]
+        else:
+            grams = [text[i:i + k] for i in range(len(text) - k + 1)]
+        return np.unique(np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams),
+                                     dtype=np.uint64, count=len(grams)))
+    
+    def signature(self, text: str) -> np.ndarray:
+        """
+        MinHash 签名：每个置换 h(x) = (a·x + b) mod p 下 shingle 哈希的最小值
+        
+        Returns:
+            (num_perm,) uint32
+        """
+        hashes = self.shingles(text)
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+    
+    def band_keys(self, signature: np.ndarray) -> List[bytes]:
+        """签名按段切分为 LSH 桶键"""
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+    
+    @staticmethod
+    def similarity(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+        """签名估计的 Jaccard 相似度"""
+        return float(np.count_nonzero(sig_a == sig_b)) / len(sig_a)
+    
+    def _best_match(self, signature: np.ndarray, candidates: Iterable[Tuple]) -> Optional[Tuple]:
+        """候选中相似度最高且达到阈值的一项：(候选, 相似度)"""
+        best = None
+        for candidate in candidates:
+            score = self.similarity(signature, candidate[0])
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (candidate, score)
+        return best
+    
+    def _persistent_candidates(self, source: str, keys: List[bytes]) -> List[Tuple]:
+        """持久索引中的候选：[(签名, id, 来源, 块编号)]，跳过同一来源（重新入库视为替换）"""
+        with self._lock:
+            return self._candidates_unlocked(source, keys)
+    
+    def _candidates_unlocked(self, source: str, keys: List[bytes]) -> List[Tuple]:
+        """同 _persistent_candidates，调用方已持有 _lock"""
+        ids = set()
+        for band, key in enumerate(keys):
+            ids.update(row[0] for row in self._conn.execute(
+                "SELECT sig_id FROM chunk_bands WHERE band = ? AND key = ?", (band, key)
+            ))
+        if not ids:
+            return []
+        
+        placeholders = ",".join("?" * len(ids))
+        rows = self._conn.execute(
+            f"SELECT id, source, chunk_id, signature FROM chunk_signatures WHERE id IN ({placeholders})",
+            tuple(ids)
+        ).fetchall()
+        
+        return [(np.frombuffer(sig, dtype=np.uint32), sig_id, src, chunk_id)
+                for sig_id, src, chunk_id, sig in rows if src != source]
+    
+    def _insert_signature(self, source: str, chunk_id, signature: np.ndarray, keys: List[bytes], now: float):
+        """写入一个唯一分块的签名与 LSH 桶（调用方已持有 _lock）"""
+        cursor = self._conn.execute(
+            "INSERT INTO chunk_signatures (source, chunk_id, signature, created) VALUES (?, ?, ?, ?)",
+            (source, chunk_id, signature.tobytes(), now)
+        )
+        self._conn.executemany(
+            "INSERT INTO chunk_bands (band, key, sig_id) VALUES (?, ?, ?)",
+            [(band, key, cursor.lastrowid) for band, key in enumerate(keys)]
+        )
+    
+    def _delete_source(self, source: str):
+        """删除某来源的签名、桶与重复记录（调用方已持有 _lock）"""
+        # 先把依赖这些签名的重复记录标记为孤立：签名 id 删除后可能被新插入的签名复用
+        self._conn.execute(
+            "UPDATE chunk_duplicates SET canonical_id = -1 "
+            "WHERE canonical_id IN (SELECT id FROM chunk_signatures WHERE source = ?)",
+            (source,)
+        )
+        self._conn.execute(
+            "DELETE FROM chunk_bands WHERE sig_id IN (SELECT id FROM chunk_signatures WHERE source = ?)",
+            (source,)
+        )
+        self._conn.execute("DELETE FROM chunk_signatures WHERE source = ?", (source,))
+        self._conn.execute("DELETE FROM chunk_duplicates WHERE source = ?", (source,))
+    
+    def _resolve_orphans(self) -> List[Dict]:
+        """
+        处理规范块已不存在（所在来源被删除或重新入库后不再包含该块）的跨批次重复记录（调用方已持有 _lock）
+        
+        仍与索引中其他块重复的改为指向新的规范块；否则把该块的签名登记为其来源的唯一分块，
+        并返回保存的分块内容，由调用方重新收录（向量化）
+        
+        Returns:
+            重新收录的分块（metadata['readmitted'] 为 True）
+        """
+        orphans = self._conn.execute(
+            "SELECT source, chunk_id, signature, chunk FROM chunk_duplicates "
+            "WHERE canonical_id NOT IN (SELECT id FROM chunk_signatures) ORDER BY source, chunk_id"
+        ).fetchall()
+        
+        readmitted, lost = [], 0
+        now = time.time()
+        for source, chunk_id, sig, stored in orphans:
+            if sig is None or stored is None:
+                # 旧索引的记录没有保存签名与分块内容
+                self._conn.execute("DELETE FROM chunk_duplicates WHERE source = ? AND chunk_id = ?",
+                                   (source, chunk_id))
+                lost += 1
+                continue
+            
+            signature = np.frombuffer(sig, dtype=np.uint32)
+            keys = self.band_keys(signature)
+            match = self._best_match(signature, self._candidates_unlocked(source, keys))
+            if match is not None:
+                (_, sig_id, _, _), score = match
+                self._conn.execute(
+                    "UPDATE chunk_duplicates SET canonical_id = ?, similarity = ? WHERE source = ? AND chunk_id = ?",
+                    (sig_id, score, source, chunk_id)
+                )
+                continue
+            
+            self._conn.execute("DELETE FROM chunk_duplicates WHERE source = ? AND chunk_id = ?",
+                               (source, chunk_id))
+            self._insert_signature(source, chunk_id, signature, keys, now)
+            chunk = json.loads(stored)
+            chunk["metadata"].pop("duplicate_of", None)
+            chunk["metadata"]["readmitted"] = True
+            readmitted.append(chunk)
+        
+        if readmitted:
+            logger.info(f"♻️ 规范块已移除，重新收录 {len(readmitted)} 个此前被折叠的跨批次重复块")
+        if lost:
+            logger.warning(f"⚠️ {lost} 条旧格式的跨批次重复记录缺少分块内容，无法重新收录，已删除")
+        return readmitted
+    
+    def _persist(self, source: str, entries: List[Tuple], duplicates: List[Tuple],
+                 resolve_orphans: bool = True) -> List[Dict]:
+        """
+        写入本文档的唯一分块签名与跨批次重复记录（先删除同一来源的旧记录）
+        
+        Returns:
+            因本文档替换旧记录而重新收录的其他来源分块（见 _resolve_orphans）
+        """
+        with self._lock:
+            self._delete_source(source)
+            
+            now = time.time()
+            for signature, keys, chunk_id in entries:
+                self._insert_signature(source, chunk_id, signature, keys, now)
+            
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunk_duplicates "
+                "(source, chunk_id, canonical_id, similarity, signature, chunk) VALUES (?, ?, ?, ?, ?, ?)",
+                [(source, chunk_id, canonical_id, score, signature.tobytes(),
+                  json.dumps(chunk, ensure_ascii=False, default=str))
+                 for chunk_id, canonical_id, score, signature, chunk in duplicates]
+            )
+            
+            readmitted = self._resolve_orphans() if resolve_orphans else []
+            self._conn.commit()
+        return readmitted
+    
+    def remove(self, source: str) -> List[Dict]:
+        """
+        从持久索引中删除一个文档（如文档已从知识库下线）
+        
+        以该文档分块为规范块的其他文档重复块会被重新收录，调用方应把返回的分块写入向量库
+        
+        Args:
+            source: 文档键（与 dedup 的 source 一致）
+        
+        Returns:
+            重新收录的分块（metadata['source'] 为其原文档，metadata['readmitted'] 为 True）
+        """
+        if self._conn is None:
+            return []
+        with self._lock:
+            self._delete_source(source)
+            readmitted = self._resolve_orphans()
+            self._conn.commit()
+        return readmitted
+    
+    def dedup(self, chunks: Iterable[Dict], source: Optional[str] = None) -> Iterator[Dict]:
+        """
+        逐文档去重（每次调用对应一个文档，文档内索引在调用结束后丢弃）
+        
+        重复分块不再产出，而是作为反向引用追加到保留分块的 metadata['duplicates']；
+        与持久索引中其他来源重复的分块记录 metadata 中的 duplicate_of 后丢弃，连同签名与分块内容写入索引的
+        chunk_duplicates 表；本文档重新入库后不再包含的规范块，其他来源中依赖它的重复块随本文档的分块之后产出
+        （metadata['readmitted'] 为 True，见 remove）。
+        反向引用要到文档末尾才完整，因此保留分块缓冲到整个文档处理完后再按原顺序产出
+        （内存占用与单个文档的分块数相关）
+        
+        Args:
+            chunks: 分块流（StructuredChunker 输出格式）
+            source: 持久索引中的文档键，应能唯一标识文档（如解析后的完整路径或内容摘要）；
+                    None 表示使用分块的 metadata['source']
+        
+        Yields:
+            保留的分块
+        """
+        yield from self._dedup_document(chunks, source)
+    
+    def _dedup_document(self, chunks: Iterable[Dict], source: Optional[str]) -> List[Dict]:
+        """对一个文档的全部分块去重，返回保留的分块"""
+        buckets: Dict[Tuple[int, bytes], List[int]] = {}
+        kept: List[Tuple[np.ndarray, Dict]] = []
+        output: List[Dict] = []
+        entries, cross_duplicates = [], []
+        stats = {"chunks": 0, "unique": 0, "duplicates": 0, "cross_batch_duplicates": 0, "chars_avoided": 0,
+                 "readmitted": 0}
+        completed = False
+        
+        try:
+            for chunk in chunks:
+                metadata = chunk.setdefault("metadata", {})
+                if source is None:
+                    source = metadata.get("source") or ""
+                stats["chunks"] += 1
+                
+                if not chunk["text"].strip():
+                    stats["unique"] += 1
+                    output.append(chunk)
+                    continue
+                
+                signature = self.signature(chunk["text"])
+                keys = self.band_keys(signature)
+                
+                # 1. 文档内重复
+                local_ids = {i for band, key in enumerate(keys) for i in buckets.get((band, key), ())}
+                match = self._best_match(signature, ((kept[i][0], i) for i in sorted(local_ids)))
+                if match is not None:
+                    (_, index), score = match
+                    canonical = kept[index][1]["metadata"]
+                    canonical.setdefault("duplicates", []).append({
+                        "chunk_id": metadata.get("chunk_id"),
+                        "pages": metadata.get("pages", []),
+                        "similarity": round(score, 3)
+                    })
+                    stats["duplicates"] += 1
+                    stats["chars_avoided"] += len(chunk["text"])
+                    continue
+                
+                # 2. 跨批次重复（持久索引）
+                if self._conn is not None:
+                    match = self._best_match(signature, self._persistent_candidates(source, keys))
+                    if match is not None:
+                        (_, sig_id, other_source, other_chunk), score = match
+                        metadata["duplicate_of"] = {"source": other_source, "chunk_id": other_chunk,
+                                                    "similarity": round(score, 3)}
+                        cross_duplicates.append((metadata.get("chunk_id"), sig_id, score, signature, chunk))
+                        stats["duplicates"] += 1
+                        stats["cross_batch_duplicates"] += 1
+                        stats["chars_avoided"] += len(chunk["text"])
+                        continue
+                
+                for band, key in enumerate(keys):
+                    buckets.setdefault((band, key), []).append(len(kept))
+                kept.append((signature, chunk))
+                output.append(chunk)
+                entries.append((signature, keys, metadata.get("chunk_id")))
+                stats["unique"] += 1
+            completed = True
+        
+        finally:
+            # 分块流中途出错时，已处理的分块同样写入持久索引；孤立的重复记录留待下次成功写入时处理
+            if self._conn is not None and source is not None:
+                readmitted = self._persist(source, entries, cross_duplicates, resolve_orphans=completed)
+                output.extend(readmitted)
+                stats["readmitted"] = len(readmitted)
+            
+            stats["embeddings_avoided"] = stats["duplicates"]
+            self.last_stats = stats
+            self.total_avoided += stats["duplicates"]
+            if stats["duplicates"]:
+                logger.info(f"♻️ 近重复分块折叠 {stats['duplicates']}/{stats['chunks']} 个"
+                            f"（跨批次 {stats['cross_batch_duplicates']}），避免 {stats['duplicates']} 次向量化")
+        
+        return output
+    
+    def close(self):
+        """关闭持久索引"""
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+            self._conn = None
@@ -0,0 +1,256 @@
+"""
+表格提取统计模块
+按文档来源（生成器元数据 + 版面指纹）持久化记录各提取方法的历史表现，
+供 TableExtractor 在 auto 模式下决定方法的执行顺序与跳过策略
+"""
+
+import json
+import math
+import random
+import logging
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Dict, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _bucket(value: int) -> int:
+    """按 2 的幂分桶，避免数量上的细微差异产生不同的指纹"""
+    return int(math.log2(value + 1))
+
+
+def document_signature(pdf) -> str:
+    """
+    计算文档来源签名：Producer/Creator 元数据 + 首页版面指纹
+    
+    Args:
+        pdf: 已打开的 pdfplumber PDF 对象（由调用方打开并复用，不在此重新打开文件）
+    
+    Returns:
+        签名字符串，如 "Microsoft Word|Acrobat PDFMaker|595x842|lines:4|chars:10"
+    """
+    try:
+        metadata = pdf.metadata or {}
+        producer = str(metadata.get("Producer", "")).strip()
+        creator = str(metadata.get("Creator", "")).strip()
+        
+        fingerprint = "empty"
+        if pdf.pages:
+            page = pdf.pages[0]
+            # 页面尺寸、框线数量（有框表格的信号）、字符数量
+            rulings = len(page.lines) + len(page.rects)
+            fingerprint = (
+                f"{round(page.width)}x{round(page.height)}"
+                f"|lines:{_bucket(rulings)}"
+                f"|chars:{_bucket(len(page.chars))}"
+            )
+            page.close()
+        
+        return f"{producer}|{creator}|{fingerprint}"
+    
+    except Exception as e:
+        logger.warning(f"⚠️ 文档签名计算失败: {e}")
+        return "unknown"
+
+
+@contextmanager
+def _file_lock(path: Path):
+    """跨进程文件锁（fcntl 不可用的平台上退化为无锁）"""
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    
+    with open(path, "a") as handle:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+class ExtractionStatsStore:
+    """
+    提取方法历史统计（JSON 文件持久化）
+    
+    线程间通过锁串行化读写；保存时在文件锁内重新读取磁盘上的统计，只累加本实例自上次保存以来的增量，
+    多个进程（如沙箱 worker）共用同一文件时不会互相覆盖
+    """
+    
+    def __init__(self,
+                 stats_path: str,
+                 exploration_rate: float = 0.1,
+                 min_trials: int = 3):
+        """
+        初始化统计存储
+        
+        Args:
+            stats_path: 统计文件路径（JSON）
+            exploration_rate: 探索率，以此概率忽略历史统计并运行全部方法
+            min_trials: 判定某方法"从未胜出"前所需的最少尝试次数
+        """
+        self.stats_path = Path(stats_path)
+        self.exploration_rate = exploration_rate
+        self.min_trials = min_trials
+        self.stats: Dict[str, Dict[str, Dict]] = {}
+        self._pending: Dict[str, Dict[str, Dict]] = {}  # 尚未保存的增量
+        self._lock = threading.Lock()
+        
+        if self.stats_path.exists():
+            self.stats = self._load()
+            if self.stats:
+                logger.info(f"✅ 已加载 {len(self.stats)} 个来源的提取统计")
+    
+    def _load(self) -> Dict[str, Dict[str, Dict]]:
+        """读取磁盘上的统计，文件不存在或损坏时返回空统计"""
+        if not self.stats_path.exists():
+            return {}
+        try:
+            with open(self.stats_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"⚠️ 提取统计加载失败，将重新统计: {e}")
+            return {}
+    
+    @staticmethod
+    def _method_stats(stats: Dict, source_key: str, method: str) -> Dict:
+        """获取（必要时创建）某来源下某方法的统计项"""
+        source = stats.setdefault(source_key, {})
+        return source.setdefault(method, {
+            "trials": 0,
+            "wins": 0,
+            "tables": 0,
+            "total_time": 0.0,
+            "accuracy_sum": 0.0,
+            "accuracy_count": 0
+        })
+    
+    def score(self, source_key: str, method: str) -> float:
+        """
+        方法得分：平滑后的胜率，耗时越短得分略高；
+        有准确率记录的方法（camelot）再乘以平均准确率，准确率低的"胜出"排名靠后
+        
+        Args:
+            source_key: 来源签名
+            method: 提取方法名
+        
+        Returns:
+            得分（越大越优先）
+        """
+        with self._lock:
+            item = dict(self.stats.get(source_key, {}).get(method) or {})
+        if not item or item["trials"] == 0:
+            # 未尝试过的方法给中性分，保证其有机会被执行
+            return 0.5
+        
+        win_rate = (item["wins"] + 1) / (item["trials"] + 2)
+        avg_time = item["total_time"] / item["trials"]
+        score = win_rate / (1.0 + 0.01 * avg_time)
+        if item.get("accuracy_count"):
+            # camelot 准确率为 0~100
+            mean_accuracy = item["accuracy_sum"] / item["accuracy_count"] / 100.0
+            score *= min(max(mean_accuracy, 0.0), 1.0)
+        return score
+    
+    def never_wins(self, source_key: str, method: str) -> bool:
+        """判断某方法在该来源上是否经过足够尝试仍从未胜出"""
+        with self._lock:
+            item = dict(self.stats.get(source_key, {}).get(method) or {})
+        return bool(item) and item["trials"] >= self.min_trials and item["wins"] == 0
+    
+    def explore(self) -> bool:
+        """按探索率决定本次是否忽略历史统计"""
+        return random.random() < self.exploration_rate
+    
+    def plan(self, source_key: str, methods: List[str], explore: Optional[bool] = None) -> List[str]:
+        """
+        根据历史统计生成执行计划
+        
+        Args:
+            source_key: 来源签名
+            methods: 候选方法（默认顺序）
+            explore: 是否为探索模式，None 表示按探索率随机决定
+        
+        Returns:
+            按得分排序、已剔除"从未胜出"方法的执行顺序（探索模式下为默认顺序的全部方法）
+        """
+        if explore is None:
+            explore = self.explore()
+        if explore:
+            logger.info("🎲 探索模式：按默认顺序运行全部方法")
+            return list(methods)
+        
+        # 稳定排序：得分相同时保持默认顺序
+        ordered = sorted(methods, key=lambda m: -self.score(source_key, m))
+        planned = [m for m in ordered if not self.never_wins(source_key, m)]
+        
+        skipped = [m for m in ordered if m not in planned]
+        if skipped:
+            logger.info(f"⏭️ 跳过历史上从未胜出的方法: {skipped}")
+        
+        return planned
+    
+    def record(self,
+               source_key: str,
+               method: str,
+               num_tables: int,
+               elapsed: float,
+               accuracies: Optional[List[float]] = None):
+        """
+        记录一次方法执行结果
+        
+        Args:
+            source_key: 来源签名
+            method: 提取方法名
+            num_tables: 被接受的表格数量
+            elapsed: 耗时（秒）
+            accuracies: camelot 报告的准确率列表（其他方法为 None）
+        """
+        delta = {
+            "trials": 1,
+            "wins": 1 if num_tables > 0 else 0,
+            "tables": num_tables,
+            "total_time": elapsed,
+            "accuracy_sum": sum(accuracies) if accuracies else 0.0,
+            "accuracy_count": len(accuracies) if accuracies else 0
+        }
+        with self._lock:
+            for stats in (self.stats, self._pending):
+                item = self._method_stats(stats, source_key, method)
+                for key, value in delta.items():
+                    item[key] += value
+    
+    def save(self):
+        """
+        将统计写回磁盘
+        
+        在文件锁内重新读取磁盘上的统计并累加本实例的增量（其他进程已保存的更新不会丢失），
+        先写临时文件再替换，避免中断导致文件损坏
+        """
+        with self._lock:
+            if not self._pending:
+                return
+            try:
+                self.stats_path.parent.mkdir(parents=True, exist_ok=True)
+                lock_path = self.stats_path.with_suffix(self.stats_path.suffix + ".lock")
+                with _file_lock(lock_path):
+                    merged = self._load()
+                    for source_key, methods in self._pending.items():
+                        for method, delta in methods.items():
+                            item = self._method_stats(merged, source_key, method)
+                            for key, value in delta.items():
+                                item[key] = item.get(key, 0) + value
+                    
+                    tmp_path = self.stats_path.with_suffix(self.stats_path.suffix + ".tmp")
+                    with open(tmp_path, 'w', encoding='utf-8') as f:
+                        json.dump(merged, f, ensure_ascii=False, indent=2)
+                    tmp_path.replace(self.stats_path)
+                
+                self.stats = merged
+                self._pending = {}
+            except Exception as e:
+                logger.error(f"❌ 提取统计保存失败: {e}")
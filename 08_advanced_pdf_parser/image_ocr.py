@@ -4,13 +4,25 @@
 """
 
 import fitz  # PyMuPDF
-from paddleocr import PaddleOCR
 from PIL import Image
+import numpy as np
+import cv2
 import io
+import time
+import queue
 import logging
-from typing import List, Dict, Tuple
+import threading
+from typing import List, Dict, Set, Tuple, Optional, Union, Iterator, Iterable, Collection
 from pathlib import Path
 
+from ocr_backends import OCRBackend, create_backend, crop_text_region
+from ocr_cache import OCRResultCache, image_digest
+from image_preprocess import OCRPreprocessor, ImageTile, estimate_dpi
+from text_likelihood import TextLikelihoodScorer
+from layout_analyzer import LayoutAnalyzer
+from ocr_result import OCRPageResult, FailedLines, to_text_results
+from page_render import PageRenderer, should_render
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -18,164 +30,1156 @@ logger = logging.getLogger(__name__)
 class ImageOCR:
     """PDF 图片 OCR 识别器"""
     
-    def __init__(self, use_angle_cls=True, lang='ch'):
+    # 批量识别时文本行统一缩放到的高度（与常见识别模型输入一致）
+    REC_IMAGE_HEIGHT = 48
+    # 缓存中 OCR 结果的格式版本（含检测框）
+    CACHE_FORMAT = 2
+    
+    def __init__(self, 
+                 use_angle_cls=True, 
+                 lang='ch', 
+                 rec_batch_size: int = 16,
+                 cache_path: Optional[str] = None,
+                 cache_max_entries: int = 10000,
+                 preprocessor: Optional[OCRPreprocessor] = None,
+                 worker_pool=None,
+                 text_score_threshold: float = 0.0,
+                 backend: Union[str, OCRBackend] = 'paddle',
+                 backend_kwargs: Optional[Dict] = None,
+                 pipeline_depth: int = 4,
+                 pipeline_workers: int = 1,
+                 render_dpi: float = 300.0,
+                 render_colorspace: str = 'gray'):
         """
         初始化 OCR 识别器
         
         Args:
             use_angle_cls: 是否使用角度分类（自动纠正图片方向）
             lang: 语言模型（'ch': 中文, 'en': 英文）
+            rec_batch_size: 批量识别时每批文本行数量
+            cache_path: OCR 结果缓存文件路径（None 表示不启用跨文档缓存）
+            cache_max_entries: 缓存最大条目数（LRU 淘汰）
+            preprocessor: OCR 预处理器（分辨率归一化、灰度化、超大图切片），None 表示使用原图
+            worker_pool: OCR 工作进程池（OCRWorkerPool），设置后 process_pdf 将识别任务交给进程池，
+                   本进程不再加载模型
+            text_score_threshold: 文字可能性预筛阈值（0 ~ 1），得分低于该值的图片（照片、纹理等）
+                   跳过 OCR；0 表示不预筛
+            backend: OCR 后端名称（'paddle', 'onnx', 'tesseract', 'stub'）或 OCRBackend 实例
+            backend_kwargs: 按名称创建后端时的额外参数（如 ONNX 模型路径）
+            pipeline_depth: 流水线队列深度（已解码待识别的图片数上限）：图片提取/解码与推理重叠执行，
+                   峰值内存由队列深度而非文档图片总量决定；0 表示先提取全部图片再识别
+            pipeline_workers: 流水线消费者（推理）线程数，仅对线程安全的后端（如 onnx）设置大于 1
+            render_dpi: 整页渲染模式的光栅化分辨率
+            render_colorspace: 整页渲染模式的颜色空间（'gray' 或 'rgb'）
         """
-        try:
-            self.ocr = PaddleOCR(use_angle_cls=use_angle_cls, lang=lang, show_log=False)
-            logger.info("✅ PaddleOCR 初始化成功")
-        except Exception as e:
-            logger.error(f"❌ PaddleOCR 初始化失败: {e}")
-            self.ocr = None
+        self.use_angle_cls = use_angle_cls
+        self.lang = lang
+        self.rec_batch_size = rec_batch_size
+        self.preprocessor = preprocessor
+        self.worker_pool = worker_pool
+        self.text_score_threshold = text_score_threshold
+        self.pipeline_depth = pipeline_depth
+        self.pipeline_workers = pipeline_workers
+        self.render_dpi = render_dpi
+        self.render_colorspace = render_colorspace
+        self.scorer = TextLikelihoodScorer() if text_score_threshold > 0 else None
+        # 累计计数（跨多次 process_pdf）
+        self.stats = {
+            "prefilter_checked": 0,
+            "prefilter_skipped": 0,
+            "prefilter_saved_seconds": 0.0
+        }
+        # 单张图片平均 OCR 耗时（指数滑动平均），用于估算预筛节省的时间
+        self._avg_ocr_seconds: Optional[float] = None
+        self.cache = OCRResultCache(cache_path, cache_max_entries) if cache_path else None
+        # 最近一次 process_pdf 的吞吐统计
+        self.last_run_stats: Dict = {}
+        # 并发处理多个文档时保护 stats / last_run_stats / 平均耗时的更新
+        self._stats_lock = threading.Lock()
+        
+        self.backend = None
+        if worker_pool is not None:
+            logger.info(f"✅ 使用 OCR 工作进程池（{worker_pool.pool_size} 个进程）")
+        elif isinstance(backend, OCRBackend):
+            self.backend = backend
+        else:
+            try:
+                self.backend = create_backend(backend, lang=lang, use_angle_cls=use_angle_cls,
+                                              rec_batch_size=rec_batch_size, **(backend_kwargs or {}))
+                logger.info(f"✅ OCR 后端 [{backend}] 初始化成功")
+            except Exception as e:
+                logger.error(f"❌ OCR 后端 [{backend}] 初始化失败: {e}")
+        
+        self.model_version = self._detect_model_version()
+    
+    def _detect_model_version(self) -> str:
+        """模型版本标识（用作缓存键的一部分，升级模型后旧缓存自动失效）"""
+        if self.worker_pool is not None:
+            version = self.worker_pool.backend_version
+        elif self.backend is not None:
+            version = self.backend.version
+        else:
+            version = "unavailable"
+        model_version = f"{version}-cls{int(bool(self.use_angle_cls))}-f{self.CACHE_FORMAT}"
+        
+        # 预处理参数会改变识别结果，同样纳入缓存键
+        if self.preprocessor is not None:
+            pp = self.preprocessor
+            model_version += f"-pp{pp.target_dpi:g}-{pp.max_side}-g{int(pp.grayscale)}"
+        
+        return model_version
+    
+    @property
+    def thread_safe(self) -> bool:
+        """能否被多个线程同时用于不同文档（使用进程池或线程安全的后端时为 True）"""
+        if self.worker_pool is not None:
+            return True
+        return self.backend is not None and self.backend.thread_safe
+    
+    def share_state(self, other: "ImageOCR"):
+        """
+        与另一个实例共用跨文档缓存与累计统计（重建后端时保留已有状态；缓存与统计的更新均已加锁）
+        
+        Args:
+            other: 原实例
+        """
+        if self.cache is not None and other.cache is not None:
+            self.cache.close()
+            self.cache = other.cache
+        with other._stats_lock:
+            self.stats = other.stats
+            self._stats_lock = other._stats_lock
+            self._avg_ocr_seconds = other._avg_ocr_seconds
     
-    def extract_images_from_pdf(self, pdf_path: str, min_width: int = 100, min_height: int = 100) -> List[Dict]:
+    def close(self):
+        """释放 OCR 后端与缓存资源"""
+        if self.backend is not None:
+            self.backend.close()
+        if self.cache is not None:
+            self.cache.close()
+    
+    def extract_images_from_pdf(self, pdf_path: str, min_width: int = 100, min_height: int = 100,
+                                pages: Optional[Collection[int]] = None) -> List[Dict]:
         """
-        从 PDF 中提取所有图片
+        从 PDF 中提取所有图片（一次性返回，见 iter_images）
         
         Args:
             pdf_path: PDF 文件路径
             min_width: 最小图片宽度（过滤小图标）
             min_height: 最小图片高度
+            pages: 只提取这些页（页码从 1 开始），None 表示全部页面
             
         Returns:
-            图片信息列表：[{'page': page_num, 'image': PIL.Image, 'bbox': (x0, y0, x1, y1)}]
+            图片信息列表
         """
-        images = []
+        return list(self.iter_images(pdf_path, min_width, min_height, pages=pages))
+    
+    def iter_images(self, pdf_path: str, min_width: int = 100, min_height: int = 100,
+                    pages: Optional[Collection[int]] = None) -> Iterator[Dict]:
+        """
+        逐页提取图片，每提取到一张新图片立即产出
+        
+        尺寸过滤直接使用 page.get_images() 中的宽高元数据，小图标不会被提取；
+        记录中只保存原始图片字节，像素解码推迟到 OCR 真正需要时（见 load_image）。
+        同一 xref（如每页重复的 Logo、水印）只提取一次，内容完全相同的不同 xref 也会合并；
+        每张图片的所有出现位置记录在 occurrences 中
+        
+        Args:
+            pdf_path: PDF 文件路径
+            min_width: 最小图片宽度（过滤小图标）
+            min_height: 最小图片高度
+            pages: 只提取这些页（页码从 1 开始），None 表示全部页面
+            
+        Yields:
+            图片记录（之后页面中的重复出现会追加到已产出记录的 occurrences 中）：
+                   {'page': page_num, 'image_bytes': bytes, 'ext': 'png', 'bbox': (x0, y0, x1, y1),
+                    'xref': xref, 'digest': sha256, 'occurrences': [{'page', 'index', 'bbox'}]}
+            其中 page/index/bbox 为首次出现的位置
+        """
+        num_images = 0
+        by_xref = {}         # xref -> 图片记录
+        by_digest = {}       # 内容摘要 -> 图片记录
+        num_references = 0
+        num_filtered = 0
         
         try:
             pdf_document = fitz.open(pdf_path)
             
             for page_num in range(len(pdf_document)):
+                if pages is not None and page_num + 1 not in pages:
+                    continue
                 page = pdf_document[page_num]
                 image_list = page.get_images()
                 
                 for img_index, img in enumerate(image_list):
                     try:
-                        # 获取图片对象
-                        xref = img[0]
-                        base_image = pdf_document.extract_image(xref)
-                        image_bytes = base_image["image"]
-                        
-                        # 转换为 PIL Image
-                        pil_image = Image.open(io.BytesIO(image_bytes))
+                        # 图片元数据：(xref, smask, width, height, bpc, colorspace, ...)
+                        xref, width, height = img[0], img[2], img[3]
                         
-                        # 过滤小图片
-                        if pil_image.width < min_width or pil_image.height < min_height:
+                        # 基于元数据过滤小图片，无需提取和解码
+                        if width < min_width or height < min_height:
+                            num_filtered += 1
                             continue
                         
                         # 获取图片在页面中的位置
                         img_rects = page.get_image_rects(xref)
                         bbox = img_rects[0] if img_rects else None
+                        occurrence = {'page': page_num + 1, 'index': img_index + 1, 'bbox': bbox}
                         
-                        images.append({
+                        # 已提取过的 xref：只记录出现位置
+                        if xref in by_xref:
+                            by_xref[xref]['occurrences'].append(occurrence)
+                            num_references += 1
+                            continue
+                        
+                        base_image = pdf_document.extract_image(xref)
+                        image_bytes = base_image["image"]
+                        
+                        # 内容相同但 xref 不同的图片合并为一条记录
+                        digest = image_digest(image_bytes)
+                        if digest in by_digest:
+                            by_xref[xref] = by_digest[digest]
+                            by_digest[digest]['occurrences'].append(occurrence)
+                            num_references += 1
+                            continue
+                        
+                        record = {
                             'page': page_num + 1,
                             'index': img_index + 1,
-                            'image': pil_image,
+                            'image_bytes': image_bytes,
+                            'ext': base_image.get("ext", "png"),
                             'bbox': bbox,
-                            'size': (pil_image.width, pil_image.height)
-                        })
+                            'size': (width, height),
+                            'xref': xref,
+                            'digest': digest,
+                            'occurrences': [occurrence]
+                        }
+                        by_xref[xref] = record
+                        by_digest[digest] = record
+                        num_references += 1
+                        num_images += 1
                         
-                        logger.info(f"📷 第 {page_num + 1} 页提取图片 {img_index + 1}，尺寸: {pil_image.size}")
+                        logger.info(f"📷 第 {page_num + 1} 页提取图片 {img_index + 1}，尺寸: {(width, height)}")
                     
                     except Exception as e:
                         logger.warning(f"⚠️ 提取图片失败: {e}")
                         continue
+                    
+                    yield record
             
             pdf_document.close()
-            logger.info(f"✅ 共提取 {len(images)} 张图片")
+            logger.info(f"✅ 共提取 {num_images} 张图片（引用 {num_references} 次，"
+                        f"按尺寸跳过 {num_filtered} 个小图引用）")
         
         except Exception as e:
             logger.error(f"❌ PDF 图片提取失败: {e}")
+    
+    def ocr_candidate_pages(self, pdf_path: str, mode: str = 'images',
+                            min_width: int = 100, min_height: int = 100) -> Set[int]:
+        """
+        可能需要 OCR 的页面：含尺寸达标内嵌图片的页面，以及 render / auto 模式下选中整页渲染的页面
+        （只读取图片元数据，不提取图片；逐页 OCR 时用于跳过纯文本页）
         
-        return images
+        Args:
+            pdf_path: PDF 文件路径
+            mode: OCR 模式（同 process_pdf_structured）
+            min_width: 最小图片宽度
+            min_height: 最小图片高度
+            
+        Returns:
+            页码集合（从 1 开始）
+        """
+        pages = set()
+        pdf_document = fitz.open(pdf_path)
+        try:
+            for page in pdf_document:
+                if any(img[2] >= min_width and img[3] >= min_height for img in page.get_images()):
+                    pages.add(page.number + 1)
+        finally:
+            pdf_document.close()
+        
+        if mode != "images":
+            pages.update(page_num for page_num, _ in self._select_render_pages(pdf_path, mode))
+        return pages
+    
+    @staticmethod
+    def load_image(img_info: Dict) -> Image.Image:
+        """
+        按需将图片记录解码为 PIL Image
+        
+        Args:
+            img_info: extract_images_from_pdf 返回的图片记录
+            
+        Returns:
+            PIL Image 对象
+        """
+        return Image.open(io.BytesIO(img_info['image_bytes']))
     
-    def recognize_text(self, image: Image.Image) -> List[Tuple[str, float]]:
+    def recognize_text(self, image: Image.Image, source_dpi: Optional[float] = None) -> List[Tuple[str, float]]:
         """
         对单张图片进行 OCR 识别
         
         Args:
             image: PIL Image 对象
+            source_dpi: 图片有效 DPI（启用预处理时用于分辨率归一化）
             
         Returns:
             识别结果列表：[(文本内容, 置信度)]
         """
-        if self.ocr is None:
+        return [(text, confidence) for _, text, confidence in self.recognize_lines(image, source_dpi)]
+    
+    def recognize_lines(self, 
+                        image: Image.Image, 
+                        source_dpi: Optional[float] = None) -> List[Tuple[np.ndarray, str, float]]:
+        """
+        对单张图片进行 OCR 识别，保留文本行位置
+        
+        启用预处理时，图片先按有效 DPI 缩放、灰度化，超大图片切片后逐片识别，
+        检测框统一映射回原图坐标
+        
+        Args:
+            image: PIL Image 对象
+            source_dpi: 图片有效 DPI
+            
+        Returns:
+            识别结果列表：[(原图坐标四边形框 (4, 2), 文本内容, 置信度)]
+        """
+        if self.backend is None:
             logger.error("❌ OCR 未初始化")
             return []
         
         try:
-            # 转换为 numpy array
-            import numpy as np
-            img_array = np.array(image)
+            _, tiles, scale = self.prepare_image(image, source_dpi)
+        except Exception as e:
+            logger.error(f"❌ 图片解码失败: {e}")
+            return FailedLines(error=f"图片解码失败: {e}")
+        
+        return self.recognize_prepared(tiles, scale)
+    
+    def prepare_image(self, 
+                      image: Image.Image, 
+                      source_dpi: Optional[float] = None) -> Tuple[np.ndarray, List[ImageTile], float]:
+        """
+        解码并预处理图片（不涉及模型，可在独立线程中与推理重叠执行）
+        
+        Args:
+            image: PIL Image 对象
+            source_dpi: 图片有效 DPI
             
-            # 执行 OCR
-            result = self.ocr.ocr(img_array, cls=True)
+        Returns:
+            (RGB 图片数组, 切片列表, 缩放比例)
+        """
+        if self.preprocessor is None:
+            img_array = np.array(image.convert("RGB"))
+            return img_array, [ImageTile(img_array, 0, 0, (0, 0, image.width, image.height))], 1.0
+        
+        prepared = self.preprocessor.prepare(image, source_dpi)
+        return prepared.array, prepared.tiles, prepared.scale
+    
+    def recognize_prepared(self, tiles: List[ImageTile], scale: float) -> List[Tuple[np.ndarray, str, float]]:
+        """
+        对已预处理的图片执行 OCR
+        
+        Args:
+            tiles: 切片列表（见 prepare_image）
+            scale: 预处理缩放比例
             
-            # 解析结果
+        Returns:
+            识别结果列表：[(原图坐标四边形框 (4, 2), 文本内容, 置信度)]；识别失败时为 FailedLines
+        """
+        if self.backend is None:
+            logger.error("❌ OCR 未初始化")
+            return []
+        
+        try:
             text_results = []
-            if result and result[0]:
-                for line in result[0]:
-                    text = line[1][0]  # 识别的文本
-                    confidence = line[1][1]  # 置信度
-                    text_results.append((text, confidence))
+            for tile in tiles:
+                # 执行 OCR
+                for box, text, confidence in self.backend.ocr(tile.array, cls=self.use_angle_cls):
+                    box = OCRPreprocessor.tile_to_prepared(box, tile)
+                    if box is None:
+                        continue  # 重叠区内的行由相邻切片负责
+                    text_results.append((OCRPreprocessor.to_original(box, scale), text, confidence))
             
             return text_results
         
         except Exception as e:
             logger.error(f"❌ OCR 识别失败: {e}")
-            return []
+            return FailedLines(error=f"OCR 识别失败: {e}")
+    
+    def recognize_batch(self, 
+                        images: List[Union[Image.Image, bytes]], 
+                        batch_size: Optional[int] = None,
+                        source_dpis: Optional[List[Optional[float]]] = None) -> List[List[Tuple[str, float]]]:
+        """
+        批量 OCR：逐图检测文本行，再把所有图片的文本行汇总后按固定批次识别
+        
+        Args:
+            images: PIL Image 或原始图片字节列表（可来自多页，字节在检测时才逐张解码）
+            batch_size: 每批文本行数量（默认使用 rec_batch_size）
+            source_dpis: 各图片有效 DPI（启用预处理时使用）
+            
+        Returns:
+            与 images 一一对应的识别结果：[[(文本内容, 置信度)], ...]
+        """
+        return [
+            [(text, confidence) for _, text, confidence in lines]
+            for lines in self.recognize_batch_lines(images, batch_size, source_dpis)
+        ]
+    
+    def recognize_batch_lines(self, 
+                              images: List[Union[Image.Image, bytes]], 
+                              batch_size: Optional[int] = None,
+                              source_dpis: Optional[List[Optional[float]]] = None
+                              ) -> List[List[Tuple[np.ndarray, str, float]]]:
+        """
+        批量 OCR（保留文本行位置）
+        
+        文本行预先缩放到统一高度并按宽度排序，同批内只需少量填充，
+        识别模型调用次数从"每张图一次"降为"每批一次"
+        
+        Args:
+            images: PIL Image 或原始图片字节列表
+            batch_size: 每批文本行数量（默认使用 rec_batch_size）
+            source_dpis: 各图片有效 DPI（启用预处理时使用）
+            
+        Returns:
+            与 images 一一对应的识别结果：[[(原图坐标四边形框, 文本内容, 置信度)], ...]
+        """
+        if self.backend is None:
+            logger.error("❌ OCR 未初始化")
+            return [[] for _ in images]
+        
+        source_dpis = source_dpis or [None] * len(images)
+        
+        def prepare_all():
+            # 逐张解码：检测完一张再解码下一张，不同时持有所有图片的像素
+            for img_idx, (image, source_dpi) in enumerate(zip(images, source_dpis)):
+                try:
+                    if isinstance(image, bytes):
+                        image = Image.open(io.BytesIO(image))
+                    yield self.prepare_image(image, source_dpi)
+                except Exception as e:
+                    logger.error(f"❌ 图片解码失败（图片 {img_idx + 1}）: {e}")
+                    yield None
+        
+        return self.recognize_prepared_batch(prepare_all(), batch_size)
+    
+    def recognize_prepared_batch(self, 
+                                 prepared: Iterable[Optional[Tuple[np.ndarray, List[ImageTile], float]]], 
+                                 batch_size: Optional[int] = None
+                                 ) -> List[List[Tuple[np.ndarray, str, float]]]:
+        """
+        对多张已预处理的图片执行批量 OCR
+        
+        Args:
+            prepared: prepare_image 的结果序列（None 表示该图片解码失败），可以是惰性生成器
+            batch_size: 每批文本行数量（默认使用 rec_batch_size）
+            
+        Returns:
+            与 prepared 一一对应的识别结果：[[(原图坐标四边形框, 文本内容, 置信度)], ...]；
+            解码、检测失败或有文本行所在批次识别失败的图片为 FailedLines（保留已识别的行）
+        """
+        results = []
+        errors: Dict[int, str] = {}  # 图片序号 -> 失败原因
+        
+        if self.backend is None:
+            logger.error("❌ OCR 未初始化")
+            return [[] for _ in prepared]
+        
+        batch_size = batch_size or self.rec_batch_size
+        
+        # 1. 逐图（逐切片）检测，收集所有文本行裁剪图及其归属
+        crops = []
+        owners = []
+        for img_idx, item in enumerate(prepared):
+            results.append([])
+            if item is None:
+                errors[img_idx] = "图片解码失败"
+                continue
+            img_array, tiles, scale = item
+            try:
+                boxes = []
+                for tile in tiles:
+                    for box in self.backend.detect(tile.array):
+                        box = OCRPreprocessor.tile_to_prepared(box, tile)
+                        if box is not None:
+                            boxes.append(box)
+                
+                for box in self._sort_boxes(boxes):
+                    crops.append(self._presize_crop(crop_text_region(img_array, box)))
+                    owners.append((img_idx, OCRPreprocessor.to_original(box, scale)))
+            
+            except Exception as e:
+                logger.error(f"❌ 文本检测失败（图片 {img_idx + 1}）: {e}")
+                errors[img_idx] = f"文本检测失败: {e}"
+        
+        if not crops:
+            return self._mark_failed(results, errors)
+        
+        # 2. 按宽度排序后分批，同批文本行宽度相近，填充最少
+        order = sorted(range(len(crops)), key=lambda i: crops[i].shape[1])
+        line_results = [None] * len(crops)
+        
+        for start in range(0, len(order), batch_size):
+            batch_ids = order[start:start + batch_size]
+            batch = self._pad_batch([crops[i] for i in batch_ids])
+            
+            try:
+                if self.use_angle_cls:
+                    batch = self.backend.classify(batch)
+                
+                for line_id, (text, confidence) in zip(batch_ids, self.backend.recognize_batch(batch)):
+                    line_results[line_id] = (text, float(confidence))
+            
+            except Exception as e:
+                logger.error(f"❌ 批量识别失败: {e}")
+                for line_id in batch_ids:
+                    errors.setdefault(owners[line_id][0], f"批量识别失败: {e}")
+        
+        # 3. 按原始行序映射回各图片
+        for line_id, (img_idx, box) in enumerate(owners):
+            if line_results[line_id] is not None:
+                text, confidence = line_results[line_id]
+                results[img_idx].append((box, text, confidence))
+        
+        return self._mark_failed(results, errors)
+    
+    @staticmethod
+    def _mark_failed(results: List[List], errors: Dict[int, str]) -> List[List]:
+        """把失败图片的结果替换为 FailedLines（保留已识别的行）"""
+        for img_idx, error in errors.items():
+            results[img_idx] = FailedLines(results[img_idx], error)
+        return results
+    
+    @staticmethod
+    def _sort_boxes(dt_boxes) -> List[np.ndarray]:
+        """检测框按阅读顺序排序（从上到下，同一行内从左到右）"""
+        boxes = sorted(dt_boxes, key=lambda b: (b[0][1], b[0][0]))
+        
+        for i in range(len(boxes) - 1):
+            for j in range(i, -1, -1):
+                if (abs(boxes[j + 1][0][1] - boxes[j][0][1]) < 10 
+                        and boxes[j + 1][0][0] < boxes[j][0][0]):
+                    boxes[j], boxes[j + 1] = boxes[j + 1], boxes[j]
+                else:
+                    break
+        
+        return boxes
+    
+    def _presize_crop(self, crop: np.ndarray) -> np.ndarray:
+        """将文本行缩放到识别模型的输入高度（保持宽高比）"""
+        height, width = crop.shape[:2]
+        target_width = max(1, int(round(width * self.REC_IMAGE_HEIGHT / height)))
+        return cv2.resize(crop, (target_width, self.REC_IMAGE_HEIGHT))
     
-    def process_pdf(self, pdf_path: str, confidence_threshold: float = 0.5) -> Dict[int, List[str]]:
+    @staticmethod
+    def _pad_batch(batch: List[np.ndarray]) -> List[np.ndarray]:
+        """同批文本行右侧填充到相同宽度（向上取整到 32 的倍数）"""
+        max_width = max(crop.shape[1] for crop in batch)
+        max_width = (max_width + 31) // 32 * 32
+        
+        padded = []
+        for crop in batch:
+            pad = max_width - crop.shape[1]
+            if pad > 0:
+                crop = cv2.copyMakeBorder(crop, 0, 0, 0, pad, cv2.BORDER_REPLICATE)
+            padded.append(crop)
+        
+        return padded
+    
+    def process_pdf(self, 
+                    pdf_path: str, 
+                    confidence_threshold: float = 0.5,
+                    batch_size: Optional[int] = None,
+                    text_boxes: Optional[Dict[int, List[Tuple[float, float, float, float]]]] = None,
+                    coverage_threshold: float = 0.5,
+                    mode: str = 'images',
+                    pages: Optional[Collection[int]] = None) -> Dict[int, List[str]]:
         """
-        处理整个 PDF：提取图片并进行 OCR
+        处理整个 PDF：提取图片并进行 OCR（纯文本视图）
+        
+        参数同 process_pdf_structured
+            
+        Returns:
+            字典：{page_num: [recognized_texts]}
+        """
+        return to_text_results(self.process_pdf_structured(
+            pdf_path,
+            confidence_threshold=confidence_threshold,
+            batch_size=batch_size,
+            text_boxes=text_boxes,
+            coverage_threshold=coverage_threshold,
+            mode=mode,
+            pages=pages
+        ))
+    
+    def process_pdf_structured(self, 
+                               pdf_path: str, 
+                               confidence_threshold: float = 0.5,
+                               batch_size: Optional[int] = None,
+                               text_boxes: Optional[Dict[int, List[Tuple[float, float, float, float]]]] = None,
+                               coverage_threshold: float = 0.5,
+                               mode: str = 'images',
+                               pages: Optional[Collection[int]] = None,
+                               memo: Optional[Dict[str, List]] = None) -> Dict[int, OCRPageResult]:
+        """
+        处理整个 PDF：提取图片并进行 OCR，按页返回列式结果（检测框、置信度、图片序号、行序）
         
         Args:
             pdf_path: PDF 文件路径
             confidence_threshold: 置信度阈值（低于此值的结果将被过滤）
+            batch_size: 批量识别的每批文本行数量（None 表示逐张图片识别）
+            text_boxes: 文本层的文本块区域 {page_num: [bbox]}（见 LayoutAnalyzer.text_boxes_by_page）。
+                   提供时，已被文本层覆盖的图片区域（如带隐藏文字层的可搜索扫描件）不再 OCR
+            coverage_threshold: 图片区域被文本块覆盖的比例达到该值即视为已有文本层
+            mode: 'images' 只识别内嵌图片；'render' 每页按 render_dpi 整页渲染后识别；
+                   'auto' 对由多个图片切片拼成或文字已转曲、且无文本层的页面整页渲染，其余页面识别内嵌图片
+            pages: 只处理这些页（页码从 1 开始），None 表示全部页面；逐页调用时用于流式解析
+            memo: 同一文档多次调用间共享的识别结果 {图片内容摘要: 识别行}，
+                   逐页调用时跨页重复出现的图片（Logo、水印）只识别一次
             
         Returns:
-            字典：{page_num: [recognized_texts]}
+            字典：{page_num: OCRPageResult}
         """
+        if mode not in ("images", "render", "auto"):
+            raise ValueError(f"未知的 OCR 模式: {mode}（可选: 'images', 'render', 'auto'）")
+        
         logger.info(f"📄 开始处理 PDF: {pdf_path}")
+        start = time.perf_counter()
         
-        # 提取所有图片
-        images = self.extract_images_from_pdf(pdf_path)
+        # run: 本次处理的计数（覆盖、缓存命中、预筛、实际 OCR 的图片及耗时）
+        run = {
+            "covered_references": 0,
+            "cache_hits": 0,
+            "prefilter_skipped": 0,
+            "ocr_indices": [],
+            "ocr_seconds": 0.0,
+            "render_seconds": 0.0,
+            "render_ocr_seconds": 0.0,
+            "memo": memo if memo is not None else {},
+            "errors": {}  # 页码 -> 识别失败原因
+        }
         
-        if not images:
-            logger.warning("⚠️ 未找到图片")
+        # 整页渲染：渲染过的页面视为已覆盖，其中的内嵌图片不再单独识别
+        rendered = {}
+        if mode != "images":
+            render_pages = self._select_render_pages(pdf_path, mode, pages)
+            if render_pages:
+                rendered = self._run_render(pdf_path, [page_num for page_num, _ in render_pages], run)
+                text_boxes = dict(text_boxes or {})
+                for page_num, page_rect in render_pages:
+                    text_boxes[page_num] = [page_rect]
+        
+        # 进程池只有启用共享内存帧缓冲时才走流水线（否则逐任务序列化原始图片字节）
+        pipelined = self.pipeline_depth > 0 and (self.worker_pool is None or self.worker_pool.frames is not None)
+        if mode == "render":
+            images, all_lines = [], []
+        elif pipelined:
+            images, all_lines = self._run_pipeline(pdf_path, batch_size, text_boxes, coverage_threshold, run,
+                                                   pages)
+        else:
+            images, all_lines = self._run_collected(pdf_path, batch_size, text_boxes, coverage_threshold, run,
+                                                    pages)
+        
+        if run["covered_references"]:
+            logger.info(f"⏭️ {run['covered_references']} 处图片已被文本层或整页渲染覆盖，跳过 OCR")
+        if not images and not rendered:
+            if run["covered_references"]:
+                logger.info("✅ 文本层已覆盖全部图片区域，无需 OCR")
+            else:
+                logger.warning("⚠️ 未找到图片")
             return {}
         
-        # 对每张图片进行 OCR
-        results = {}
+        if run["cache_hits"]:
+            logger.info(f"♻️ OCR 缓存命中 {run['cache_hits']} 张图片")
         
-        for img_info in images:
-            page_num = img_info['page']
-            image = img_info['image']
-            
-            logger.info(f"🔍 识别第 {page_num} 页图片 {img_info['index']}...")
-            
-            # 执行 OCR
-            text_results = self.recognize_text(image)
+        # 更新单图平均 OCR 耗时，并估算预筛节省的时间
+        ocr_indices = run["ocr_indices"]
+        with self._stats_lock:
+            if ocr_indices:
+                per_image = run["ocr_seconds"] / len(ocr_indices)
+                self._avg_ocr_seconds = (per_image if self._avg_ocr_seconds is None 
+                                         else 0.8 * self._avg_ocr_seconds + 0.2 * per_image)
+            saved_seconds = run["prefilter_skipped"] * (self._avg_ocr_seconds or 0.0)
+            self.stats["prefilter_saved_seconds"] += saved_seconds
+        if run["prefilter_skipped"]:
+            logger.info(f"⏭️ 预筛跳过 {run['prefilter_skipped']} 张图片，预计节省 {saved_seconds:.2f} 秒")
+        
+        # 识别失败的图片记入所在页的 errors
+        failed = [i for i, lines in enumerate(all_lines) if isinstance(lines, FailedLines)]
+        for i in failed:
+            logger.warning(f"⚠️ 第 {images[i]['page']} 页图片 {images[i]['index']} 识别失败，结果不完整: "
+                           f"{all_lines[i].error}")
+            for occurrence in images[i]['occurrences']:
+                run["errors"].setdefault(occurrence['page'], []).append(
+                    f"图片 {occurrence['index']}: {all_lines[i].error}")
+        
+        # OCR 未初始化时的空结果与识别失败的结果不写入缓存与 memo（下次重新识别）
+        if self.backend is not None or self.worker_pool is not None:
+            for i in ocr_indices:
+                if isinstance(all_lines[i], FailedLines):
+                    continue
+                run["memo"][images[i]['digest']] = all_lines[i]
+                if self.cache is not None:
+                    self.cache.put(images[i]['digest'], self.lang, self.model_version,
+                                   [(np.asarray(box).tolist(), text, float(conf)) for box, text, conf in all_lines[i]])
+        
+        elapsed = time.perf_counter() - start
+        
+        # 映射回图片出现的每一页，按页构建列式结果后用向量化掩码过滤低置信度行
+        placements = []
+        for img_info, lines in zip(images, all_lines):
+            if not lines:
+                continue
             
-            # 过滤低置信度结果
-            filtered_texts = [
-                text for text, conf in text_results 
-                if conf >= confidence_threshold
+            for occurrence in img_info['occurrences']:
+                placements.append((occurrence['page'], occurrence['index'], img_info['size'],
+                                   occurrence['bbox'], lines))
+        
+        page_lines = dict(rendered)
+        for page_num, img_index, size, bbox, lines in sorted(placements, key=lambda p: (p[0], p[1])):
+            for box, text, confidence in lines:
+                page_lines.setdefault(page_num, []).append(
+                    (img_index, box, self._to_page_box(box, size, bbox), text, confidence)
+                )
+        
+        results = {}
+        for page_num in sorted(set(page_lines) | set(run["errors"])):
+            page_result = OCRPageResult.from_lines(page_num, page_lines.get(page_num, []),
+                                                   run["errors"].get(page_num)).filter(confidence_threshold)
+            if len(page_result) or page_result.failed:
+                # 识别失败的页面即使没有文字也保留，调用方据此区分"没有文字"与"识别失败"
+                results[page_num] = page_result
+            if len(page_result):
+                logger.info(f"✅ 第 {page_num} 页识别出 {len(page_result)} 行文本（置信度 ≥ {confidence_threshold}）")
+        
+        # 吞吐统计
+        num_lines = sum(len(lines) for lines in all_lines) + sum(len(lines) for lines in rendered.values())
+        num_pages = len(page_lines)
+        run_stats = {
+            "mode": (("" if mode == "images" else f"{mode}-")
+                     + ("pool-" if self.worker_pool is not None else "pipeline-" if pipelined else "")
+                     + (f"batch({batch_size})" if batch_size else "single")),
+            "pages": num_pages,
+            "rendered_pages": len(rendered),
+            "render_seconds": run["render_seconds"],
+            "render_ocr_seconds": run["render_ocr_seconds"],
+            "images": len(images),
+            "references": sum(len(img['occurrences']) for img in images),
+            "cache_hits": run["cache_hits"],
+            "covered_references": run["covered_references"],
+            "prefilter_skipped": run["prefilter_skipped"],
+            "prefilter_saved_seconds": saved_seconds,
+            "failed_images": len(failed),
+            "failed_pages": sorted(run["errors"]),
+            "lines": num_lines,
+            "elapsed": elapsed,
+            "ocr_seconds": run["ocr_seconds"],
+            "images_per_sec": len(images) / elapsed if elapsed > 0 else 0.0,
+            "lines_per_sec": num_lines / elapsed if elapsed > 0 else 0.0,
+            "seconds_per_page": elapsed / num_pages if num_pages else 0.0
+        }
+        with self._stats_lock:
+            self.last_run_stats = run_stats
+        logger.info(f"⏱️ OCR 吞吐 [{run_stats['mode']}]: "
+                    f"{run_stats['images_per_sec']:.2f} 图/秒，"
+                    f"{run_stats['lines_per_sec']:.2f} 行/秒，"
+                    f"{run_stats['seconds_per_page']:.2f} 秒/页")
+        
+        return results
+    
+    def _select_render_pages(self, pdf_path: str, mode: str,
+                             pages: Optional[Collection[int]] = None) -> List[Tuple[int, Tuple[float, float, float, float]]]:
+        """
+        选出需要整页渲染的页面（pages 不为 None 时只在其中选择）
+        
+        Returns:
+            [(页码, 页面区域)]
+        """
+        selected = []
+        pdf_document = fitz.open(pdf_path)
+        try:
+            for page_num in range(len(pdf_document)):
+                if pages is not None and page_num + 1 not in pages:
+                    continue
+                page = pdf_document[page_num]
+                if mode == "render":
+                    selected.append((page_num + 1, tuple(page.rect)))
+                    continue
+                
+                reason = should_render(page)
+                if reason is not None:
+                    logger.info(f"🖨️ 第 {page_num + 1} 页将整页渲染 OCR（{'多图片切片' if reason == 'pieces' else '矢量文字'}）")
+                    selected.append((page_num + 1, tuple(page.rect)))
+        finally:
+            pdf_document.close()
+        
+        return selected
+    
+    def _run_render(self, pdf_path: str, pages: List[int], run: Dict) -> Dict[int, List[Tuple]]:
+        """
+        整页渲染后 OCR
+        
+        渲染缓冲区在下一页复用，像素以 NumPy 视图直接交给检测模型，不经过 PIL；
+        使用工作进程池时渲染结果写入共享内存槽位后立即渲染下一页，与工作进程中的识别重叠
+        
+        Returns:
+            {page_num: [(图片序号 0, 像素坐标框, 页面坐标框, 文本, 置信度)]}
+        """
+        renderer = PageRenderer(self.render_dpi, self.render_colorspace)
+        render_version = f"{self.model_version}-render"
+        page_lines = {}
+        remote = []  # 进程池模式：[(页码, 页面, 内容摘要, Future)]
+        
+        def finish(page_num, page, digest, lines, fresh):
+            if isinstance(lines, FailedLines):
+                # 识别失败不写入缓存，下次重新识别
+                run["errors"].setdefault(page_num, []).append(f"整页渲染 OCR: {lines.error}")
+                fresh = False
+            if fresh and self.cache is not None and (self.backend is not None or self.worker_pool is not None):
+                self.cache.put(digest, self.lang, render_version,
+                               [(np.asarray(box).tolist(), text, float(conf)) for box, text, conf in lines])
+            page_lines[page_num] = [
+                (0, box, renderer.page_box(box, page), text, confidence)
+                for box, text, confidence in lines
             ]
+        
+        pdf_document = fitz.open(pdf_path)
+        try:
+            for page_num in pages:
+                page_start = time.perf_counter()
+                page = pdf_document[page_num - 1]
+                view = renderer.render(page)
+                run["render_seconds"] += time.perf_counter() - page_start
+                
+                digest = image_digest(view)
+                if self.cache is not None:
+                    cached = self.cache.get(digest, self.lang, render_version)
+                    if cached is not None:
+                        run["cache_hits"] += 1
+                        finish(page_num, page, digest,
+                               [(np.asarray(box, dtype=np.float32), text, conf) for box, text, conf in cached], False)
+                        continue
+                
+                if self.worker_pool is not None:
+                    # 写入共享内存后渲染缓冲区即可复用
+                    remote.append((page_num, page, digest, self.worker_pool.submit_frame(view)))
+                    continue
+                
+                ocr_start = time.perf_counter()
+                image = renderer.to_rgb(view)
+                if self.preprocessor is None:
+                    tiles = [ImageTile(image, 0, 0, (0, 0, image.shape[1], image.shape[0]))]
+                else:
+                    tiles = self.preprocessor.make_tiles(image)
+                lines = self.recognize_prepared(tiles, 1.0)
+                run["render_ocr_seconds"] += time.perf_counter() - ocr_start
+                
+                finish(page_num, page, digest, lines, True)
+                logger.info(f"🖨️ 第 {page_num} 页整页渲染 OCR：{len(lines)} 行，"
+                            f"{time.perf_counter() - page_start:.2f} 秒")
             
-            if filtered_texts:
-                if page_num not in results:
-                    results[page_num] = []
-                results[page_num].extend(filtered_texts)
+            for page_num, page, digest, future in remote:
+                lines = self._remote_lines(future, 1.0, run, "render_ocr_seconds")
+                finish(page_num, page, digest, lines, True)
+                logger.info(f"🖨️ 第 {page_num} 页整页渲染 OCR：{len(lines)} 行")
+        finally:
+            pdf_document.close()
+            renderer.close()
+        
+        return page_lines
+    
+    def _remote_lines(self, 
+                      future, 
+                      scale: float, 
+                      run: Dict, 
+                      timer: str = "ocr_seconds") -> List[Tuple[np.ndarray, str, float]]:
+        """等待进程池帧任务完成，把紧凑结果还原为 [(原图坐标框, 文本, 置信度)]"""
+        try:
+            boxes, texts, confidences, seconds = future.result()
+        except Exception as e:
+            logger.error(f"❌ OCR 工作进程任务失败: {e}")
+            return FailedLines(error=f"OCR 工作进程任务失败: {e}")
+        
+        run[timer] += seconds
+        boxes = boxes / np.float32(scale)
+        return [(boxes[k], texts[k], float(confidences[k])) for k in range(len(texts))]
+    
+    @staticmethod
+    def _is_covered(occurrence: Dict, 
+                    text_boxes: Dict[int, List[Tuple[float, float, float, float]]], 
+                    coverage_threshold: float) -> bool:
+        """图片的某次出现位置是否已被文本层覆盖"""
+        if occurrence['bbox'] is None:
+            return False
+        page_boxes = text_boxes.get(occurrence['page'], [])
+        return LayoutAnalyzer.covered_fraction(occurrence['bbox'], page_boxes) >= coverage_threshold
+    
+    def _filter_covered(self, 
+                        img_info: Dict, 
+                        text_boxes: Dict[int, List[Tuple[float, float, float, float]]], 
+                        coverage_threshold: float) -> int:
+        """只保留未被文本层覆盖的出现位置，返回被去掉的出现次数"""
+        uncovered = [
+            occ for occ in img_info['occurrences']
+            if not self._is_covered(occ, text_boxes, coverage_threshold)
+        ]
+        covered = len(img_info['occurrences']) - len(uncovered)
+        img_info['occurrences'] = uncovered
+        return covered
+    
+    def _early_result(self, img_info: Dict, run: Dict) -> Optional[List[Tuple[np.ndarray, str, float]]]:
+        """
+        不经模型即可得到的结果：本文档已识别过（memo）或缓存命中返回已有结果，预筛判定无文字返回空列表，
+        需要 OCR 时返回 None
+        """
+        memoized = run["memo"].get(img_info['digest'])
+        if memoized is not None:
+            run["cache_hits"] += 1
+            return memoized
+        
+        if self.cache is not None:
+            cached = self.cache.get(img_info['digest'], self.lang, self.model_version)
+            if cached is not None:
+                run["cache_hits"] += 1
+                return [(np.asarray(box, dtype=np.float32), text, conf) for box, text, conf in cached]
+        
+        # 文字可能性预筛：跳过照片、无标注图表、背景纹理
+        if self.scorer is not None:
+            score = self.scorer.score(self.load_image(img_info))
+            skipped = score < self.text_score_threshold
+            with self._stats_lock:
+                self.stats["prefilter_checked"] += 1
+                if skipped:
+                    self.stats["prefilter_skipped"] += 1
+            if skipped:
+                run["prefilter_skipped"] += 1
+                logger.info(f"⏭️ 第 {img_info['page']} 页图片 {img_info['index']} "
+                            f"文字可能性 {score:.2f} < {self.text_score_threshold}，跳过 OCR")
+                return []
+        
+        return None
+    
+    def _run_collected(self, 
+                       pdf_path: str, 
+                       batch_size: Optional[int], 
+                       text_boxes: Optional[Dict], 
+                       coverage_threshold: float, 
+                       run: Dict,
+                       pages: Optional[Collection[int]] = None) -> Tuple[List[Dict], List[List]]:
+        """先提取全部图片再统一识别（进程池模式，或关闭流水线时使用）"""
+        images = self.extract_images_from_pdf(pdf_path, pages=pages)
+        
+        # 文本层覆盖检查：只保留未被文本层覆盖的出现位置，全部被覆盖的图片不再 OCR
+        if text_boxes is not None:
+            uncovered_images = []
+            for img_info in images:
+                run["covered_references"] += self._filter_covered(img_info, text_boxes, coverage_threshold)
+                if img_info['occurrences']:
+                    uncovered_images.append(img_info)
+            images = uncovered_images
+        
+        # 先查跨文档缓存、做预筛，只对剩余图片执行 OCR
+        # all_lines[i]: 第 i 张图片的 [(像素坐标框, 文本, 置信度)]
+        all_lines = [self._early_result(img_info, run) for img_info in images]
+        pending = [i for i, lines in enumerate(all_lines) if lines is None]
+        
+        ocr_start = time.perf_counter()
+        
+        # 执行 OCR：进程池模式交给常驻模型的工作进程；批量模式跨图片、跨页汇总文本行后分批识别
+        if self.worker_pool is not None and pending:
+            logger.info(f"🔍 提交 {len(pending)} 张图片到 OCR 工作进程池...")
+            pool_results = self.worker_pool.recognize_many(
+                [(images[i]['image_bytes'], estimate_dpi(images[i]['size'], images[i]['bbox'])) for i in pending],
+                batch_size
+            )
+            for i, lines in zip(pending, pool_results):
+                all_lines[i] = lines
+        elif batch_size and pending:
+            logger.info(f"🔍 批量识别 {len(pending)} 张图片（每批 {batch_size} 行）...")
+            batch_results = self.recognize_batch_lines(
+                [images[i]['image_bytes'] for i in pending],
+                batch_size,
+                source_dpis=[estimate_dpi(images[i]['size'], images[i]['bbox']) for i in pending]
+            )
+            for i, lines in zip(pending, batch_results):
+                all_lines[i] = lines
+        else:
+            for i in pending:
+                img_info = images[i]
+                logger.info(f"🔍 识别第 {img_info['page']} 页图片 {img_info['index']}...")
+                all_lines[i] = self.recognize_lines(
+                    self.load_image(img_info),
+                    source_dpi=estimate_dpi(img_info['size'], img_info['bbox'])
+                )
+        
+        run["ocr_indices"] = pending
+        run["ocr_seconds"] = time.perf_counter() - ocr_start
+        return images, all_lines
+    
+    def _run_pipeline(self, 
+                      pdf_path: str, 
+                      batch_size: Optional[int], 
+                      text_boxes: Optional[Dict], 
+                      coverage_threshold: float, 
+                      run: Dict,
+                      pages: Optional[Collection[int]] = None) -> Tuple[List[Dict], List[List]]:
+        """
+        生产者/消费者流水线
+        
+        生产者线程逐页提取图片，查缓存、预筛后完成解码与预处理，放入有界队列；
+        消费者线程从队列取出已预处理的图片执行推理。队列满时生产者阻塞（背压），
+        同一时刻驻留内存的解码图片不超过 pipeline_depth + 消费者数量张。
+        
+        使用带共享内存帧缓冲的工作进程池时，生产者直接把预处理后的像素写入共享内存槽位并提交给进程池，
+        槽位耗尽时阻塞（背压由槽位数决定）
+        """
+        images = []
+        all_lines = []
+        deferred = []  # 首次出现位置已被文本层覆盖的图片，后续出现位置可能仍需 OCR
+        remote = self.worker_pool is not None
+        futures = []   # 进程池模式：[(图片序号, 缩放比例, Future)]
+        num_consumers = 0 if remote else max(1, self.pipeline_workers)
+        work = queue.Queue(maxsize=self.pipeline_depth)
+        lock = threading.Lock()
+        
+        def produce():
+            try:
+                for img_info in self.iter_images(pdf_path, pages=pages):
+                    i = len(images)
+                    images.append(img_info)
+                    all_lines.append([])
+                    
+                    if (text_boxes is not None 
+                            and self._is_covered(img_info['occurrences'][0], text_boxes, coverage_threshold)):
+                        deferred.append(i)
+                        img_info.pop('image_bytes')
+                        continue
+                    
+                    lines = self._early_result(img_info, run)
+                    if lines is not None:
+                        all_lines[i] = lines
+                        img_info.pop('image_bytes')
+                        continue
+                    
+                    try:
+                        prepared = self.prepare_image(self.load_image(img_info),
+                                                      estimate_dpi(img_info['size'], img_info['bbox']))
+                    except Exception as e:
+                        logger.error(f"❌ 图片解码失败（第 {img_info['page']} 页图片 {img_info['index']}）: {e}")
+                        all_lines[i] = FailedLines(error=f"图片解码失败: {e}")
+                        continue
+                    finally:
+                        img_info.pop('image_bytes')
+                    
+                    if remote:
+                        img_array, _, scale = prepared
+                        del prepared
+                        futures.append((i, scale, self.worker_pool.submit_frame(img_array, batch_size)))
+                    else:
+                        # 队列已满时阻塞，直到消费者取走
+                        work.put((i, prepared))
+            except Exception as e:
+                logger.error(f"❌ 图片提取线程异常: {e}")
+            finally:
+                for _ in range(num_consumers):
+                    work.put(None)
+        
+        def consume():
+            finished = False
+            while not finished:
+                item = work.get()
+                if item is None:
+                    break
+                
+                items = [item]
+                if batch_size:
+                    # 批量模式：顺带取走队列中已就绪的图片一起识别，不额外等待
+                    while len(items) < self.pipeline_depth:
+                        try:
+                            item = work.get_nowait()
+                        except queue.Empty:
+                            break
+                        if item is None:
+                            finished = True
+                            break
+                        items.append(item)
                 
-                logger.info(f"✅ 识别出 {len(filtered_texts)} 行文本（置信度 ≥ {confidence_threshold}）")
+                ocr_start = time.perf_counter()
+                try:
+                    if batch_size:
+                        results = self.recognize_prepared_batch([prepared for _, prepared in items], batch_size)
+                    else:
+                        results = [self.recognize_prepared(tiles, scale) for _, (_, tiles, scale) in items]
+                except Exception as e:
+                    # 失败的图片标记为 FailedLines：不写入缓存，并记入所在页的 errors
+                    logger.error(f"❌ OCR 识别失败: {e}")
+                    results = [FailedLines(error=f"OCR 识别失败: {e}") for _ in items]
+                
+                with lock:
+                    run["ocr_seconds"] += time.perf_counter() - ocr_start
+                    for (i, _), lines in zip(items, results):
+                        all_lines[i] = lines
+                        run["ocr_indices"].append(i)
         
-        return results
+        threads = [threading.Thread(target=produce, name="ocr-producer", daemon=True)]
+        threads += [threading.Thread(target=consume, name=f"ocr-consumer-{n}", daemon=True)
+                    for n in range(num_consumers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        for i, scale, future in futures:
+            all_lines[i] = self._remote_lines(future, scale, run)
+            run["ocr_indices"].append(i)
+        
+        if text_boxes is None:
+            return images, all_lines
+        
+        # 文本层覆盖检查：去掉所有被覆盖的出现位置；首次出现被覆盖、后续出现未被覆盖的图片补充识别
+        for img_info in images:
+            run["covered_references"] += self._filter_covered(img_info, text_boxes, coverage_threshold)
+        
+        late = [i for i in deferred if images[i]['occurrences']]
+        if late:
+            pdf_document = fitz.open(pdf_path)
+            try:
+                for i in late:
+                    img_info = images[i]
+                    img_info['image_bytes'] = pdf_document.extract_image(img_info['xref'])["image"]
+                    lines = self._early_result(img_info, run)
+                    if lines is None:
+                        image = self.load_image(img_info)
+                        source_dpi = estimate_dpi(img_info['size'], img_info['bbox'])
+                        ocr_start = time.perf_counter()
+                        if remote:
+                            img_array, _, scale = self.prepare_image(image, source_dpi)
+                            lines = self._remote_lines(self.worker_pool.submit_frame(img_array, batch_size),
+                                                       scale, run)
+                        else:
+                            lines = self.recognize_lines(image, source_dpi)
+                            run["ocr_seconds"] += time.perf_counter() - ocr_start
+                        run["ocr_indices"].append(i)
+                    all_lines[i] = lines
+                    img_info.pop('image_bytes')
+            finally:
+                pdf_document.close()
+        
+        kept = [i for i, img_info in enumerate(images) if img_info['occurrences']]
+        index_map = {old: new for new, old in enumerate(kept)}
+        run["ocr_indices"] = [index_map[i] for i in run["ocr_indices"] if i in index_map]
+        return [images[i] for i in kept], [all_lines[i] for i in kept]
+    
+    @staticmethod
+    def _to_page_box(box: np.ndarray, size: Tuple[int, int], bbox) -> Optional[np.ndarray]:
+        """图片像素坐标框 → 页面坐标框（按图片在页面上的显示区域线性映射）"""
+        if bbox is None:
+            return None
+        x0, y0, x1, y1 = tuple(bbox)
+        scale = np.float32([(x1 - x0) / size[0], (y1 - y0) / size[1]])
+        return np.asarray(box, dtype=np.float32) * scale + np.float32([x0, y0])
     
     def save_images(self, images: List[Dict], output_dir: str, prefix: str = "image") -> List[str]:
         """
@@ -197,11 +1201,11 @@ class ImageOCR:
         for img_info in images:
             page_num = img_info['page']
             img_index = img_info['index']
-            image = img_info['image']
             
-            # 保存图片
-            img_path = output_path / f"{prefix}_page{page_num}_img{img_index}.png"
-            image.save(img_path)
+            # 直接写出原始图片字节，无需解码再编码
+            img_path = output_path / f"{prefix}_page{page_num}_img{img_index}.{img_info['ext']}"
+            with open(img_path, 'wb') as f:
+                f.write(img_info['image_bytes'])
             saved_files.append(str(img_path))
             
             logger.info(f"💾 保存图片: {img_path}")
@@ -0,0 +1,208 @@
+"""
+OCR 图片预处理模块
+按有效 DPI 归一化分辨率、转灰度，并对超大页面做带重叠的切片，
+OCR 坐标可映射回原图坐标系
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import List, Tuple, Optional
+
+import numpy as np
+import cv2
+from PIL import Image
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def estimate_dpi(pixel_size: Tuple[int, int], bbox) -> Optional[float]:
+    """
+    根据图片像素尺寸和在页面上的显示区域估算有效 DPI
+    
+    Args:
+        pixel_size: 图片像素尺寸 (width, height)
+        bbox: 页面上的显示区域（fitz.Rect 或 (x0, y0, x1, y1)，单位为点，72 点 = 1 英寸）
+    
+    Returns:
+        有效 DPI，无法估算时返回 None
+    """
+    if bbox is None:
+        return None
+    
+    x0, y0, x1, y1 = tuple(bbox)
+    width_pt = x1 - x0
+    if width_pt <= 0:
+        return None
+    
+    return pixel_size[0] / (width_pt / 72.0)
+
+
+@dataclass
+class ImageTile:
+    """切片数据类"""
+    array: np.ndarray
+    x_offset: int  # 切片在预处理后图片中的左上角坐标
+    y_offset: int
+    core: Tuple[int, int, int, int]  # 本切片"负责"的区域（预处理后坐标），用于重叠区去重
+
+
+@dataclass
+class PreparedImage:
+    """预处理结果数据类"""
+    array: np.ndarray  # 预处理后的图片（3 通道）
+    scale: float       # 预处理图 = 原图 * scale
+    tiles: List[ImageTile]
+
+
+class OCRPreprocessor:
+    """OCR 预处理器：分辨率归一化 + 灰度化 + 重叠切片"""
+    
+    def __init__(self,
+                 target_dpi: float = 300.0,
+                 max_side: int = 4096,
+                 max_upscale: float = 2.0,
+                 grayscale: bool = True,
+                 tile_size: int = 2048,
+                 tile_overlap: int = 128):
+        """
+        初始化预处理器
+        
+        Args:
+            target_dpi: 目标有效 DPI（高于此值的扫描件会被缩小，低于此值的可适度放大）
+            max_side: 预处理后图片长边上限（像素），无 DPI 信息时同样生效
+            max_upscale: 最大放大倍数（避免对低清小图过度插值）
+            grayscale: 是否转为灰度（检测/识别对颜色不敏感，减少内存和计算）
+            tile_size: 切片边长，超过该尺寸的图片按带重叠的条带/网格切分
+            tile_overlap: 相邻切片重叠像素（应大于单行文字高度）
+        """
+        self.target_dpi = target_dpi
+        self.max_side = max_side
+        self.max_upscale = max_upscale
+        self.grayscale = grayscale
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+    
+    def compute_scale(self, size: Tuple[int, int], source_dpi: Optional[float] = None) -> float:
+        """
+        计算缩放比例
+        
+        Args:
+            size: 原图尺寸 (width, height)
+            source_dpi: 原图有效 DPI（None 表示未知）
+        
+        Returns:
+            缩放比例
+        """
+        scale = 1.0
+        if source_dpi:
+            scale = min(self.target_dpi / source_dpi, self.max_upscale)
+        
+        # 长边上限
+        longest = max(size) * scale
+        if longest > self.max_side:
+            scale *= self.max_side / longest
+        
+        return scale
+    
+    def prepare(self, image: Image.Image, source_dpi: Optional[float] = None) -> PreparedImage:
+        """
+        预处理单张图片
+        
+        Args:
+            image: PIL Image 对象
+            source_dpi: 原图有效 DPI
+        
+        Returns:
+            预处理结果（图片数组、缩放比例、切片）
+        """
+        scale = self.compute_scale(image.size, source_dpi)
+        
+        # 先在 PIL 中完成灰度化与缩放，避免为原始大图分配 3 通道数组
+        image = image.convert("L" if self.grayscale else "RGB")
+        if abs(scale - 1.0) > 1e-3:
+            new_size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+            resample = Image.LANCZOS if scale < 1 else Image.BICUBIC
+            image = image.resize(new_size, resample)
+        
+        array = np.asarray(image)
+        if array.ndim == 2:
+            # 检测/识别模型需要 3 通道输入
+            array = cv2.cvtColor(array, cv2.COLOR_GRAY2RGB)
+        
+        return PreparedImage(array=array, scale=scale, tiles=self.make_tiles(array))
+    
+    def _spans(self, length: int) -> List[Tuple[int, int, int, int]]:
+        """
+        一维切分：返回 [(start, end, core_start, core_end)]
+        core 区间互不重叠且覆盖全长，重叠区按中线分配给相邻切片
+        """
+        if length <= self.tile_size:
+            return [(0, length, 0, length)]
+        
+        step = self.tile_size - self.tile_overlap
+        starts = list(range(0, length - self.tile_overlap, step))
+        spans = []
+        for i, start in enumerate(starts):
+            end = min(start + self.tile_size, length)
+            core_start = 0 if i == 0 else start + self.tile_overlap // 2
+            core_end = length if i == len(starts) - 1 else starts[i + 1] + self.tile_overlap // 2
+            spans.append((start, end, core_start, core_end))
+            if end == length:
+                spans[-1] = (start, end, core_start, length)
+                break
+        
+        return spans
+    
+    def make_tiles(self, array: np.ndarray) -> List[ImageTile]:
+        """
+        切分超大图片
+        
+        文本行是横向的，宽度不超过 tile_size 时只做水平条带切分，避免把一行文字从中间截断
+        
+        Args:
+            array: 预处理后的图片数组
+        
+        Returns:
+            切片列表（图片不超限时只有一个覆盖全图的切片）
+        """
+        height, width = array.shape[:2]
+        tiles = []
+        
+        for y0, y1, cy0, cy1 in self._spans(height):
+            for x0, x1, cx0, cx1 in self._spans(width):
+                tiles.append(ImageTile(
+                    array=array[y0:y1, x0:x1],
+                    x_offset=x0,
+                    y_offset=y0,
+                    core=(cx0, cy0, cx1, cy1)
+                ))
+        
+        if len(tiles) > 1:
+            logger.info(f"🧩 图片 {width}x{height} 切分为 {len(tiles)} 个切片")
+        
+        return tiles
+    
+    @staticmethod
+    def tile_to_prepared(box: np.ndarray, tile: ImageTile) -> Optional[np.ndarray]:
+        """
+        切片坐标 → 预处理图坐标；框中心不在本切片负责区域内时返回 None（由相邻切片负责）
+        
+        Args:
+            box: 切片内的四边形框 (4, 2)
+            tile: 所属切片
+        
+        Returns:
+            预处理图坐标下的框，或 None
+        """
+        box = np.asarray(box, dtype=np.float32) + np.float32([tile.x_offset, tile.y_offset])
+        cx, cy = box.mean(axis=0)
+        x0, y0, x1, y1 = tile.core
+        if x0 <= cx < x1 and y0 <= cy < y1:
+            return box
+        return None
+    
+    @staticmethod
+    def to_original(box: np.ndarray, scale: float) -> np.ndarray:
+        """预处理图坐标 → 原图坐标"""
+        return np.asarray(box, dtype=np.float32) / scale
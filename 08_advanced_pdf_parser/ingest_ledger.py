@@ -0,0 +1,288 @@
+"""
+入库进度账本模块
+目录 / 清单批量入库时，把每个文件的状态、内容摘要、耗时和输出位置记录到本地 SQLite，
+重启后跳过已完成文件，按内容摘要识别不同路径下的重复文件，失败文件按指数退避重试
+"""
+
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import List, Dict, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 文件状态
+RUNNING, DONE, FAILED, DUPLICATE = "running", "done", "failed", "duplicate"
+
+
+def file_digest(path: str, block_size: int = 1024 * 1024) -> str:
+    """计算文件内容摘要（SHA-256，分块读取）"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def discover_inputs(source: str, pattern: str = "*.pdf") -> List[str]:
+    """
+    解析入库输入
+    
+    Args:
+        source: 目录（递归匹配 pattern）或清单文件
+                （.json 为路径列表或 [{'path': ...}]，其他为每行一个路径，# 开头为注释）；
+                清单中的相对路径相对于清单所在目录；路径统一转为绝对路径作为账本键
+        pattern: 目录模式下的文件名匹配模式
+    
+    Returns:
+        去重后的文件路径列表（保持顺序）
+    """
+    source = Path(source)
+    if source.is_dir():
+        paths = sorted(str(p.resolve()) for p in source.rglob(pattern) if p.is_file())
+    else:
+        if source.suffix == ".json":
+            entries = json.loads(source.read_text(encoding="utf-8"))
+            entries = [e["path"] if isinstance(e, dict) else e for e in entries]
+        else:
+            lines = source.read_text(encoding="utf-8").splitlines()
+            entries = [line.strip() for line in lines if line.strip() and not line.strip().startswith("#")]
+        paths = [str((source.parent / p).resolve()) for p in map(Path, entries)]
+    
+    return list(dict.fromkeys(paths))
+
+
+class IngestLedger:
+    """可断点续跑的入库进度账本（SQLite 持久化）"""
+    
+    def __init__(self,
+                 ledger_path: str,
+                 max_attempts: int = 3,
+                 backoff_base: float = 30.0,
+                 backoff_max: float = 3600.0):
+        """
+        初始化账本
+        
+        Args:
+            ledger_path: 账本数据库文件路径
+            max_attempts: 单个文件最多尝试次数（含被中断的尝试），用尽后不再重试
+            backoff_base: 首次失败后的重试等待秒数，之后每次翻倍
+            backoff_max: 重试等待秒数上限
+        """
+        self.ledger_path = Path(ledger_path)
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        
+        self.ledger_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.ledger_path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ingest_files ("
+            "  path TEXT PRIMARY KEY,"
+            "  content_hash TEXT,"
+            "  size INTEGER,"
+            "  mtime REAL,"
+            "  status TEXT NOT NULL,"
+            "  attempts INTEGER NOT NULL DEFAULT 0,"
+            "  next_attempt REAL NOT NULL DEFAULT 0,"
+            "  last_error TEXT,"
+            "  started REAL,"
+            "  finished REAL,"
+            "  duration REAL,"
+            "  output TEXT,"
+            "  records INTEGER,"
+            "  duplicate_of TEXT"
+            ")"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_ingest_hash ON ingest_files(content_hash, status)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_ingest_status ON ingest_files(status)")
+        
+        # 上次运行中断时仍为 running 的文件：该次尝试已计数，重新排队
+        interrupted = self._conn.execute(
+            "UPDATE ingest_files SET status = ?, last_error = ? WHERE status = ?",
+            (FAILED, "interrupted", RUNNING)
+        ).rowcount
+        self._conn.commit()
+        if interrupted:
+            logger.warning(f"⚠️ 账本中有 {interrupted} 个文件上次运行被中断，将重新处理")
+    
+    def _row(self, path: str) -> Optional[sqlite3.Row]:
+        cursor = self._conn.execute("SELECT * FROM ingest_files WHERE path = ?", (path,))
+        cursor.row_factory = sqlite3.Row
+        return cursor.fetchone()
+    
+    def claim(self, path: str) -> Dict:
+        """
+        判断文件是否需要处理；需要处理时标记为 running 并计入一次尝试
+        
+        未变化文件（大小、修改时间与账本一致）复用已记录的摘要，不重新读取内容；
+        需要计算摘要时在账本锁之外读取文件，不阻塞其他文件的 claim / complete
+        
+        Args:
+            path: 文件路径
+        
+        Returns:
+            {'action', 'content_hash', ...}，action 为：
+            - 'process': 需要处理
+            - 'done': 已完成且内容未变化，跳过
+            - 'duplicate': 内容与另一路径已完成或正在处理的文件相同，跳过（duplicate_of 为该路径；
+              该文件之后失败或内容变化时，本文件在下次 claim 时重新处理）
+            - 'deferred': 失败后仍在退避等待中（next_attempt 为可重试时间）
+            - 'exhausted': 已用尽重试次数
+        """
+        stat = Path(path).stat()
+        
+        with self._lock:
+            row = self._row(path)
+        unchanged = row is not None and row["size"] == stat.st_size and row["mtime"] == stat.st_mtime
+        content_hash = row["content_hash"] if unchanged else file_digest(path)
+        
+        with self._lock:
+            # 计算摘要期间账本可能已被其他线程更新，重新读取
+            row = self._row(path)
+            
+            if row is not None and row["content_hash"] == content_hash:
+                if row["status"] == DONE or (row["status"] == DUPLICATE and self._original_alive(row)):
+                    return {"action": row["status"], "content_hash": content_hash,
+                            "output": row["output"], "duplicate_of": row["duplicate_of"]}
+                if row["status"] == FAILED and row["attempts"] >= self.max_attempts:
+                    return {"action": "exhausted", "content_hash": content_hash, "error": row["last_error"]}
+                if row["status"] == FAILED and row["next_attempt"] > time.time():
+                    return {"action": "deferred", "content_hash": content_hash,
+                            "next_attempt": row["next_attempt"]}
+                attempts = row["attempts"]
+            else:
+                attempts = 0  # 新文件或内容已变化，重新计数
+            
+            # 已完成的优先；同一内容正在被其他线程 / 进程处理时同样视为重复，避免重复解析
+            original = self._conn.execute(
+                "SELECT path, output FROM ingest_files WHERE content_hash = ? AND status IN (?, ?) AND path != ? "
+                "ORDER BY status = ? DESC LIMIT 1",
+                (content_hash, DONE, RUNNING, path, DONE)
+            ).fetchone()
+            now = time.time()
+            
+            if original is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO ingest_files "
+                    "(path, content_hash, size, mtime, status, attempts, started, finished, duration, "
+                    " output, duplicate_of) VALUES (?, ?, ?, ?, ?, 0, ?, ?, 0, ?, ?)",
+                    (path, content_hash, stat.st_size, stat.st_mtime, DUPLICATE, now, now, original[1], original[0])
+                )
+                self._conn.commit()
+                return {"action": DUPLICATE, "content_hash": content_hash,
+                        "output": original[1], "duplicate_of": original[0]}
+            
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ingest_files "
+                "(path, content_hash, size, mtime, status, attempts, last_error, started) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, content_hash, stat.st_size, stat.st_mtime, RUNNING, attempts + 1,
+                 row["last_error"] if row is not None and attempts else None, now)
+            )
+            self._conn.commit()
+        
+        return {"action": "process", "content_hash": content_hash, "attempt": attempts + 1}
+    
+    def _original_alive(self, row: sqlite3.Row) -> bool:
+        """重复文件所指向的文件是否仍为相同内容且已完成或正在处理（调用方已持有 _lock）"""
+        original = self._row(row["duplicate_of"]) if row["duplicate_of"] else None
+        return (original is not None and original["content_hash"] == row["content_hash"]
+                and original["status"] in (DONE, RUNNING))
+    
+    def complete(self, path: str, output: Optional[str] = None, records: Optional[int] = None):
+        """
+        标记文件处理完成
+        
+        Args:
+            path: 文件路径
+            output: 输出位置（结果文件或导出目录）
+            records: 导出的记录数
+        """
+        with self._lock:
+            now = time.time()
+            self._conn.execute(
+                "UPDATE ingest_files SET status = ?, finished = ?, duration = ? - started, "
+                "output = ?, records = ?, last_error = NULL WHERE path = ?",
+                (DONE, now, now, output, records, path)
+            )
+            # 在本文件处理期间被判为重复的文件，补记输出位置
+            self._conn.execute(
+                "UPDATE ingest_files SET output = ? WHERE status = ? AND duplicate_of = ?",
+                (output, DUPLICATE, path)
+            )
+            self._conn.commit()
+    
+    def fail(self, path: str, error: str) -> Optional[float]:
+        """
+        标记文件处理失败，并按已尝试次数安排下次重试
+        
+        Returns:
+            下次可重试时间（时间戳），重试次数已用尽时返回 None
+        """
+        with self._lock:
+            row = self._row(path)
+            attempts = row["attempts"] if row is not None else self.max_attempts
+            now = time.time()
+            next_attempt = now + min(self.backoff_base * 2 ** max(attempts - 1, 0), self.backoff_max)
+            self._conn.execute(
+                "UPDATE ingest_files SET status = ?, finished = ?, duration = ? - started, "
+                "last_error = ?, next_attempt = ? WHERE path = ?",
+                (FAILED, now, now, error, next_attempt, path)
+            )
+            self._conn.commit()
+        
+        return next_attempt if attempts < self.max_attempts else None
+    
+    def next_retry(self, paths: List[str]) -> Optional[float]:
+        """给定文件中仍可重试的失败文件的最早重试时间，没有则返回 None"""
+        wanted = set(paths)
+        with self._lock:
+            times = [row[0] for row in self._conn.execute(
+                "SELECT next_attempt, path FROM ingest_files WHERE status = ? AND attempts < ?",
+                (FAILED, self.max_attempts)
+            ) if row[1] in wanted]
+        return min(times) if times else None
+    
+    def summary(self) -> Dict:
+        """
+        账本汇总
+        
+        Returns:
+            {'files', 'done', 'failed', 'duplicate', 'running', 'records', 'duration'}
+        """
+        with self._lock:
+            counts = dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM ingest_files GROUP BY status"
+            ).fetchall())
+            records, duration = self._conn.execute(
+                "SELECT COALESCE(SUM(records), 0), COALESCE(SUM(duration), 0) FROM ingest_files WHERE status = ?",
+                (DONE,)
+            ).fetchone()
+        
+        return {
+            "files": sum(counts.values()),
+            **{status: counts.get(status, 0) for status in (DONE, FAILED, DUPLICATE, RUNNING)},
+            "records": records,
+            "duration": round(duration, 3)
+        }
+    
+    def failures(self) -> List[Dict]:
+        """失败文件列表 [{'path', 'attempts', 'last_error', 'next_attempt'}]"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, attempts, last_error, next_attempt FROM ingest_files WHERE status = ? ORDER BY path",
+                (FAILED,)
+            ).fetchall()
+        return [{"path": p, "attempts": a, "last_error": e, "next_attempt": n} for p, a, e, n in rows]
+    
+    def close(self):
+        """关闭账本"""
+        with self._lock:
+            self._conn.close()
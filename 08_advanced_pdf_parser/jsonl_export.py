@@ -0,0 +1,264 @@
+"""
+JSONL 分片导出模块
+批量处理时把逐页 / 逐分块记录追加写入按大小轮转的 JSONL（NDJSON）分片，可选 gzip / zstd 压缩，
+分片写完后登记到清单，下游可按清单并行读取；输出目录已有清单时接着已有分片续写
+"""
+
+import os
+import io
+import gzip
+import json
+import logging
+from pathlib import Path
+from functools import partial
+from typing import List, Dict, Iterator, Callable, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+COMPRESSION_SUFFIXES = {None: "", "gzip": ".gz", "zstd": ".zst"}
+
+
+class ShardedJSONLWriter:
+    """按大小轮转的 JSONL 分片写入器"""
+    
+    def __init__(self,
+                 output_dir: str,
+                 prefix: str = "part",
+                 max_shard_bytes: int = 256 * 1024 * 1024,
+                 max_shard_records: Optional[int] = None,
+                 compression: Optional[str] = None,
+                 compression_level: int = 3,
+                 buffer_size: int = 1024 * 1024):
+        """
+        初始化写入器
+        
+        输出目录中已有 manifest.json 时接着其中的分片编号与记录数续写（上次运行未写完的 .tmp 分片被丢弃）
+        
+        Args:
+            output_dir: 输出目录（分片与 manifest.json）
+            prefix: 分片文件名前缀
+            max_shard_bytes: 单个分片未压缩字节数上限（按下游批量导入的单文件大小设置）
+            max_shard_records: 单个分片记录数上限，None 表示不限
+            compression: None / 'gzip' / 'zstd'（zstd 需要 zstandard 包）
+            compression_level: 压缩级别
+            buffer_size: 写缓冲区大小
+        """
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"不支持的压缩格式: {compression}（可选: {list(COMPRESSION_SUFFIXES)}）")
+        
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.prefix = prefix
+        self.max_shard_bytes = max_shard_bytes
+        self.max_shard_records = max_shard_records
+        self.compression = compression
+        self.compression_level = compression_level
+        self.buffer_size = buffer_size
+        
+        self.shards: List[Dict] = []
+        self.total_records = 0
+        self._committed: List[Callable] = []  # 当前分片写完后执行的回调
+        self._raw = None
+        self._stream = None
+        self._shard_path: Optional[Path] = None
+        self._shard_records = 0
+        self._shard_bytes = 0
+        
+        manifest_path = self.output_dir / "manifest.json"
+        if manifest_path.exists():
+            self._resume(manifest_path)
+    
+    def _resume(self, manifest_path: Path):
+        """读取已有清单，后续分片接着编号"""
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != MANIFEST_VERSION:
+            raise ValueError(f"不支持的清单版本: {manifest.get('version')}（当前 {MANIFEST_VERSION}）")
+        if manifest.get("compression") != self.compression:
+            raise ValueError(f"已有导出的压缩格式为 {manifest.get('compression')}，与当前 {self.compression} 不一致")
+        
+        self.shards = manifest["shards"]
+        self.total_records = sum(s["records"] for s in self.shards)
+        logger.info(f"📂 续写已有导出: {len(self.shards)} 个分片，{self.total_records} 条记录")
+    
+    def _open_shard(self):
+        """打开新分片（先写入 .tmp 文件，完成后重命名）"""
+        name = f"{self.prefix}-{len(self.shards):05d}.jsonl{COMPRESSION_SUFFIXES[self.compression]}"
+        self._shard_path = self.output_dir / name
+        self._raw = open(self._shard_path.with_name(name + ".tmp"), "wb", buffering=self.buffer_size)
+        
+        if self.compression == "gzip":
+            self._stream = gzip.GzipFile(fileobj=self._raw, mode="wb", compresslevel=self.compression_level)
+        elif self.compression == "zstd":
+            import zstandard
+            compressor = zstandard.ZstdCompressor(level=self.compression_level)
+            self._stream = compressor.stream_writer(self._raw, closefd=False)
+        else:
+            self._stream = self._raw
+        
+        self._shard_records = 0
+        self._shard_bytes = 0
+    
+    def _close_shard(self):
+        """结束当前分片：刷新压缩流、重命名为正式文件并更新清单"""
+        if self._stream is None:
+            return
+        
+        if self._stream is not self._raw:
+            self._stream.close()  # gzip / zstd 写出尾部（不关闭底层文件）
+        tmp_path = Path(self._raw.name)
+        self._raw.close()
+        os.replace(tmp_path, self._shard_path)
+        
+        self.shards.append({
+            "path": self._shard_path.name,
+            "records": self._shard_records,
+            "bytes": self._shard_bytes,
+            "file_bytes": self._shard_path.stat().st_size
+        })
+        self._stream = self._raw = None
+        self._write_manifest(complete=False)
+        logger.info(f"💾 分片已写出: {self._shard_path.name}（{self._shard_records} 条记录）")
+        
+        committed, self._committed = self._committed, []
+        for callback in committed:
+            callback()
+    
+    def write(self, record: Dict):
+        """
+        追加一条记录（超过分片大小/记录数上限时轮转）
+        
+        Args:
+            record: 可 JSON 序列化的字典
+        """
+        if self._stream is None:
+            self._open_shard()
+        
+        line = (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        self._stream.write(line)
+        self._shard_records += 1
+        self._shard_bytes += len(line)
+        self.total_records += 1
+        
+        if (self._shard_bytes >= self.max_shard_bytes
+                or (self.max_shard_records and self._shard_records >= self.max_shard_records)):
+            self._close_shard()
+    
+    def write_all(self, records, committed: Optional[Callable[[int], None]] = None) -> int:
+        """
+        追加多条记录
+        
+        Args:
+            records: 记录迭代器
+            committed: 这些记录所在的分片写完并登记到清单后调用 committed(记录数)，
+                       供入库账本等需要在记录落盘后才确认完成的场景使用
+        
+        Returns:
+            写入的记录数
+        """
+        count = 0
+        for record in records:
+            self.write(record)
+            count += 1
+        
+        if committed is not None:
+            if self._stream is None:
+                committed(count)  # 没有未写完的分片（无记录，或最后一条恰好触发轮转）
+            else:
+                self._committed.append(partial(committed, count))
+        return count
+    
+    def flush(self):
+        """结束当前分片并登记到清单（清单仍标记为未完成，之后的记录写入新分片）"""
+        self._close_shard()
+    
+    def _write_manifest(self, complete: bool):
+        """原子写入清单：只列出已写完的分片"""
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "format": "jsonl",
+            "compression": self.compression,
+            "complete": complete,
+            "total_records": sum(s["records"] for s in self.shards),
+            "shards": self.shards
+        }
+        tmp_path = self.output_dir / "manifest.json.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.output_dir / "manifest.json")
+    
+    def close(self):
+        """结束最后一个分片并标记清单完成"""
+        self._close_shard()
+        self._write_manifest(complete=True)
+        logger.info(f"✅ JSONL 导出完成: {len(self.shards)} 个分片，{self.total_records} 条记录")
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+def page_records(result: Dict) -> Iterator[Dict]:
+    """
+    解析结果 → 逐页记录
+    
+    Args:
+        result: AdvancedPDFLoader.parse() 的结果
+    
+    Yields:
+        {'source', 'page', 'text', 'tables': [{'columns', 'rows', 'bbox'}], 'ocr_lines'}
+    """
+    source = result.get("metadata", {}).get("file_name")
+    blocks = result.get("layout", {}).get("blocks", [])
+    ocr_results = result.get("ocr_results", {})
+    
+    texts: Dict[int, List[str]] = {}
+    for block in blocks:
+        if block.block_type in ["title", "body"]:
+            texts.setdefault(block.page, []).append(block.text)
+    
+    tables: Dict[int, List[Dict]] = {}
+    for table in result.get("tables", []):
+        tables.setdefault(table.attrs.get("page", 0), []).append({
+            "columns": ["" if c is None or c != c else str(c) for c in table.columns],
+            "rows": table.fillna("").astype(str).values.tolist(),
+            "bbox": list(table.attrs["bbox"]) if table.attrs.get("bbox") else None
+        })
+    
+    for page in sorted(set(texts) | set(tables) | set(ocr_results)):
+        yield {
+            "source": source,
+            "page": page,
+            "text": "\n\n".join(texts.get(page, [])),
+            "tables": tables.get(page, []),
+            "ocr_lines": ocr_results.get(page, [])
+        }
+
+
+def read_shard(path: str) -> Iterator[Dict]:
+    """
+    读取单个分片（按扩展名自动解压）
+    
+    Args:
+        path: 分片路径
+    
+    Yields:
+        记录
+    """
+    path = str(path)
+    if path.endswith(".gz"):
+        stream = gzip.open(path, "rb")
+    elif path.endswith(".zst"):
+        import zstandard
+        stream = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+    else:
+        stream = open(path, "rb")
+    
+    with stream, io.TextIOWrapper(stream, encoding="utf-8") as lines:
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
@@ -4,7 +4,9 @@
 """
 
 import fitz  # PyMuPDF
-from typing import List, Dict, Tuple
+import pdfplumber
+import math
+from typing import List, Dict, Tuple, Iterator, Optional
 import logging
 from dataclasses import dataclass
 
@@ -18,7 +20,7 @@ class TextBlock:
     text: str
     bbox: Tuple[float, float, float, float]  # (x0, y0, x1, y1)
     page: int
-    block_type: str  # 'title', 'body', 'footer', 'header'
+    block_type: str  # 'title', 'body', 'footer', 'header', 'ocr'（OCR 文本）
     column: int  # 所属列（0, 1, 2...）
     font_size: float
     font_name: str
@@ -27,14 +29,18 @@ class TextBlock:
 class LayoutAnalyzer:
     """PDF 版面分析器"""
     
-    def __init__(self, column_threshold: float = 50.0):
+    def __init__(self, column_threshold: float = 50.0, backend: str = 'pymupdf'):
         """
         初始化版面分析器
         
         Args:
             column_threshold: 列分隔阈值（像素），用于判断是否为多栏布局
+            backend: 文本提取后端
+                   - 'pymupdf': 使用 PyMuPDF 文本块（默认）
+                   - 'pdfplumber': 使用 pdfplumber 词对象，可与表格提取共享页面解析结果
         """
         self.column_threshold = column_threshold
+        self.backend = backend
     
     def extract_text_blocks(self, pdf_path: str) -> List[TextBlock]:
         """
@@ -46,54 +52,98 @@ class LayoutAnalyzer:
         Returns:
             文本块列表
         """
+        if self.backend == 'pdfplumber':
+            return self._extract_text_blocks_with_pdfplumber(pdf_path)
+        
         text_blocks = []
         
         try:
             pdf_document = fitz.open(pdf_path)
             
-            for page_num in range(len(pdf_document)):
-                page = pdf_document[page_num]
+            for page in pdf_document:
+                text_blocks.extend(self.extract_text_blocks_from_fitz_page(page))
+            
+            pdf_document.close()
+            logger.info(f"✅ 提取 {len(text_blocks)} 个文本块")
+        
+        except Exception as e:
+            logger.error(f"❌ 文本块提取失败: {e}")
+        
+        return text_blocks
+    
+    def extract_text_blocks_from_fitz_page(self, page) -> List[TextBlock]:
+        """
+        从已打开的 PyMuPDF 页面提取文本块
+        
+        Args:
+            page: PyMuPDF Page 对象
+            
+        Returns:
+            该页的文本块列表
+        """
+        text_blocks = []
+        
+        # 获取页面文本块（包含位置、字体等信息）
+        blocks = page.get_text("dict")["blocks"]
+        
+        for block in blocks:
+            # 跳过图片块
+            if block.get("type") != 0:
+                continue
+            
+            # 提取文本行
+            text_lines = []
+            font_sizes = []
+            font_names = []
+            
+            for line in block.get("lines", []):
+                line_text = ""
+                for span in line.get("spans", []):
+                    line_text += span.get("text", "")
+                    font_sizes.append(span.get("size", 0))
+                    font_names.append(span.get("font", ""))
                 
-                # 获取页面文本块（包含位置、字体等信息）
-                blocks = page.get_text("dict")["blocks"]
+                if line_text.strip():
+                    text_lines.append(line_text)
+            
+            if text_lines:
+                # 计算平均字体大小
+                avg_font_size = sum(font_sizes) / len(font_sizes) if font_sizes else 12
+                most_common_font = max(set(font_names), key=font_names.count) if font_names else ""
                 
-                for block in blocks:
-                    # 跳过图片块
-                    if block.get("type") != 0:
-                        continue
-                    
-                    # 提取文本行
-                    text_lines = []
-                    font_sizes = []
-                    font_names = []
-                    
-                    for line in block.get("lines", []):
-                        line_text = ""
-                        for span in line.get("spans", []):
-                            line_text += span.get("text", "")
-                            font_sizes.append(span.get("size", 0))
-                            font_names.append(span.get("font", ""))
-                        
-                        if line_text.strip():
-                            text_lines.append(line_text)
-                    
-                    if text_lines:
-                        # 计算平均字体大小
-                        avg_font_size = sum(font_sizes) / len(font_sizes) if font_sizes else 12
-                        most_common_font = max(set(font_names), key=font_names.count) if font_names else ""
-                        
-                        text_block = TextBlock(
-                            text="\n".join(text_lines),
-                            bbox=tuple(block["bbox"]),
-                            page=page_num + 1,
-                            block_type="body",  # 初始类型，稍后分类
-                            column=0,  # 初始列号，稍后分配
-                            font_size=avg_font_size,
-                            font_name=most_common_font
-                        )
-                        text_blocks.append(text_block)
+                text_block = TextBlock(
+                    text="\n".join(text_lines),
+                    bbox=tuple(block["bbox"]),
+                    page=page.number + 1,
+                    block_type="body",  # 初始类型，稍后分类
+                    column=0,  # 初始列号，稍后分配
+                    font_size=avg_font_size,
+                    font_name=most_common_font
+                )
+                text_blocks.append(text_block)
+        
+        return text_blocks
+    
+    def _extract_text_blocks_with_pdfplumber(self, pdf_path: str) -> List[TextBlock]:
+        """
+        使用 pdfplumber 逐页提取文本块（每页处理完即释放缓存）
+        
+        Args:
+            pdf_path: PDF 文件路径
+            
+        Returns:
+            文本块列表
+        """
+        text_blocks = []
+        
+        try:
+            with pdfplumber.open(pdf_path) as pdf:
+                for page in pdf.pages:
+                    try:
+                        text_blocks.extend(self.extract_text_blocks_from_plumber_page(page))
+                    finally:
+                        page.close()
             
-            pdf_document.close()
             logger.info(f"✅ 提取 {len(text_blocks)} 个文本块")
         
         except Exception as e:
@@ -101,6 +151,80 @@ class LayoutAnalyzer:
         
         return text_blocks
     
+    def extract_text_blocks_from_plumber_page(self, page) -> List[TextBlock]:
+        """
+        从已打开的 pdfplumber 页面构建文本块
+        
+        复用页面已缓存的字符对象：词 → 行（同一基线、水平间隙小于列阈值）→ 块（行距相近）。
+        坐标系与 PyMuPDF 一致（原点在左上角）
+        
+        Args:
+            page: pdfplumber Page 对象
+            
+        Returns:
+            该页的文本块列表
+        """
+        words = page.extract_words(extra_attrs=["size", "fontname"])
+        if not words:
+            return []
+        
+        # 1. 词 → 行：按 top 聚合，水平间隙过大（跨栏）时断开
+        words.sort(key=lambda w: (round(w["top"]), w["x0"]))
+        lines = []
+        for word in words:
+            last = lines[-1] if lines else None
+            if (last is not None 
+                    and abs(word["top"] - last["top"]) <= 3 
+                    and word["x0"] - last["x1"] <= self.column_threshold):
+                last["words"].append(word)
+                last["x0"] = min(last["x0"], word["x0"])
+                last["x1"] = max(last["x1"], word["x1"])
+                last["bottom"] = max(last["bottom"], word["bottom"])
+            else:
+                lines.append({
+                    "words": [word],
+                    "x0": word["x0"], "top": word["top"],
+                    "x1": word["x1"], "bottom": word["bottom"]
+                })
+        
+        # 2. 行 → 块：按列起点分组后，行距不超过行高的一半则合并
+        lines.sort(key=lambda l: (l["x0"] // self.column_threshold, l["top"]))
+        groups = []
+        for line in lines:
+            last = groups[-1][-1] if groups else None
+            if (last is not None 
+                    and line["x0"] // self.column_threshold == last["x0"] // self.column_threshold
+                    and line["top"] - last["bottom"] <= (last["bottom"] - last["top"]) * 0.5):
+                groups[-1].append(line)
+            else:
+                groups.append([line])
+        
+        blocks = []
+        for group in groups:
+            group_words = [w for line in group for w in line["words"]]
+            font_sizes = [w.get("size", 0) for w in group_words]
+            font_names = [w.get("fontname", "") for w in group_words]
+            
+            blocks.append(TextBlock(
+                text="\n".join(
+                    " ".join(w["text"] for w in sorted(line["words"], key=lambda w: w["x0"]))
+                    for line in group
+                ),
+                bbox=(
+                    min(l["x0"] for l in group),
+                    min(l["top"] for l in group),
+                    max(l["x1"] for l in group),
+                    max(l["bottom"] for l in group)
+                ),
+                page=page.page_number,
+                block_type="body",
+                column=0,
+                font_size=sum(font_sizes) / len(font_sizes) if font_sizes else 12,
+                font_name=max(set(font_names), key=font_names.count) if font_names else ""
+            ))
+        
+        return blocks
+    
     def classify_blocks(self, blocks: List[TextBlock]) -> List[TextBlock]:
         """
         对文本块进行分类（标题、正文、页眉、页脚）
@@ -228,12 +352,13 @@ class LayoutAnalyzer:
         logger.info(f"✅ 文本块已按阅读顺序重排")
         return reordered_blocks
     
-    def analyze_layout(self, pdf_path: str) -> Dict:
+    def analyze_layout(self, pdf_path: str, blocks: Optional[List[TextBlock]] = None) -> Dict:
         """
         综合版面分析：提取、分类、检测多栏、重排序
         
         Args:
             pdf_path: PDF 文件路径
+            blocks: 已提取的文本块（如表格扫描时共享页面得到的块），None 表示重新提取
             
         Returns:
             分析结果字典
@@ -241,7 +366,8 @@ class LayoutAnalyzer:
         logger.info(f"📄 开始版面分析: {pdf_path}")
         
         # 1. 提取文本块
-        blocks = self.extract_text_blocks(pdf_path)
+        if blocks is None:
+            blocks = self.extract_text_blocks(pdf_path)
         
         if not blocks:
             logger.warning("⚠️ 未提取到文本块")
@@ -278,6 +404,101 @@ class LayoutAnalyzer:
             "summary": summary
         }
     
+    def layout_page(self, blocks: List[TextBlock]) -> List[TextBlock]:
+        """
+        单页版面分析：分类、检测多栏、重排序（流式处理用，标题判定以本页平均字号为基准）
+        
+        Args:
+            blocks: 同一页的文本块
+            
+        Returns:
+            按阅读顺序排列的文本块
+        """
+        if not blocks:
+            return blocks
+        
+        blocks = self.classify_blocks(blocks)
+        blocks = self.detect_columns(blocks, blocks[0].page)
+        return self.reorder_by_reading_order(blocks)
+    
+    def iter_page_blocks(self, pdf_path: str) -> Iterator[Tuple[int, List[TextBlock]]]:
+        """
+        逐页提取并排序文本块（生成器，下游可在后续页面解析期间消费已完成的页面）
+        
+        Args:
+            pdf_path: PDF 文件路径
+            
+        Yields:
+            (页码, 按阅读顺序排列的文本块)
+        """
+        if self.backend == 'pdfplumber':
+            with pdfplumber.open(pdf_path) as pdf:
+                for page in pdf.pages:
+                    try:
+                        blocks = self.extract_text_blocks_from_plumber_page(page)
+                    finally:
+                        page.close()
+                    yield page.page_number, self.layout_page(blocks)
+            return
+        
+        pdf_document = fitz.open(pdf_path)
+        try:
+            for page in pdf_document:
+                yield page.number + 1, self.layout_page(self.extract_text_blocks_from_fitz_page(page))
+        finally:
+            pdf_document.close()
+    
+    @staticmethod
+    def text_boxes_by_page(blocks: List[TextBlock]) -> Dict[int, List[Tuple[float, float, float, float]]]:
+        """
+        按页汇总文本层的文本块区域
+        
+        Args:
+            blocks: 文本块列表
+            
+        Returns:
+            字典：{page_num: [bbox, ...]}
+        """
+        boxes = {}
+        for block in blocks:
+            if block.text.strip():
+                boxes.setdefault(block.page, []).append(block.bbox)
+        return boxes
+    
+    @staticmethod
+    def covered_fraction(rect, boxes: List[Tuple[float, float, float, float]], grid: int = 32) -> float:
+        """
+        计算区域被文本块覆盖的比例（将区域划分为 grid × grid 网格，统计中心点被覆盖的格子）
+        
+        Args:
+            rect: 目标区域（fitz.Rect 或 (x0, y0, x1, y1)）
+            boxes: 文本块区域列表
+            grid: 网格精度
+            
+        Returns:
+            0 ~ 1 的覆盖比例
+        """
+        x0, y0, x1, y1 = tuple(rect)
+        if x1 <= x0 or y1 <= y0 or not boxes:
+            return 0.0
+        
+        cell_w = (x1 - x0) / grid
+        cell_h = (y1 - y0) / grid
+        covered = set()
+        
+        for bx0, by0, bx1, by1 in boxes:
+            # 中心点落在文本块内的格子下标范围
+            col_start = max(0, math.ceil((bx0 - x0) / cell_w - 0.5))
+            col_end = min(grid - 1, math.floor((bx1 - x0) / cell_w - 0.5))
+            row_start = max(0, math.ceil((by0 - y0) / cell_h - 0.5))
+            row_end = min(grid - 1, math.floor((by1 - y0) / cell_h - 0.5))
+            
+            for row in range(row_start, row_end + 1):
+                for col in range(col_start, col_end + 1):
+                    covered.add((row, col))
+        
+        return len(covered) / (grid * grid)
+    
     def export_to_text(self, blocks: List[TextBlock], output_path: str):
         """
         导出分析结果为文本文件（保持阅读顺序）
@@ -0,0 +1,403 @@
+"""
+OCR 后端模块
+定义统一的 OCR 后端接口（检测、批量识别、预热、关闭），并提供 PaddleOCR、Tesseract、
+ONNX Runtime 适配器以及用于测试/基准的确定性桩引擎
+"""
+
+import time
+import hashlib
+import logging
+from abc import ABC, abstractmethod
+from importlib import metadata
+from typing import List, Tuple
+
+import numpy as np
+import cv2
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _package_version(name: str) -> str:
+    """获取已安装包版本（未安装返回 unknown）"""
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def crop_text_region(img_array: np.ndarray, box: np.ndarray) -> np.ndarray:
+    """按四边形检测框透视变换裁剪文本行，竖排文本旋转为横排"""
+    points = np.asarray(box, dtype=np.float32)
+    width = int(max(np.linalg.norm(points[0] - points[1]), np.linalg.norm(points[2] - points[3])))
+    height = int(max(np.linalg.norm(points[0] - points[3]), np.linalg.norm(points[1] - points[2])))
+    width, height = max(width, 1), max(height, 1)
+    
+    target = np.float32([[0, 0], [width, 0], [width, height], [0, height]])
+    matrix = cv2.getPerspectiveTransform(points, target)
+    crop = cv2.warpPerspective(img_array, matrix, (width, height),
+                               borderMode=cv2.BORDER_REPLICATE, flags=cv2.INTER_CUBIC)
+    
+    if height / width >= 1.5:
+        crop = np.rot90(crop)
+    
+    return crop
+
+
+class OCRBackend(ABC):
+    """
+    OCR 后端接口
+    
+    子类必须实现 detect 与 recognize_batch（抽象方法，缺少时无法实例化）；ocr 默认由"检测 → 裁剪 → 识别"组合而成，
+    引擎自带整图识别流程时可覆盖
+    """
+    
+    name = "base"
+    # 同一实例能否被多个线程同时调用（决定 OCR 流水线消费者数与并发控制下 OCR 阶段的并发上限）
+    thread_safe = False
+    
+    @property
+    def version(self) -> str:
+        """后端版本标识（用于缓存键，模型或参数变化时应随之变化）"""
+        return self.name
+    
+    @abstractmethod
+    def detect(self, image: np.ndarray) -> List[np.ndarray]:
+        """
+        文本行检测
+        
+        Args:
+            image: RGB 图片数组 (H, W, 3)
+        
+        Returns:
+            四边形框列表，每个为 (4, 2) 数组
+        """
+        raise NotImplementedError
+    
+    def classify(self, crops: List[np.ndarray]) -> List[np.ndarray]:
+        """方向分类（纠正倒置文本行），默认不处理"""
+        return crops
+    
+    @abstractmethod
+    def recognize_batch(self, crops: List[np.ndarray]) -> List[Tuple[str, float]]:
+        """
+        批量识别文本行
+        
+        Args:
+            crops: 文本行图片列表
+        
+        Returns:
+            与 crops 一一对应的 [(文本, 置信度)]
+        """
+        raise NotImplementedError
+    
+    def ocr(self, image: np.ndarray, cls: bool = True) -> List[Tuple[np.ndarray, str, float]]:
+        """
+        整图识别
+        
+        Args:
+            image: RGB 图片数组
+            cls: 是否进行方向分类
+        
+        Returns:
+            [(四边形框, 文本, 置信度)]
+        """
+        boxes = self.detect(image)
+        if not boxes:
+            return []
+        
+        crops = [crop_text_region(image, box) for box in boxes]
+        if cls:
+            crops = self.classify(crops)
+        
+        return [
+            (np.asarray(box, dtype=np.float32), text, float(confidence))
+            for box, (text, confidence) in zip(boxes, self.recognize_batch(crops))
+        ]
+    
+    def warmup(self):
+        """预热：用一张合成图片跑一遍完整流程，摊销首次调用的初始化开销"""
+        image = np.full((64, 256, 3), 255, dtype=np.uint8)
+        cv2.putText(image, "warmup", (8, 44), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 0), 2)
+        self.ocr(image)
+    
+    def close(self):
+        """释放模型资源"""
+        pass
+
+
+class PaddleOCRBackend(OCRBackend):
+    """PaddleOCR 后端（Paddle Inference）"""
+    
+    name = "paddle"
+    
+    def __init__(self, lang: str = 'ch', use_angle_cls: bool = True, rec_batch_size: int = 16, **kwargs):
+        """
+        Args:
+            lang: 语言模型（'ch': 中文, 'en': 英文）
+            use_angle_cls: 是否加载方向分类模型
+            rec_batch_size: 识别模型每批文本行数量
+            **kwargs: 透传给 PaddleOCR 的其他参数
+        """
+        from paddleocr import PaddleOCR
+        
+        self.engine = PaddleOCR(use_angle_cls=use_angle_cls, lang=lang, show_log=False,
+                                rec_batch_num=rec_batch_size, **kwargs)
+    
+    @property
+    def version(self) -> str:
+        return f"paddleocr-{_package_version('paddleocr')}"
+    
+    def detect(self, image: np.ndarray) -> List[np.ndarray]:
+        dt_boxes, _ = self.engine.text_detector(image)
+        return [] if dt_boxes is None else list(dt_boxes)
+    
+    def classify(self, crops: List[np.ndarray]) -> List[np.ndarray]:
+        # 未启用方向分类时 PaddleOCR 不会创建 text_classifier
+        if getattr(self.engine, "text_classifier", None) is None:
+            return crops
+        crops, _, _ = self.engine.text_classifier(crops)
+        return crops
+    
+    def recognize_batch(self, crops: List[np.ndarray]) -> List[Tuple[str, float]]:
+        rec_res, _ = self.engine.text_recognizer(crops)
+        return [(text, float(confidence)) for text, confidence in rec_res]
+    
+    def ocr(self, image: np.ndarray, cls: bool = True) -> List[Tuple[np.ndarray, str, float]]:
+        result = self.engine.ocr(image, cls=cls)
+        
+        lines = []
+        if result and result[0]:
+            for line in result[0]:
+                lines.append((np.asarray(line[0], dtype=np.float32), line[1][0], float(line[1][1])))
+        return lines
+
+
+class OnnxOCRBackend(OCRBackend):
+    """
+    ONNX Runtime 后端：直接运行导出为 ONNX 的 PaddleOCR 检测/方向/识别模型
+    
+    支持线程数控制与 INT8 动态量化，不依赖 Paddle Inference
+    """
+    
+    name = "onnx"
+    thread_safe = True
+    
+    def __init__(self,
+                 det_model_path: str,
+                 rec_model_path: str,
+                 rec_char_dict_path: str,
+                 cls_model_path: str = None,
+                 use_angle_cls: bool = True,
+                 rec_batch_size: int = 16,
+                 intra_op_threads: int = None,
+                 inter_op_threads: int = 1,
+                 quantize: bool = False,
+                 det_limit_side_len: int = 960,
+                 **kwargs):
+        """
+        Args:
+            det_model_path: 检测模型 .onnx 路径
+            rec_model_path: 识别模型 .onnx 路径
+            rec_char_dict_path: 识别字典路径（与识别模型对应）
+            cls_model_path: 方向分类模型 .onnx 路径（未提供时不做方向分类）
+            use_angle_cls: 是否进行方向分类
+            rec_batch_size: 识别模型每批文本行数量
+            intra_op_threads: 每个会话的算子内线程数（None 为 onnxruntime 默认值，即全部物理核）
+            inter_op_threads: 每个会话的算子间线程数
+            quantize: 是否使用 INT8 动态量化模型（首次使用时生成 *.int8.onnx 并复用）
+            det_limit_side_len: 检测输入长边上限
+        """
+        from onnx_ocr import (create_session, quantize_model,
+                              OnnxTextDetector, OnnxTextClassifier, OnnxTextRecognizer)
+        
+        if quantize:
+            det_model_path = quantize_model(det_model_path)
+            rec_model_path = quantize_model(rec_model_path)
+            if cls_model_path:
+                cls_model_path = quantize_model(cls_model_path)
+        
+        self.model_paths = (det_model_path, rec_model_path, cls_model_path)
+        self.quantize = quantize
+        self.threads = (intra_op_threads, inter_op_threads)
+        
+        def session(path):
+            return create_session(path, intra_op_threads, inter_op_threads)
+        
+        self.detector = OnnxTextDetector(session(det_model_path), limit_side_len=det_limit_side_len)
+        self.recognizer = OnnxTextRecognizer(session(rec_model_path), rec_char_dict_path,
+                                             batch_size=rec_batch_size)
+        self.classifier = None
+        if use_angle_cls and cls_model_path:
+            self.classifier = OnnxTextClassifier(session(cls_model_path), batch_size=rec_batch_size)
+    
+    @property
+    def version(self) -> str:
+        # 模型文件名参与版本标识（量化模型文件名带 .int8），替换模型后缓存自动失效
+        names = "+".join(str(p).rsplit("/", 1)[-1] for p in self.model_paths if p)
+        return f"onnxruntime-{_package_version('onnxruntime')}-{names}"
+    
+    def detect(self, image: np.ndarray) -> List[np.ndarray]:
+        return self.detector(image)
+    
+    def classify(self, crops: List[np.ndarray]) -> List[np.ndarray]:
+        if self.classifier is None:
+            return crops
+        return self.classifier(crops)
+    
+    def recognize_batch(self, crops: List[np.ndarray]) -> List[Tuple[str, float]]:
+        return self.recognizer(crops)
+    
+    def close(self):
+        self.detector = self.recognizer = self.classifier = None
+
+
+class TesseractBackend(OCRBackend):
+    """Tesseract 后端（pytesseract）"""
+    
+    name = "tesseract"
+    
+    # 项目语言代码 → Tesseract 语言包
+    LANG_MAP = {"ch": "chi_sim", "en": "eng"}
+    
+    def __init__(self, lang: str = 'ch', **kwargs):
+        """
+        Args:
+            lang: 语言（'ch' / 'en' 或 Tesseract 语言包名）
+        """
+        import pytesseract
+        
+        self.pytesseract = pytesseract
+        self.tess_lang = self.LANG_MAP.get(lang, lang)
+    
+    @property
+    def version(self) -> str:
+        return f"tesseract-{self.pytesseract.get_tesseract_version()}-{self.tess_lang}"
+    
+    def _lines(self, image: np.ndarray, psm: int) -> List[Tuple[np.ndarray, str, float]]:
+        """按 (block, paragraph, line) 聚合 image_to_data 的词级结果"""
+        data = self.pytesseract.image_to_data(
+            image, lang=self.tess_lang, config=f"--psm {psm}",
+            output_type=self.pytesseract.Output.DICT
+        )
+        
+        lines = {}
+        for i, word in enumerate(data["text"]):
+            conf = float(data["conf"][i])
+            if not word.strip() or conf < 0:
+                continue
+            key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+            lines.setdefault(key, []).append(i)
+        
+        results = []
+        for key in sorted(lines):
+            ids = lines[key]
+            x0 = min(data["left"][i] for i in ids)
+            y0 = min(data["top"][i] for i in ids)
+            x1 = max(data["left"][i] + data["width"][i] for i in ids)
+            y1 = max(data["top"][i] + data["height"][i] for i in ids)
+            # 中文不以空格分词
+            sep = "" if self.tess_lang.startswith("chi") else " "
+            text = sep.join(data["text"][i] for i in ids)
+            confidence = sum(float(data["conf"][i]) for i in ids) / len(ids) / 100.0
+            box = np.float32([[x0, y0], [x1, y0], [x1, y1], [x0, y1]])
+            results.append((box, text, confidence))
+        
+        return results
+    
+    def detect(self, image: np.ndarray) -> List[np.ndarray]:
+        return [box for box, _, _ in self._lines(image, psm=3)]
+    
+    def recognize_batch(self, crops: List[np.ndarray]) -> List[Tuple[str, float]]:
+        results = []
+        for crop in crops:
+            # psm 7：整张图视为单行文本
+            lines = self._lines(crop, psm=7)
+            if lines:
+                sep = "" if self.tess_lang.startswith("chi") else " "
+                results.append((sep.join(t for _, t, _ in lines), min(c for _, _, c in lines)))
+            else:
+                results.append(("", 0.0))
+        return results
+    
+    def ocr(self, image: np.ndarray, cls: bool = True) -> List[Tuple[np.ndarray, str, float]]:
+        return self._lines(image, psm=3)
+
+
+class StubOCRBackend(OCRBackend):
+    """
+    确定性桩引擎：不加载任何模型
+    
+    检测：按行投影找出深色像素组成的水平文本带；识别：返回由裁剪图内容摘要生成的固定文本。
+    相同输入总是得到相同输出，可用于测试和度量流水线本身（不含模型）的开销
+    """
+    
+    name = "stub"
+    thread_safe = True
+    
+    def __init__(self, latency: float = 0.0, confidence: float = 0.99, **kwargs):
+        """
+        Args:
+            latency: 每个文本行模拟的识别耗时（秒），0 表示不模拟
+            confidence: 返回的置信度
+        """
+        self.latency = latency
+        self.confidence = confidence
+    
+    @property
+    def version(self) -> str:
+        return f"stub-{self.confidence:g}"
+    
+    def detect(self, image: np.ndarray) -> List[np.ndarray]:
+        gray = image.mean(axis=2) if image.ndim == 3 else image
+        dark = gray < 128
+        
+        rows = dark.any(axis=1)
+        boxes = []
+        y = 0
+        height = len(rows)
+        while y < height:
+            if not rows[y]:
+                y += 1
+                continue
+            y0 = y
+            while y < height and rows[y]:
+                y += 1
+            cols = np.flatnonzero(dark[y0:y].any(axis=0))
+            x0, x1 = int(cols[0]), int(cols[-1]) + 1
+            boxes.append(np.float32([[x0, y0], [x1, y0], [x1, y], [x0, y]]))
+        
+        return boxes
+    
+    def recognize_batch(self, crops: List[np.ndarray]) -> List[Tuple[str, float]]:
+        if self.latency:
+            time.sleep(self.latency * len(crops))
+        return [
+            (f"stub:{hashlib.sha1(np.ascontiguousarray(crop).tobytes()).hexdigest()[:8]}", self.confidence)
+            for crop in crops
+        ]
+
+
+# 后端名称 → 实现类
+BACKENDS = {
+    "paddle": PaddleOCRBackend,
+    "onnx": OnnxOCRBackend,
+    "tesseract": TesseractBackend,
+    "stub": StubOCRBackend,
+}
+
+
+def create_backend(name: str, **kwargs) -> OCRBackend:
+    """
+    按名称创建 OCR 后端
+    
+    Args:
+        name: 'paddle' / 'onnx' / 'tesseract' / 'stub'
+        **kwargs: 后端构造参数
+    
+    Returns:
+        OCRBackend 实例
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"未知的 OCR 后端: {name}（可选: {list(BACKENDS)}）")
+    return BACKENDS[name](**kwargs)
@@ -0,0 +1,125 @@
+"""
+OCR 结果缓存模块
+按图片内容摘要 + 语言 + 模型版本持久化缓存 OCR 结果（SQLite），跨文档复用，LRU 淘汰
+"""
+
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import List, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def image_digest(image_bytes: bytes) -> str:
+    """计算图片内容摘要（SHA-256）"""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+class OCRResultCache:
+    """跨文档 OCR 结果缓存（SQLite 持久化，按最近访问时间 LRU 淘汰）"""
+    
+    def __init__(self, cache_path: str, max_entries: int = 10000):
+        """
+        初始化缓存
+        
+        Args:
+            cache_path: 缓存数据库文件路径
+            max_entries: 最大缓存条目数，超出后淘汰最久未访问的条目
+        """
+        self.cache_path = Path(cache_path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.cache_path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ocr_cache ("
+            "  key TEXT PRIMARY KEY,"
+            "  result TEXT NOT NULL,"
+            "  last_access REAL NOT NULL"
+            ")"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_ocr_cache_access ON ocr_cache(last_access)"
+        )
+        self._conn.commit()
+    
+    @staticmethod
+    def make_key(digest: str, lang: str, model_version: str) -> str:
+        """缓存键：内容摘要 + 语言 + 模型版本（任一变化都视为不同结果）"""
+        return f"{digest}:{lang}:{model_version}"
+    
+    def get(self, digest: str, lang: str, model_version: str) -> Optional[List[list]]:
+        """
+        查询缓存
+        
+        Args:
+            digest: 图片内容摘要
+            lang: OCR 语言
+            model_version: 模型版本标识
+        
+        Returns:
+            识别结果列表 [[检测框, 文本, 置信度]]，未命中返回 None
+        """
+        key = self.make_key(digest, lang, model_version)
+        
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM ocr_cache WHERE key = ?", (key,)
+            ).fetchone()
+            
+            if row is None:
+                self.misses += 1
+                return None
+            
+            # 命中时刷新访问时间（LRU）
+            self._conn.execute(
+                "UPDATE ocr_cache SET last_access = ? WHERE key = ?", (time.time(), key)
+            )
+            self._conn.commit()
+            self.hits += 1
+        
+        return json.loads(row[0])
+    
+    def put(self, digest: str, lang: str, model_version: str, result: List[list]):
+        """
+        写入缓存，并在超出容量时淘汰最久未访问的条目
+        
+        Args:
+            digest: 图片内容摘要
+            lang: OCR 语言
+            model_version: 模型版本标识
+            result: 识别结果列表 [[检测框, 文本, 置信度]]（需可 JSON 序列化）
+        """
+        key = self.make_key(digest, lang, model_version)
+        
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ocr_cache (key, result, last_access) VALUES (?, ?, ?)",
+                (key, json.dumps(result, ensure_ascii=False), time.time())
+            )
+            
+            count = self._conn.execute("SELECT COUNT(*) FROM ocr_cache").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM ocr_cache WHERE key IN ("
+                    "  SELECT key FROM ocr_cache ORDER BY last_access ASC LIMIT ?"
+                    ")",
+                    (count - self.max_entries,)
+                )
+                logger.info(f"🧹 OCR 缓存淘汰 {count - self.max_entries} 条")
+            
+            self._conn.commit()
+    
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,325 @@
+"""
+OCR 工作进程池
+每个工作进程启动时加载一次 OCR 模型，之后通过任务队列持续接收图片任务并返回结构化结果，
+多个加载器可共享同一个进程池
+"""
+
+import os
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, Future, wait
+from typing import List, Dict, Tuple, Optional
+
+from shm_ring import SharedFrameRing
+from ocr_result import FailedLines
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 工作进程内常驻的 ImageOCR 实例（由 _init_worker 创建）
+_worker_ocr = None
+
+
+def _init_worker(ocr_kwargs: Dict):
+    """工作进程初始化：加载一次模型并常驻"""
+    global _worker_ocr
+    from image_ocr import ImageOCR
+    
+    _worker_ocr = ImageOCR(**ocr_kwargs)
+    if _worker_ocr.backend is not None:
+        # 预热：首个任务不再承担内存分配与懒加载开销
+        _worker_ocr.backend.warmup()
+    logger.info(f"✅ OCR 工作进程 {os.getpid()} 模型已加载")
+
+
+def _ping() -> Dict:
+    """健康检查任务"""
+    loaded = _worker_ocr is not None and _worker_ocr.backend is not None
+    return {
+        "pid": os.getpid(),
+        "model_loaded": loaded,
+        "version": _worker_ocr.backend.version if loaded else None
+    }
+
+
+def _recognize_job(images: List[Tuple[bytes, Optional[float]]], batch_size: Optional[int]) -> List[List]:
+    """
+    工作进程中执行的识别任务
+    
+    Args:
+        images: [(原始图片字节, 有效 DPI)]
+        batch_size: 批量识别的每批文本行数量（None 表示逐张识别）
+    
+    Returns:
+        与 images 一一对应的结果：[[(四边形框, 文本, 置信度)], ...]（识别失败的图片为 FailedLines）
+    """
+    from PIL import Image
+    import io
+    
+    if batch_size and len(images) > 1:
+        return _worker_ocr.recognize_batch_lines(
+            [image_bytes for image_bytes, _ in images],
+            batch_size,
+            source_dpis=[dpi for _, dpi in images]
+        )
+    
+    return [
+        _worker_ocr.recognize_lines(Image.open(io.BytesIO(image_bytes)), source_dpi=dpi)
+        for image_bytes, dpi in images
+    ]
+
+
+def _recognize_array(array, batch_size: Optional[int]) -> Tuple:
+    """对已预处理的图片数组执行 OCR，结果打包为紧凑数组"""
+    import time
+    import numpy as np
+    import cv2
+    from image_preprocess import ImageTile
+    
+    start = time.perf_counter()
+    if array.ndim == 3 and array.shape[2] == 1:
+        # 灰度帧（如整页渲染结果）在工作进程内扩展为 3 通道
+        array = cv2.cvtColor(array[:, :, 0], cv2.COLOR_GRAY2RGB)
+    
+    height, width = array.shape[:2]
+    if _worker_ocr.preprocessor is not None:
+        tiles = _worker_ocr.preprocessor.make_tiles(array)
+    else:
+        tiles = [ImageTile(array, 0, 0, (0, 0, width, height))]
+    
+    if batch_size:
+        lines = _worker_ocr.recognize_prepared_batch([(array, tiles, 1.0)], batch_size)[0]
+    else:
+        lines = _worker_ocr.recognize_prepared(tiles, 1.0)
+    if isinstance(lines, FailedLines):
+        # 紧凑数组无法携带失败标记：抛出异常，由父进程按任务失败处理（不写入缓存）
+        raise RuntimeError(lines.error)
+    
+    boxes = np.asarray([box for box, _, _ in lines], dtype=np.float32).reshape(-1, 4, 2)
+    confidences = np.asarray([conf for _, _, conf in lines], dtype=np.float32)
+    return boxes, [text for _, text, _ in lines], confidences, time.perf_counter() - start
+
+
+def _recognize_frame_job(frame: Dict, batch_size: Optional[int]) -> Tuple:
+    """
+    工作进程中识别共享内存中的一帧
+    
+    Args:
+        frame: 帧描述（见 SharedFrameRing.write）
+        batch_size: 批量识别的每批文本行数量
+    
+    Returns:
+        (检测框 (N, 4, 2), 文本列表, 置信度 (N,), 耗时)
+    """
+    from shm_ring import attach_frame
+    
+    array = attach_frame(frame)
+    try:
+        return _recognize_array(array, batch_size)
+    finally:
+        del array
+
+
+def _recognize_array_job(array, batch_size: Optional[int]) -> Tuple:
+    """帧超出共享内存槽位容量时的退路：数组随任务序列化传递"""
+    return _recognize_array(array, batch_size)
+
+
+class OCRWorkerPool:
+    """常驻模型的 OCR 工作进程池"""
+    
+    def __init__(self,
+                 pool_size: int = 2,
+                 lang: str = 'ch',
+                 use_angle_cls: bool = True,
+                 rec_batch_size: int = 16,
+                 preprocessor=None,
+                 backend: str = 'paddle',
+                 backend_kwargs: Optional[Dict] = None,
+                 shm_slots: int = 0,
+                 shm_slot_mb: int = 64):
+        """
+        初始化进程池（立即启动工作进程并加载模型）
+        
+        Args:
+            pool_size: 工作进程数量
+            lang: OCR 语言
+            use_angle_cls: 是否使用角度分类
+            rec_batch_size: 批量识别时每批文本行数量
+            preprocessor: OCR 预处理器（在工作进程中执行）
+            backend: 工作进程使用的 OCR 后端名称
+            backend_kwargs: 后端构造参数
+            shm_slots: 共享内存帧缓冲槽位数（> 0 时页面/图片像素经共享内存零拷贝传给工作进程，
+                   同时也是在途帧数上限；0 表示按任务序列化传递原始图片字节）
+            shm_slot_mb: 单个槽位大小（MB），超出的帧退回序列化传递
+        """
+        self.pool_size = pool_size
+        self.lang = lang
+        self.use_angle_cls = use_angle_cls
+        self.ocr_kwargs = {
+            "lang": lang,
+            "use_angle_cls": use_angle_cls,
+            "rec_batch_size": rec_batch_size,
+            "preprocessor": preprocessor,
+            "backend": backend,
+            "backend_kwargs": backend_kwargs
+        }
+        self._backend_version: Optional[str] = None
+        self.frames = SharedFrameRing(shm_slots, shm_slot_mb * 1024 * 1024) if shm_slots > 0 else None
+        
+        # spawn：避免 fork 继承父进程中的推理线程状态
+        self._executor = ProcessPoolExecutor(
+            max_workers=pool_size,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.ocr_kwargs,)
+        )
+        logger.info(f"✅ OCR 工作进程池已启动（{pool_size} 个进程）")
+    
+    def submit(self,
+               images: List[Tuple[bytes, Optional[float]]],
+               batch_size: Optional[int] = None) -> Future:
+        """
+        提交一个识别任务
+        
+        Args:
+            images: [(原始图片字节, 有效 DPI)]
+            batch_size: 批量识别的每批文本行数量
+        
+        Returns:
+            Future，结果为与 images 一一对应的 [[(四边形框, 文本, 置信度)], ...]
+        """
+        return self._executor.submit(_recognize_job, images, batch_size)
+    
+    def submit_frame(self, array, batch_size: Optional[int] = None) -> Future:
+        """
+        提交一帧已预处理的图片（写入共享内存槽位，无空闲槽位时阻塞）
+        
+        Args:
+            array: (H, W, 3) 或 (H, W, 1) uint8 数组
+            batch_size: 批量识别的每批文本行数量
+        
+        Returns:
+            Future，结果为 (检测框 (N, 4, 2), 文本列表, 置信度 (N,), 工作进程耗时)
+        """
+        if self.frames is None or array.nbytes > self.frames.slot_bytes:
+            # 任务参数在后台线程中才序列化，先复制一份，调用方可立即复用自己的缓冲区
+            return self._executor.submit(_recognize_array_job, array.copy(), batch_size)
+        
+        slot = self.frames.acquire()
+        try:
+            frame = self.frames.write(slot, array)
+            future = self._executor.submit(_recognize_frame_job, frame, batch_size)
+        except Exception:
+            self.frames.release(slot)
+            raise
+        
+        # 任务结束（无论成功与否）后归还槽位
+        future.add_done_callback(lambda _: self.frames.release(slot))
+        return future
+    
+    def recognize_many(self,
+                       images: List[Tuple[bytes, Optional[float]]],
+                       batch_size: Optional[int] = None) -> List[List]:
+        """
+        将图片分发到各工作进程识别
+        
+        逐张模式下每张图片一个任务；批量模式下图片均分为 pool_size 组，组内跨图片批量识别
+        
+        Args:
+            images: [(原始图片字节, 有效 DPI)]
+            batch_size: 批量识别的每批文本行数量（None 表示逐张识别）
+        
+        Returns:
+            与 images 一一对应的识别结果（识别失败的图片为 FailedLines）
+        """
+        if not images:
+            return []
+        
+        if batch_size:
+            group_size = -(-len(images) // self.pool_size)
+        else:
+            group_size = 1
+        
+        groups = [images[i:i + group_size] for i in range(0, len(images), group_size)]
+        futures = [self.submit(group, batch_size) for group in groups]
+        
+        results = []
+        for group, future in zip(groups, futures):
+            try:
+                results.extend(future.result())
+            except Exception as e:
+                logger.error(f"❌ OCR 工作进程任务失败: {e}")
+                results.extend(FailedLines(error=f"OCR 工作进程任务失败: {e}") for _ in group)
+        
+        return results
+    
+    @property
+    def backend_version(self) -> str:
+        """工作进程中 OCR 后端的版本标识（首次访问时向进程池查询）"""
+        if self._backend_version is None:
+            try:
+                info = self._executor.submit(_ping).result(timeout=300)
+                self._backend_version = info["version"] or "unavailable"
+            except Exception as e:
+                logger.error(f"❌ 获取 OCR 后端版本失败: {e}")
+                return "unavailable"
+        return self._backend_version
+    
+    def health_check(self, timeout: float = 30.0) -> Dict:
+        """
+        健康检查：向进程池发送探测任务，确认进程存活且模型已加载
+        
+        Args:
+            timeout: 等待探测结果的超时时间（秒）
+        
+        Returns:
+            {'healthy': bool, 'pool_size': n, 'responding_pids': [...], 'errors': [...]}
+        """
+        status = {
+            "healthy": False,
+            "pool_size": self.pool_size,
+            "responding_pids": [],
+            "errors": []
+        }
+        
+        try:
+            futures = [self._executor.submit(_ping) for _ in range(self.pool_size)]
+            done, not_done = wait(futures, timeout=timeout)
+            
+            pids = set()
+            for future in done:
+                try:
+                    info = future.result()
+                    pids.add(info["pid"])
+                    if not info["model_loaded"]:
+                        status["errors"].append(f"进程 {info['pid']} 模型未加载")
+                except Exception as e:
+                    status["errors"].append(str(e))
+            
+            if not_done:
+                status["errors"].append(f"{len(not_done)} 个探测任务超时")
+            
+            status["responding_pids"] = sorted(pids)
+            status["healthy"] = not status["errors"]
+        
+        except Exception as e:
+            # 进程池已损坏（如工作进程崩溃）
+            status["errors"].append(str(e))
+        
+        level = logging.INFO if status["healthy"] else logging.WARNING
+        logger.log(level, f"🩺 OCR 进程池健康检查: {status}")
+        return status
+    
+    def close(self):
+        """关闭进程池"""
+        self._executor.shutdown(wait=True)
+        if self.frames is not None:
+            self.frames.close()
+        logger.info("✅ OCR 工作进程池已关闭")
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,147 @@
+"""
+OCR 结果模块
+按页以列式 NumPy 数组保存 OCR 结果（检测框、置信度、图片序号、行序），字符串只保存一份；
+识别失败的图片以 FailedLines 标记，不写入缓存，并记入所在页的 errors
+"""
+
+from typing import List, Dict, Tuple, Optional
+
+import numpy as np
+
+
+class FailedLines(list):
+    """
+    识别失败（或部分失败）的单张图片结果
+    
+    可按普通的行列表 [(四边形框, 文本, 置信度)] 使用（其中为已识别的行，通常为空），
+    error 记录失败原因；调用方据此区分"确实没有文字"与"识别失败"，失败结果不写入缓存
+    """
+    
+    def __init__(self, lines=(), error: str = ""):
+        super().__init__(lines)
+        self.error = error
+
+
+class OCRPageResult:
+    """单页列式 OCR 结果"""
+    
+    def __init__(self,
+                 page: int,
+                 boxes: np.ndarray,
+                 page_boxes: np.ndarray,
+                 confidences: np.ndarray,
+                 image_index: np.ndarray,
+                 line_order: np.ndarray,
+                 text_ids: np.ndarray,
+                 strings: List[str],
+                 errors: Optional[List[str]] = None):
+        """
+        Args:
+            page: 页码
+            boxes: 图片像素坐标下的四边形框 (N, 4, 2) float32
+            page_boxes: 页面坐标（点）下的四边形框 (N, 4, 2) float32，图片位置未知时为 NaN
+            confidences: 置信度 (N,) float32
+            image_index: 所属图片在该页的序号 (N,) int32
+            line_order: 页内行序 (N,) int32
+            text_ids: 文本在 strings 中的下标 (N,) int32
+            strings: 去重后的文本表
+            errors: 该页识别失败的图片的失败原因（结果可能不完整）
+        """
+        self.page = page
+        self.boxes = boxes
+        self.page_boxes = page_boxes
+        self.confidences = confidences
+        self.image_index = image_index
+        self.line_order = line_order
+        self.text_ids = text_ids
+        self.strings = strings
+        self.errors = list(errors or [])
+    
+    @property
+    def failed(self) -> bool:
+        """该页是否有图片识别失败"""
+        return bool(self.errors)
+    
+    @classmethod
+    def from_lines(cls,
+                   page: int,
+                   lines: List[Tuple[int, np.ndarray, Optional[np.ndarray], str, float]],
+                   errors: Optional[List[str]] = None) -> "OCRPageResult":
+        """
+        由逐行结果构建列式结果
+        
+        Args:
+            page: 页码
+            lines: 按阅读顺序排列的 [(图片序号, 像素坐标框, 页面坐标框或 None, 文本, 置信度)]
+            errors: 该页识别失败的图片的失败原因
+        
+        Returns:
+            OCRPageResult
+        """
+        n = len(lines)
+        boxes = np.zeros((n, 4, 2), dtype=np.float32)
+        page_boxes = np.full((n, 4, 2), np.nan, dtype=np.float32)
+        confidences = np.zeros(n, dtype=np.float32)
+        image_index = np.zeros(n, dtype=np.int32)
+        text_ids = np.zeros(n, dtype=np.int32)
+        
+        strings = []
+        string_ids: Dict[str, int] = {}
+        
+        for i, (img_idx, box, page_box, text, confidence) in enumerate(lines):
+            boxes[i] = box
+            if page_box is not None:
+                page_boxes[i] = page_box
+            confidences[i] = confidence
+            image_index[i] = img_idx
+            if text not in string_ids:
+                string_ids[text] = len(strings)
+                strings.append(text)
+            text_ids[i] = string_ids[text]
+        
+        return cls(page, boxes, page_boxes, confidences, image_index,
+                   np.arange(n, dtype=np.int32), text_ids, strings, errors)
+    
+    def __len__(self) -> int:
+        return len(self.confidences)
+    
+    def filter(self, min_confidence: float) -> "OCRPageResult":
+        """
+        按置信度过滤（向量化掩码，字符串表共享不复制）
+        
+        Args:
+            min_confidence: 最低置信度
+        
+        Returns:
+            过滤后的结果
+        """
+        mask = self.confidences >= min_confidence
+        return OCRPageResult(
+            self.page,
+            self.boxes[mask],
+            self.page_boxes[mask],
+            self.confidences[mask],
+            self.image_index[mask],
+            self.line_order[mask],
+            self.text_ids[mask],
+            self.strings,
+            self.errors
+        )
+    
+    def texts(self) -> List[str]:
+        """纯文本视图（按行序），与旧版 {page: [texts]} 结构兼容"""
+        order = np.argsort(self.line_order, kind="stable")
+        return [self.strings[i] for i in self.text_ids[order]]
+
+
+def to_text_results(pages: Dict[int, OCRPageResult]) -> Dict[int, List[str]]:
+    """
+    列式结果 → 纯文本结果
+    
+    Args:
+        pages: {page_num: OCRPageResult}
+    
+    Returns:
+        {page_num: [texts]}（不含空页）
+    """
+    return {page: result.texts() for page, result in sorted(pages.items()) if len(result)}
@@ -0,0 +1,268 @@
+"""
+ONNX Runtime OCR 推理模块
+直接用 onnxruntime 运行导出为 ONNX 的 PaddleOCR 检测（DB）、方向分类、识别（CTC）模型，
+支持线程数控制与 INT8 动态量化，适用于纯 CPU 节点
+"""
+
+import math
+import logging
+from pathlib import Path
+from typing import List, Tuple, Optional
+
+import numpy as np
+import cv2
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def create_session(model_path: str,
+                   intra_op_threads: Optional[int] = None,
+                   inter_op_threads: int = 1):
+    """
+    创建 CPU 推理会话
+    
+    Args:
+        model_path: .onnx 模型路径
+        intra_op_threads: 单个算子内部的并行线程数（None 表示由 onnxruntime 按核数决定）
+        inter_op_threads: 算子之间的并行线程数（OCR 模型基本是串行图，1 即可）
+    
+    Returns:
+        onnxruntime.InferenceSession
+    """
+    import onnxruntime as ort
+    
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    if intra_op_threads:
+        options.intra_op_num_threads = intra_op_threads
+    options.inter_op_num_threads = inter_op_threads
+    
+    return ort.InferenceSession(str(model_path), sess_options=options,
+                                providers=["CPUExecutionProvider"])
+
+
+def quantize_model(model_path: str, output_path: Optional[str] = None) -> str:
+    """
+    INT8 动态量化（权重量化为 int8，激活在推理时动态量化），已量化的模型直接复用
+    
+    Args:
+        model_path: 原始 .onnx 模型路径
+        output_path: 量化模型输出路径（默认在原文件名后追加 .int8）
+    
+    Returns:
+        量化模型路径
+    """
+    model_path = Path(model_path)
+    output_path = Path(output_path) if output_path else model_path.with_suffix(".int8.onnx")
+    
+    if output_path.exists() and output_path.stat().st_mtime >= model_path.stat().st_mtime:
+        return str(output_path)
+    
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    
+    quantize_dynamic(str(model_path), str(output_path), weight_type=QuantType.QInt8)
+    logger.info(f"✅ 模型已量化: {model_path.name} → {output_path.name}")
+    return str(output_path)
+
+
+class OnnxTextDetector:
+    """DB 文本检测（概率图 → 二值化 → 轮廓 → 外扩四边形）"""
+    
+    MEAN = np.float32([0.485, 0.456, 0.406])
+    STD = np.float32([0.229, 0.224, 0.225])
+    
+    def __init__(self,
+                 session,
+                 limit_side_len: int = 960,
+                 thresh: float = 0.3,
+                 box_thresh: float = 0.6,
+                 unclip_ratio: float = 1.5,
+                 min_size: int = 3):
+        """
+        Args:
+            session: 检测模型推理会话
+            limit_side_len: 输入长边上限（像素）
+            thresh: 概率图二值化阈值
+            box_thresh: 文本框平均概率阈值
+            unclip_ratio: 文本框外扩比例（DB 收缩标注的逆操作）
+            min_size: 文本框最短边下限
+        """
+        self.session = session
+        self.input_name = session.get_inputs()[0].name
+        self.limit_side_len = limit_side_len
+        self.thresh = thresh
+        self.box_thresh = box_thresh
+        self.unclip_ratio = unclip_ratio
+        self.min_size = min_size
+    
+    def _preprocess(self, image: np.ndarray) -> Tuple[np.ndarray, float, float]:
+        """缩放到 32 的倍数并归一化为 NCHW"""
+        height, width = image.shape[:2]
+        ratio = min(1.0, self.limit_side_len / max(height, width))
+        new_h = max(32, int(round(height * ratio / 32)) * 32)
+        new_w = max(32, int(round(width * ratio / 32)) * 32)
+        
+        resized = cv2.resize(image, (new_w, new_h)).astype(np.float32) / 255.0
+        resized = (resized - self.MEAN) / self.STD
+        tensor = resized.transpose(2, 0, 1)[np.newaxis]
+        return np.ascontiguousarray(tensor), new_h / height, new_w / width
+    
+    def _unclip(self, rect) -> Tuple:
+        """按面积/周长外扩最小外接矩形（等价于 DB 的多边形偏移，对矩形框足够）"""
+        (cx, cy), (w, h), angle = rect
+        distance = w * h * self.unclip_ratio / (2 * (w + h) + 1e-6)
+        return (cx, cy), (w + 2 * distance, h + 2 * distance), angle
+    
+    @staticmethod
+    def _order_points(points: np.ndarray) -> np.ndarray:
+        """四点排序为 左上、右上、右下、左下"""
+        points = points[np.argsort(points[:, 0])]
+        left = points[:2][np.argsort(points[:2, 1])]
+        right = points[2:][np.argsort(points[2:, 1])]
+        return np.float32([left[0], right[0], right[1], left[1]])
+    
+    def __call__(self, image: np.ndarray) -> List[np.ndarray]:
+        """
+        检测文本行
+        
+        Args:
+            image: RGB 图片数组
+        
+        Returns:
+            原图坐标下的四边形框列表
+        """
+        tensor, ratio_h, ratio_w = self._preprocess(image)
+        prob = self.session.run(None, {self.input_name: tensor})[0][0, 0]
+        
+        mask = (prob > self.thresh).astype(np.uint8)
+        contours, _ = cv2.findContours(mask, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+        
+        height, width = image.shape[:2]
+        boxes = []
+        for contour in contours:
+            rect = cv2.minAreaRect(contour)
+            if min(rect[1]) < self.min_size:
+                continue
+            
+            # 框内平均概率
+            x, y, w, h = cv2.boundingRect(contour)
+            region = np.zeros((h, w), dtype=np.uint8)
+            cv2.fillPoly(region, [contour - [x, y]], 1)
+            if float(prob[y:y + h, x:x + w][region > 0].mean()) < self.box_thresh:
+                continue
+            
+            rect = self._unclip(rect)
+            if min(rect[1]) < self.min_size + 2:
+                continue
+            
+            box = self._order_points(cv2.boxPoints(rect))
+            box[:, 0] = np.clip(box[:, 0] / ratio_w, 0, width - 1)
+            box[:, 1] = np.clip(box[:, 1] / ratio_h, 0, height - 1)
+            boxes.append(box)
+        
+        return boxes
+
+
+def _resize_norm(crop: np.ndarray, height: int, width: int) -> np.ndarray:
+    """保持宽高比缩放到固定高度，右侧补零到 width，归一化到 [-1, 1]，输出 CHW"""
+    ratio = crop.shape[1] / max(crop.shape[0], 1)
+    resized_w = min(width, max(1, int(math.ceil(height * ratio))))
+    resized = cv2.resize(crop, (resized_w, height)).astype(np.float32)
+    resized = (resized / 255.0 - 0.5) / 0.5
+    
+    padded = np.zeros((3, height, width), dtype=np.float32)
+    padded[:, :, :resized_w] = resized.transpose(2, 0, 1)
+    return padded
+
+
+class OnnxTextClassifier:
+    """文本行方向分类（0° / 180°）"""
+    
+    def __init__(self, session, batch_size: int = 16, thresh: float = 0.9,
+                 image_shape: Tuple[int, int] = (48, 192)):
+        """
+        Args:
+            session: 分类模型推理会话
+            batch_size: 每批文本行数量
+            thresh: 判定为 180° 的最低置信度
+            image_shape: 输入尺寸 (高, 宽)
+        """
+        self.session = session
+        self.input_name = session.get_inputs()[0].name
+        self.batch_size = batch_size
+        self.thresh = thresh
+        self.image_shape = image_shape
+    
+    def __call__(self, crops: List[np.ndarray]) -> List[np.ndarray]:
+        crops = list(crops)
+        height, width = self.image_shape
+        for start in range(0, len(crops), self.batch_size):
+            batch = crops[start:start + self.batch_size]
+            tensor = np.stack([_resize_norm(crop, height, width) for crop in batch])
+            probs = self.session.run(None, {self.input_name: tensor})[0]
+            for i, prob in enumerate(probs):
+                if int(prob.argmax()) == 1 and float(prob[1]) > self.thresh:
+                    crops[start + i] = cv2.rotate(crops[start + i], cv2.ROTATE_180)
+        return crops
+
+
+class OnnxTextRecognizer:
+    """CTC 文本识别"""
+    
+    def __init__(self, session, char_dict_path: str, batch_size: int = 16,
+                 image_height: int = 48, use_space_char: bool = True):
+        """
+        Args:
+            session: 识别模型推理会话
+            char_dict_path: 字典文件（每行一个字符，与导出模型一致，如 ppocr_keys_v1.txt）
+            batch_size: 每批文本行数量
+            image_height: 输入高度
+            use_space_char: 字典末尾是否追加空格
+        """
+        self.session = session
+        self.input_name = session.get_inputs()[0].name
+        self.batch_size = batch_size
+        self.image_height = image_height
+        
+        with open(char_dict_path, "r", encoding="utf-8") as f:
+            chars = [line.rstrip("\r\n") for line in f]
+        if use_space_char:
+            chars.append(" ")
+        # 下标 0 为 CTC blank
+        self.characters = ["blank"] + chars
+    
+    def _decode(self, probs: np.ndarray) -> List[Tuple[str, float]]:
+        """贪心 CTC 解码：合并重复、去掉 blank，置信度为保留字符概率均值"""
+        indices = probs.argmax(axis=2)
+        max_probs = probs.max(axis=2)
+        
+        results = []
+        for seq, seq_probs in zip(indices, max_probs):
+            keep = seq != 0
+            keep[1:] &= seq[1:] != seq[:-1]
+            chars = seq[keep]
+            text = "".join(self.characters[c] for c in chars if c < len(self.characters))
+            confidence = float(seq_probs[keep].mean()) if keep.any() else 0.0
+            results.append((text, confidence))
+        return results
+    
+    def __call__(self, crops: List[np.ndarray]) -> List[Tuple[str, float]]:
+        if not crops:
+            return []
+        
+        # 按宽高比排序，同批宽度接近，减少补零计算
+        order = sorted(range(len(crops)), key=lambda i: crops[i].shape[1] / max(crops[i].shape[0], 1))
+        results: List[Optional[Tuple[str, float]]] = [None] * len(crops)
+        
+        for start in range(0, len(order), self.batch_size):
+            batch_ids = order[start:start + self.batch_size]
+            max_ratio = max(crops[i].shape[1] / max(crops[i].shape[0], 1) for i in batch_ids)
+            width = max(int(math.ceil(self.image_height * max_ratio)), self.image_height * 4)
+            tensor = np.stack([_resize_norm(crops[i], self.image_height, width) for i in batch_ids])
+            probs = self.session.run(None, {self.input_name: tensor})[0]
+            for i, result in zip(batch_ids, self._decode(probs)):
+                results[i] = result
+        
+        return results
@@ -0,0 +1,134 @@
+"""
+整页渲染模块
+按指定 DPI 与颜色空间把 PDF 页面光栅化到可复用的 Pixmap 缓冲区，直接以 NumPy 视图交给 OCR，
+适用于由多个条带/JBIG2 切片拼成的扫描页或文字已转曲的页面
+"""
+
+import logging
+from typing import Dict, Tuple, Optional
+
+import fitz  # PyMuPDF
+import numpy as np
+import cv2
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class PageRenderer:
+    """页面光栅化器（同尺寸页面复用同一块像素缓冲区）"""
+    
+    COLORSPACES = {"gray": fitz.csGRAY, "rgb": fitz.csRGB}
+    
+    def __init__(self, dpi: float = 300.0, colorspace: str = "gray"):
+        """
+        初始化渲染器
+        
+        Args:
+            dpi: 渲染分辨率
+            colorspace: 'gray'（单通道，内存为 RGB 的 1/3）或 'rgb'
+        """
+        if colorspace not in self.COLORSPACES:
+            raise ValueError(f"不支持的颜色空间: {colorspace}（可选: {list(self.COLORSPACES)}）")
+        
+        self.dpi = dpi
+        self.colorspace = colorspace
+        self.zoom = dpi / 72.0
+        # 按像素尺寸缓存的 Pixmap 与 RGB 输出缓冲区
+        self._pixmaps: Dict[Tuple[int, int], fitz.Pixmap] = {}
+        self._rgb_buffers: Dict[Tuple[int, int], np.ndarray] = {}
+    
+    def _matrix(self, page: fitz.Page) -> Tuple[fitz.Matrix, fitz.IRect]:
+        """页面 → 像素的变换矩阵（平移到原点）及像素区域"""
+        matrix = fitz.Matrix(self.zoom, self.zoom)
+        rect = page.rect * matrix
+        matrix = matrix * fitz.Matrix(1, 0, 0, 1, -rect.x0, -rect.y0)
+        irect = (page.rect * matrix).irect
+        return matrix, irect
+    
+    def render(self, page: fitz.Page) -> np.ndarray:
+        """
+        渲染页面
+        
+        返回的数组是 Pixmap 缓冲区的零拷贝视图，下一次渲染同尺寸页面时会被覆盖，
+        需要保留时请自行复制
+        
+        Args:
+            page: PyMuPDF 页面
+        
+        Returns:
+            (H, W, n) uint8 数组，n 为 1（gray）或 3（rgb）
+        """
+        matrix, irect = self._matrix(page)
+        key = (irect.width, irect.height)
+        
+        pixmap = self._pixmaps.get(key)
+        if pixmap is None:
+            pixmap = fitz.Pixmap(self.COLORSPACES[self.colorspace], fitz.IRect(0, 0, *key), False)
+            self._pixmaps[key] = pixmap
+        pixmap.clear_with(255)
+        
+        device = fitz.Device(pixmap, None)
+        try:
+            page.run(device, matrix)
+        finally:
+            device.close()
+        
+        return np.frombuffer(pixmap.samples_mv, dtype=np.uint8).reshape(pixmap.h, pixmap.w, pixmap.n)
+    
+    def to_rgb(self, view: np.ndarray) -> np.ndarray:
+        """
+        转为 3 通道（检测/识别模型的输入格式），灰度图写入复用的输出缓冲区
+        
+        Args:
+            view: render 返回的数组
+        
+        Returns:
+            (H, W, 3) uint8 数组
+        """
+        if view.shape[2] == 3:
+            return view
+        
+        key = view.shape[:2]
+        buffer = self._rgb_buffers.get(key)
+        if buffer is None:
+            buffer = np.empty((*key, 3), dtype=np.uint8)
+            self._rgb_buffers[key] = buffer
+        cv2.cvtColor(view[:, :, 0], cv2.COLOR_GRAY2RGB, dst=buffer)
+        return buffer
+    
+    def page_box(self, box: np.ndarray, page: fitz.Page) -> np.ndarray:
+        """像素坐标框 → 页面坐标框（点）"""
+        return np.asarray(box, dtype=np.float32) / self.zoom + np.float32([page.rect.x0, page.rect.y0])
+    
+    def close(self):
+        """释放缓冲区"""
+        self._pixmaps.clear()
+        self._rgb_buffers.clear()
+
+
+def should_render(page: fitz.Page,
+                  min_image_pieces: int = 4,
+                  min_vector_paths: int = 50,
+                  min_text_chars: int = 20) -> Optional[str]:
+    """
+    判断页面是否应整页渲染后 OCR（自动模式）
+    
+    Args:
+        page: PyMuPDF 页面
+        min_image_pieces: 页面由不少于该数量的图片拼成时（条带、JBIG2 切片）整页渲染
+        min_vector_paths: 无图片但矢量路径不少于该数量时（文字转曲）整页渲染
+        min_text_chars: 文本层字符数达到该值视为已有文本层，不渲染
+    
+    Returns:
+        渲染原因（'pieces' / 'vector'），不需要渲染时返回 None
+    """
+    if len(page.get_text("text").strip()) >= min_text_chars:
+        return None
+    
+    num_images = len(page.get_image_info())
+    if num_images >= min_image_pieces:
+        return "pieces"
+    if num_images == 0 and len(page.get_cdrawings()) >= min_vector_paths:
+        return "vector"
+    return None
@@ -0,0 +1,373 @@
+"""
+二进制解析结果容器模块
+把 load()/parse() 的结果（文本块、表格、OCR 列式结果）一次顺序写入带版本号的单个文件，
+重新打开时内存映射，按页惰性解码，下游重新分块/建索引无需再次解析 PDF
+
+文件布局:
+    头部   : 魔数 b"PDFR" + 版本号 (uint32) + 保留 (uint64)
+    数据段 : 各数组按 64 字节对齐依次写入（文本块列、字符串表、表格、OCR 数组、全文）
+    目录   : UTF-8 JSON（各段偏移/类型/形状、页索引、元数据）
+    尾部   : 目录偏移 (uint64) + 魔数
+"""
+
+import io
+import json
+import mmap
+import struct
+import logging
+from pathlib import Path
+from typing import List, Dict, Tuple, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from layout_analyzer import TextBlock
+from ocr_result import OCRPageResult, to_text_results
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MAGIC = b"PDFR"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sIQ")
+_FOOTER = struct.Struct("<Q4s")
+_ALIGN = 64
+
+BLOCK_TYPES = ["title", "body", "header", "footer", "ocr"]
+OCR_FIELDS = ["boxes", "page_boxes", "confidences", "image_index", "line_order", "text_ids"]
+
+
+class _StringTable:
+    """去重字符串表（写入端）"""
+    
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.strings: List[str] = []
+    
+    def add(self, text: str) -> int:
+        string_id = self.ids.get(text)
+        if string_id is None:
+            string_id = len(self.strings)
+            self.ids[text] = string_id
+            self.strings.append(text)
+        return string_id
+
+
+class _SectionWriter:
+    """顺序写入对齐的数据段，记录目录项"""
+    
+    def __init__(self, f):
+        self.f = f
+        self.offset = _HEADER.size
+        self.sections: Dict[str, Dict] = {}
+    
+    def _pad(self):
+        padding = -self.offset % _ALIGN
+        if padding:
+            self.f.write(b"\0" * padding)
+            self.offset += padding
+    
+    def array(self, name: str, array: np.ndarray):
+        array = np.ascontiguousarray(array)
+        self._pad()
+        self.sections[name] = {"offset": self.offset, "dtype": array.dtype.str, "shape": list(array.shape)}
+        self.f.write(array.tobytes())
+        self.offset += array.nbytes
+    
+    def blob(self, name: str, data: bytes, **info):
+        self._pad()
+        self.sections[name] = dict(info, offset=self.offset, length=len(data))
+        self.f.write(data)
+        self.offset += len(data)
+
+
+def _table_blob(table: pd.DataFrame) -> Tuple[bytes, str]:
+    """
+    表格 → 字节（优先 Arrow IPC，未安装 pyarrow 时用 CSV）
+    
+    列名统一改为位置名写入（原列名可能重复或为 None），原列名另存于目录
+    """
+    frame = table.copy()
+    frame.columns = [f"c{i}" for i in range(frame.shape[1])]
+    frame = frame.astype("string")
+    
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return frame.to_csv(index=False).encode("utf-8"), "csv"
+    
+    arrow_table = pa.Table.from_pandas(frame, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, arrow_table.schema) as writer:
+        writer.write_table(arrow_table)
+    return sink.getvalue().to_pybytes(), "arrow"
+
+
+def write_result(result: Dict, path: str) -> str:
+    """
+    把解析结果写入二进制容器（单次顺序写入）
+    
+    Args:
+        result: AdvancedPDFLoader.parse() 的结果
+        path: 输出文件路径
+    
+    Returns:
+        输出文件路径
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    
+    strings = _StringTable()
+    blocks = sorted(result.get("layout", {}).get("blocks", []), key=lambda b: b.page)  # 稳定排序，页内保持阅读顺序
+    tables = result.get("tables", [])
+    ocr_pages: Dict[int, OCRPageResult] = result.get("ocr_pages", {})
+    
+    n = len(blocks)
+    block_pages = np.fromiter((b.page for b in blocks), dtype=np.int32, count=n)
+    block_bboxes = np.asarray([b.bbox for b in blocks], dtype=np.float32).reshape(n, 4)
+    block_types = np.fromiter((BLOCK_TYPES.index(b.block_type) if b.block_type in BLOCK_TYPES else 1
+                               for b in blocks), dtype=np.uint8, count=n)
+    block_columns = np.fromiter((b.column for b in blocks), dtype=np.int16, count=n)
+    block_font_sizes = np.fromiter((b.font_size for b in blocks), dtype=np.float32, count=n)
+    block_text_ids = np.fromiter((strings.add(b.text) for b in blocks), dtype=np.int32, count=n)
+    block_font_ids = np.fromiter((strings.add(b.font_name) for b in blocks), dtype=np.int32, count=n)
+    
+    # 页索引：每页文本块在数组中的 [起, 止)
+    pages = sorted(set(block_pages.tolist())
+                   | {t.attrs.get("page", 0) for t in tables}
+                   | set(ocr_pages))
+    page_index = {}
+    for page in pages:
+        start, end = np.searchsorted(block_pages, [page, page + 1])
+        page_index[str(page)] = [int(start), int(end)]
+    
+    with open(path, "wb", buffering=1024 * 1024) as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, 0))
+        writer = _SectionWriter(f)
+        
+        for name, array in (("blocks/page", block_pages), ("blocks/bbox", block_bboxes),
+                            ("blocks/type", block_types), ("blocks/column", block_columns),
+                            ("blocks/font_size", block_font_sizes), ("blocks/text_id", block_text_ids),
+                            ("blocks/font_id", block_font_ids)):
+            writer.array(name, array)
+        
+        table_entries = []
+        for i, table in enumerate(tables):
+            data, fmt = _table_blob(table)
+            writer.blob(f"tables/{i}", data, format=fmt)
+            attrs = {k: v for k, v in table.attrs.items() if k in ("page", "bbox", "accuracy")}
+            table_entries.append({
+                "section": f"tables/{i}",
+                "columns": [None if c is None else str(c) for c in table.columns],
+                "attrs": {k: (list(v) if isinstance(v, tuple) else v) for k, v in attrs.items()}
+            })
+        
+        ocr_entries = {}
+        for page, page_result in sorted(ocr_pages.items()):
+            # OCR 字符串并入全局字符串表
+            remap = np.fromiter((strings.add(s) for s in page_result.strings), dtype=np.int32,
+                                count=len(page_result.strings))
+            for field in OCR_FIELDS:
+                array = getattr(page_result, field)
+                if field == "text_ids":
+                    array = remap[array] if len(array) else array
+                writer.array(f"ocr/{page}/{field}", array)
+            ocr_entries[str(page)] = len(page_result)
+        
+        # 字符串表：UTF-8 连续存储 + 偏移数组
+        encoded = [s.encode("utf-8") for s in strings.strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        writer.array("strings/offsets", offsets)
+        writer.blob("strings/data", b"".join(encoded))
+        
+        # 全文原样保存（含 OCR 回退文本），读取端不必按块类型重建
+        writer.blob("text", result.get("text", "").encode("utf-8"))
+        
+        directory = {
+            "version": FORMAT_VERSION,
+            "metadata": result.get("metadata", {}),
+            "summary": result.get("layout", {}).get("summary", {}),
+            "block_types": BLOCK_TYPES,
+            "pages": pages,
+            "page_index": page_index,
+            "tables": table_entries,
+            "ocr": ocr_entries,
+            "sections": writer.sections
+        }
+        directory_offset = writer.offset
+        f.write(json.dumps(directory, ensure_ascii=False, default=str).encode("utf-8"))
+        f.write(_FOOTER.pack(directory_offset, MAGIC))
+    
+    logger.info(f"💾 解析结果已写入: {path}（{n} 个文本块，{len(tables)} 个表格，{len(ocr_pages)} 页 OCR）")
+    return str(path)
+
+
+class ResultReader:
+    """二进制结果容器读取端（内存映射，按页惰性解码）"""
+    
+    def __init__(self, path: str):
+        """
+        打开容器
+        
+        Args:
+            path: write_result 写出的文件
+        """
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        magic, version, _ = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"不是解析结果容器: {path}")
+        if version > FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"容器版本 {version} 高于支持的版本 {FORMAT_VERSION}: {path}")
+        
+        directory_offset, magic = _FOOTER.unpack_from(self._mm, len(self._mm) - _FOOTER.size)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"容器尾部损坏（可能未写完）: {path}")
+        self.directory = json.loads(self._mm[directory_offset:len(self._mm) - _FOOTER.size].decode("utf-8"))
+        
+        self.metadata: Dict = self.directory["metadata"]
+        self.pages: List[int] = self.directory["pages"]
+        self._sections = self.directory["sections"]
+        self._string_offsets = self._array("strings/offsets")
+        self._string_base = self._sections["strings/data"]["offset"]
+    
+    def _array(self, name: str) -> np.ndarray:
+        """数据段 → 零拷贝 NumPy 视图"""
+        info = self._sections[name]
+        dtype = np.dtype(info["dtype"])
+        count = int(np.prod(info["shape"])) if info["shape"] else 1
+        return np.frombuffer(self._mm, dtype=dtype, count=count, offset=info["offset"]).reshape(info["shape"])
+    
+    def string(self, string_id: int) -> str:
+        """按编号解码字符串表中的一项"""
+        start = self._string_base + int(self._string_offsets[string_id])
+        end = self._string_base + int(self._string_offsets[string_id + 1])
+        return self._mm[start:end].decode("utf-8")
+    
+    def blocks(self, page: Optional[int] = None) -> List[TextBlock]:
+        """
+        文本块（按阅读顺序）
+        
+        Args:
+            page: 页码，None 表示全部
+        
+        Returns:
+            TextBlock 列表
+        """
+        if page is None:
+            start, end = 0, self._sections["blocks/page"]["shape"][0]
+        else:
+            start, end = self.directory["page_index"].get(str(page), [0, 0])
+        if start == end:
+            return []
+        
+        pages = self._array("blocks/page")[start:end]
+        bboxes = self._array("blocks/bbox")[start:end]
+        types = self._array("blocks/type")[start:end]
+        columns = self._array("blocks/column")[start:end]
+        font_sizes = self._array("blocks/font_size")[start:end]
+        text_ids = self._array("blocks/text_id")[start:end]
+        font_ids = self._array("blocks/font_id")[start:end]
+        block_types = self.directory["block_types"]
+        
+        return [
+            TextBlock(text=self.string(text_ids[i]), bbox=tuple(float(v) for v in bboxes[i]),
+                      page=int(pages[i]), block_type=block_types[types[i]], column=int(columns[i]),
+                      font_size=float(font_sizes[i]), font_name=self.string(font_ids[i]))
+            for i in range(end - start)
+        ]
+    
+    def _table(self, entry: Dict) -> pd.DataFrame:
+        info = self._sections[entry["section"]]
+        data = self._mm[info["offset"]:info["offset"] + info["length"]]
+        if info["format"] == "arrow":
+            import pyarrow as pa
+            frame = pa.ipc.open_stream(data).read_all().to_pandas()
+        else:
+            frame = pd.read_csv(io.BytesIO(data), dtype="string", keep_default_na=False)
+        
+        frame.columns = entry["columns"]
+        for key, value in entry["attrs"].items():
+            frame.attrs[key] = tuple(value) if key == "bbox" else value
+        return frame
+    
+    def tables(self, page: Optional[int] = None) -> List[pd.DataFrame]:
+        """
+        表格（attrs 中恢复 page / bbox / accuracy）
+        
+        Args:
+            page: 页码，None 表示全部
+        """
+        return [self._table(entry) for entry in self.directory["tables"]
+                if page is None or entry["attrs"].get("page", 0) == page]
+    
+    def ocr_page(self, page: int) -> Optional[OCRPageResult]:
+        """单页 OCR 列式结果（字符串表为该页用到的字符串）"""
+        if str(page) not in self.directory["ocr"]:
+            return None
+        
+        arrays = {field: self._array(f"ocr/{page}/{field}") for field in OCR_FIELDS}
+        global_ids, text_ids = np.unique(arrays["text_ids"], return_inverse=True)
+        return OCRPageResult(page, arrays["boxes"], arrays["page_boxes"], arrays["confidences"],
+                             arrays["image_index"], arrays["line_order"],
+                             text_ids.astype(np.int32).reshape(-1),
+                             [self.string(i) for i in global_ids])
+    
+    def iter_pages(self) -> Iterator[Tuple[int, List[TextBlock], List[pd.DataFrame]]]:
+        """逐页产出 (页码, 文本块, 表格)，与 AdvancedPDFLoader 的页面流格式一致"""
+        tables_by_page: Dict[int, List[Dict]] = {}
+        for entry in self.directory["tables"]:
+            tables_by_page.setdefault(entry["attrs"].get("page", 0), []).append(entry)
+        
+        for page in self.pages:
+            yield page, self.blocks(page), [self._table(e) for e in tables_by_page.get(page, [])]
+    
+    def text(self) -> str:
+        """
+        parse() 结果中的全文
+        
+        未保存全文段的旧容器按 parse() 的规则重建：标题与正文块，没有时回退为 OCR 文本
+        """
+        info = self._sections.get("text")
+        if info is not None:
+            return self._mm[info["offset"]:info["offset"] + info["length"]].decode("utf-8")
+        
+        text = "\n\n".join(b.text for b in self.blocks() if b.block_type in ["title", "body"])
+        if not text.strip():
+            ocr_results = to_text_results({int(page): self.ocr_page(int(page)) for page in self.directory["ocr"]})
+            text = "\n".join(line for page in sorted(ocr_results) for line in ocr_results[page]) or text
+        return text
+    
+    def to_result(self) -> Dict:
+        """还原为 parse() 形状的结果字典"""
+        blocks = self.blocks()
+        ocr_pages = {int(page): self.ocr_page(int(page)) for page in self.directory["ocr"]}
+        return {
+            "text": self.text(),
+            "tables": self.tables(),
+            "ocr_results": to_text_results(ocr_pages),
+            "ocr_pages": ocr_pages,
+            "layout": {"blocks": blocks, "summary": self.directory["summary"]} if blocks else {},
+            "metadata": self.metadata
+        }
+    
+    def close(self):
+        """关闭内存映射（仍被外部持有的数组视图会阻止关闭，此时交由垃圾回收）"""
+        self._string_offsets = None
+        try:
+            self._mm.close()
+        except BufferError:
+            pass
+        self._file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
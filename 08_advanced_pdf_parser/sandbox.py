@@ -0,0 +1,424 @@
+"""
+文档隔离解析模块
+每个文档在常驻的工作子进程中解析（进程内只加载一次模型），子进程设置 CPU 时间与地址空间上限，
+父进程监控常驻内存并在超限、超时或崩溃时结束子进程；处理 N 个文档后回收子进程以控制泄漏，
+阶段超时被放弃（后台线程仍在运行）的子进程在返回结果后立即结束，
+反复导致崩溃的输入按内容摘要隔离，不再处理
+"""
+
+import os
+import time
+import queue
+import sqlite3
+import logging
+import threading
+import multiprocessing
+from pathlib import Path
+from typing import List, Dict, Optional, Any
+
+from ingest_ledger import file_digest
+from deadlines import abandoned_threads
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _set_cpu_limit(cpu_seconds: Optional[float]):
+    """在当前进程已用 CPU 时间基础上设置软上限（超出时内核发送 SIGXCPU 结束进程）"""
+    if cpu_seconds is None:
+        return
+    try:
+        import resource
+    except ImportError:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = int(usage.ru_utime + usage.ru_stime + cpu_seconds) + 1
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _worker_main(conn, loader_kwargs: Dict, address_space_mb: Optional[int], cpu_seconds: Optional[float]):
+    """
+    工作子进程主循环：加载一次解析器，之后逐个接收文档
+    
+    消息：父进程发送 (pdf_path, output_dir)，output_dir 为 None 时返回结果字典，否则写出容器并返回路径；
+    发送 None 表示退出。回复 (状态, 内容, 是否退出)：解析后进程中仍有被放弃的阶段线程时，
+    回复后立即退出，卡住的线程随进程一起结束，不会带到下一个文档
+    """
+    if address_space_mb is not None:
+        try:
+            import resource
+            limit = address_space_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError) as e:
+            logger.warning(f"⚠️ 无法设置地址空间上限: {e}")
+    
+    from advanced_loader import AdvancedPDFLoader
+    loader = AdvancedPDFLoader(**loader_kwargs)
+    conn.send(("ready", os.getpid()))
+    
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+        
+        pdf_path, output_dir = message
+        _set_cpu_limit(cpu_seconds)
+        try:
+            result = loader.parse(pdf_path)
+            if not result:
+                raise FileNotFoundError(pdf_path)
+            if output_dir is not None:
+                reply = ("ok", loader.save_result(result, output_dir))
+            else:
+                reply = ("ok", result)
+        except MemoryError:
+            # 地址空间上限触发：进程状态不可信，直接退出由父进程按崩溃处理
+            os._exit(70)
+        except Exception as e:
+            reply = ("error", f"{type(e).__name__}: {e}")
+        
+        retire = abandoned_threads() > 0
+        conn.send(reply + (retire,))
+        if retire:
+            conn.close()
+            os._exit(0)
+    
+    conn.close()
+
+
+def _rss_mb(pid: int) -> Optional[float]:
+    """子进程常驻内存（MB），无法读取时返回 None"""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss / (1024 * 1024)
+    except Exception:
+        return None
+
+
+class _Worker:
+    """一个工作子进程及其管道"""
+    
+    def __init__(self, ctx, loader_kwargs: Dict, address_space_mb: Optional[int],
+                 cpu_seconds: Optional[float], start_timeout: float):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, daemon=True,
+                                   args=(child_conn, loader_kwargs, address_space_mb, cpu_seconds))
+        self.process.start()
+        child_conn.close()
+        self.documents = 0
+        
+        # 等待模型加载完成
+        if not self.conn.poll(start_timeout):
+            self.kill()
+            raise RuntimeError(f"工作子进程 {start_timeout} 秒内未完成初始化")
+        try:
+            _, self.pid = self.conn.recv()
+        except EOFError:
+            self.kill()
+            raise RuntimeError(f"工作子进程初始化时退出（退出码 {self.process.exitcode}）")
+    
+    def stop(self, timeout: float = 10.0):
+        """正常退出"""
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.kill()
+        self.conn.close()
+    
+    def kill(self):
+        """强制结束"""
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class DocumentSandbox:
+    """隔离子进程解析池"""
+    
+    def __init__(self,
+                 loader_kwargs: Optional[Dict] = None,
+                 pool_size: int = 1,
+                 max_rss_mb: Optional[float] = 4096,
+                 address_space_mb: Optional[int] = None,
+                 cpu_seconds: Optional[float] = 600,
+                 timeout: Optional[float] = None,
+                 deadline_grace: float = 30.0,
+                 max_docs_per_worker: int = 50,
+                 quarantine_after: int = 2,
+                 quarantine_path: Optional[str] = None,
+                 start_timeout: float = 600.0,
+                 poll_interval: float = 0.5):
+        """
+        初始化隔离解析池（工作子进程在首次使用时启动）
+        
+        Args:
+            loader_kwargs: 工作子进程中构造 AdvancedPDFLoader 的参数
+            pool_size: 工作子进程数量（同时解析的文档数上限）
+            max_rss_mb: 单个子进程常驻内存上限（MB），由父进程监控，超出时结束子进程；None 表示不限
+            address_space_mb: 子进程地址空间上限（RLIMIT_AS，MB），超出时分配失败；
+                              深度学习推理框架会预留大量虚拟内存，默认不设置
+            cpu_seconds: 单个文档的 CPU 时间上限（RLIMIT_CPU，秒，含所有线程）；None 表示不限
+            timeout: 单个文档的墙钟时间上限（秒），超出时结束子进程；None 表示不限
+            deadline_grace: loader_kwargs 设置了 document_timeout 时，超过 document_timeout + deadline_grace
+                            仍未返回即结束子进程（阶段卡在不释放 GIL 的原生代码、线程时限无法生效时兜底）
+            max_docs_per_worker: 子进程处理该数量的文档后退出并重建（控制内存泄漏）
+            quarantine_after: 同一内容导致子进程崩溃（含超限、超时被结束）达到该次数后隔离
+            quarantine_path: 崩溃记录数据库路径（SQLite），None 表示只在本进程内记录
+            start_timeout: 子进程启动并加载模型的超时时间（秒）
+            poll_interval: 等待结果时检查子进程状态的间隔（秒）
+        """
+        self.loader_kwargs = dict(loader_kwargs or {})
+        self.pool_size = pool_size
+        self.max_rss_mb = max_rss_mb
+        self.address_space_mb = address_space_mb
+        self.cpu_seconds = cpu_seconds
+        self.timeout = timeout
+        document_timeout = self.loader_kwargs.get("document_timeout")
+        if document_timeout is not None:
+            backstop = document_timeout + deadline_grace
+            self.timeout = backstop if timeout is None else min(timeout, backstop)
+        self.max_docs_per_worker = max_docs_per_worker
+        self.quarantine_after = quarantine_after
+        self.start_timeout = start_timeout
+        self.poll_interval = poll_interval
+        
+        self.stats = {"documents": 0, "errors": 0, "crashes": 0, "recycled": 0, "retired": 0,
+                      "quarantined_skips": 0}
+        
+        # spawn：避免 fork 继承父进程中的推理线程状态
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle: "queue.Queue[Optional[_Worker]]" = queue.Queue()
+        for _ in range(pool_size):
+            self._idle.put(None)  # 空位，首次取用时启动子进程
+        
+        self._lock = threading.Lock()
+        if quarantine_path:
+            Path(quarantine_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(quarantine_path or ":memory:", check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sandbox_crashes ("
+            "  content_hash TEXT PRIMARY KEY,"
+            "  path TEXT NOT NULL,"
+            "  crashes INTEGER NOT NULL,"
+            "  last_reason TEXT,"
+            "  updated REAL NOT NULL"
+            ")"
+        )
+        self._conn.commit()
+    
+    def _crashes(self, content_hash: str) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT crashes FROM sandbox_crashes WHERE content_hash = ?", (content_hash,)
+            ).fetchone()
+        return row[0] if row else 0
+    
+    def _record_crash(self, content_hash: str, pdf_path: str, reason: str) -> int:
+        """记录一次崩溃，返回该内容累计崩溃次数"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sandbox_crashes (content_hash, path, crashes, last_reason, updated) "
+                "VALUES (?, ?, 1, ?, ?) ON CONFLICT(content_hash) DO UPDATE SET "
+                "crashes = crashes + 1, path = excluded.path, last_reason = excluded.last_reason, "
+                "updated = excluded.updated",
+                (content_hash, pdf_path, reason, time.time())
+            )
+            self._conn.commit()
+        return self._crashes(content_hash)
+    
+    def is_quarantined(self, pdf_path: str) -> bool:
+        """文件内容是否已被隔离"""
+        return self._crashes(file_digest(pdf_path)) >= self.quarantine_after
+    
+    def quarantined(self) -> List[Dict]:
+        """已隔离的输入 [{'content_hash', 'path', 'crashes', 'last_reason'}]"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT content_hash, path, crashes, last_reason FROM sandbox_crashes "
+                "WHERE crashes >= ? ORDER BY updated", (self.quarantine_after,)
+            ).fetchall()
+        return [{"content_hash": h, "path": p, "crashes": c, "last_reason": r} for h, p, c, r in rows]
+    
+    def release(self, pdf_path: str):
+        """解除隔离（如升级解析库后重新尝试）"""
+        content_hash = file_digest(pdf_path)
+        with self._lock:
+            self._conn.execute("DELETE FROM sandbox_crashes WHERE content_hash = ?", (content_hash,))
+            self._conn.commit()
+    
+    def _acquire(self) -> _Worker:
+        worker = self._idle.get()
+        if worker is not None and worker.process.is_alive():
+            return worker
+        try:
+            worker = _Worker(self._ctx, self.loader_kwargs, self.address_space_mb,
+                             self.cpu_seconds, self.start_timeout)
+        except Exception:
+            self._idle.put(None)
+            raise
+        logger.info(f"✅ 隔离工作子进程 {worker.pid} 已启动")
+        return worker
+    
+    def _release(self, worker: Optional[_Worker]):
+        if worker is not None and worker.documents >= self.max_docs_per_worker:
+            worker.stop()
+            with self._lock:
+                self.stats["recycled"] += 1
+            logger.info(f"♻️ 工作子进程 {worker.pid} 已处理 {worker.documents} 个文档，回收重建")
+            worker = None
+        self._idle.put(worker)
+    
+    def _wait(self, worker: _Worker) -> Any:
+        """
+        等待子进程返回结果，期间监控存活、常驻内存与墙钟时间
+        
+        Returns:
+            子进程的返回消息 (状态, 内容, 是否退出)；子进程被结束或崩溃时返回 (None, 原因, True)
+        """
+        start = time.monotonic()
+        peak_rss = 0.0
+        while True:
+            if worker.conn.poll(self.poll_interval):
+                peak_rss = max(peak_rss, _rss_mb(worker.pid) or 0.0)
+                try:
+                    return worker.conn.recv(), peak_rss
+                except EOFError:
+                    pass  # 子进程在发送前退出，按崩溃处理
+            
+            if not worker.process.is_alive():
+                worker.process.join()
+                code = worker.process.exitcode
+                reason = f"signal {-code}" if code is not None and code < 0 else f"exit code {code}"
+                if code == 70:
+                    reason = "MemoryError (address space limit)"
+                return (None, f"工作子进程异常退出: {reason}", True), peak_rss
+            
+            rss = _rss_mb(worker.pid)
+            if rss is not None:
+                peak_rss = max(peak_rss, rss)
+                if self.max_rss_mb is not None and rss > self.max_rss_mb:
+                    worker.kill()
+                    return (None, f"常驻内存 {rss:.0f} MB 超过上限 {self.max_rss_mb} MB", True), peak_rss
+            
+            if self.timeout is not None and time.monotonic() - start > self.timeout:
+                worker.kill()
+                return (None, f"超过时限 {self.timeout} 秒", True), peak_rss
+    
+    def _run(self, pdf_path: str, output_dir: Optional[str], content_hash: Optional[str] = None) -> Any:
+        if content_hash is None:
+            content_hash = file_digest(pdf_path)
+        if self._crashes(content_hash) >= self.quarantine_after:
+            with self._lock:
+                self.stats["quarantined_skips"] += 1
+            raise RuntimeError(f"输入已被隔离（多次导致工作子进程崩溃）: {pdf_path}")
+        
+        worker = self._acquire()
+        start = time.perf_counter()
+        try:
+            worker.conn.send((str(pdf_path), output_dir))
+            (status, payload, retire), peak_rss = self._wait(worker)
+        except BaseException:
+            worker.kill()
+            self._release(None)
+            raise
+        worker.documents += 1
+        with self._lock:
+            self.stats["documents"] += 1
+        
+        if status is None:
+            worker.kill()
+            self._release(None)
+            with self._lock:
+                self.stats["crashes"] += 1
+            crashes = self._record_crash(content_hash, str(pdf_path), payload)
+            if crashes >= self.quarantine_after:
+                logger.error(f"🚫 输入已隔离（第 {crashes} 次崩溃）: {pdf_path}: {payload}")
+            else:
+                logger.error(f"💥 {payload}: {pdf_path}（第 {crashes} 次崩溃）")
+            raise RuntimeError(f"{payload}: {pdf_path}")
+        
+        if retire:
+            # 子进程中有被放弃的阶段线程：子进程回复后自行退出，这里确认结束并在下次使用时重建
+            worker.kill()
+            self._release(None)
+            with self._lock:
+                self.stats["retired"] += 1
+            logger.warning(f"♻️ 工作子进程 {worker.pid} 有被放弃的阶段线程，已结束: {pdf_path}")
+        else:
+            self._release(worker)
+        if status == "error":
+            with self._lock:
+                self.stats["errors"] += 1
+            raise RuntimeError(payload)
+        
+        sandbox_info = {"pid": worker.pid, "seconds": round(time.perf_counter() - start, 3),
+                        "peak_rss_mb": round(peak_rss, 1)}
+        return payload, sandbox_info
+    
+    def parse(self, pdf_path: str, content_hash: Optional[str] = None) -> Dict:
+        """
+        在工作子进程中解析文档（结果序列化传回）
+        
+        Args:
+            pdf_path: PDF 文件路径
+            content_hash: 已计算的文件内容摘要（如入库账本 claim 返回的 content_hash），
+                          用于隔离记录；None 表示在此读取文件计算
+        
+        Returns:
+            parse() 形状的结果字典，metadata['sandbox'] 记录子进程号、耗时与峰值常驻内存
+        
+        Raises:
+            RuntimeError: 解析出错、子进程崩溃 / 超限 / 超时，或输入已被隔离
+        """
+        result, sandbox_info = self._run(pdf_path, None, content_hash)
+        result["metadata"]["sandbox"] = sandbox_info
+        return result
+    
+    def parse_to(self, pdf_path: str, output_dir: str, content_hash: Optional[str] = None) -> str:
+        """
+        在工作子进程中解析文档并直接写出二进制容器（结果不经过管道传递）
+        
+        Args:
+            pdf_path: PDF 文件路径
+            output_dir: 容器输出目录
+            content_hash: 同 parse
+        
+        Returns:
+            容器文件路径
+        
+        Raises:
+            RuntimeError: 同 parse
+        """
+        result_path, _ = self._run(pdf_path, str(output_dir), content_hash)
+        return result_path
+    
+    def close(self):
+        """结束所有工作子进程"""
+        for _ in range(self.pool_size):
+            worker = self._idle.get()
+            if worker is not None:
+                worker.stop()
+        with self._lock:
+            self._conn.close()
+            stats = dict(self.stats)
+        logger.info(f"✅ 隔离解析池已关闭: {stats}")
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,118 @@
+"""
+共享内存帧环形缓冲模块
+主进程把渲染页面/解码图片写入 multiprocessing.shared_memory 中的固定槽位，
+工作进程按槽位描述直接映射为 NumPy 数组（零拷贝），进程间只传递很小的描述信息
+"""
+
+import queue
+import logging
+from multiprocessing import shared_memory
+from typing import Dict, Optional
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 工作进程内已映射的共享内存块（按名称缓存，每块只映射一次）
+_attached: Dict[str, shared_memory.SharedMemory] = {}
+
+
+class SharedFrameRing:
+    """
+    共享内存环形缓冲（主进程侧）
+    
+    缓冲区划分为固定大小的槽位；写入前先申请空闲槽位，没有空闲槽位时阻塞（背压），
+    工作进程处理完成后由主进程归还槽位
+    """
+    
+    def __init__(self, slots: int = 8, slot_bytes: int = 64 * 1024 * 1024):
+        """
+        创建共享内存
+        
+        Args:
+            slots: 槽位数量（同时在途的帧数上限）
+            slot_bytes: 单个槽位字节数（需容纳一帧，如 A4 300 DPI RGB 约 26MB）
+        """
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self._shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        self._free: "queue.Queue[int]" = queue.Queue()
+        for slot in range(slots):
+            self._free.put(slot)
+        logger.info(f"✅ 共享内存帧缓冲已创建: {slots} × {slot_bytes // (1024 * 1024)}MB")
+    
+    @property
+    def name(self) -> str:
+        return self._shm.name
+    
+    def acquire(self, timeout: Optional[float] = None) -> int:
+        """
+        申请空闲槽位（无空闲槽位时阻塞）
+        
+        Args:
+            timeout: 最长等待时间（秒），None 表示一直等待
+        
+        Returns:
+            槽位编号
+        """
+        return self._free.get(timeout=timeout)
+    
+    def release(self, slot: int):
+        """归还槽位"""
+        self._free.put(slot)
+    
+    def write(self, slot: int, array: np.ndarray) -> Dict:
+        """
+        把数组写入槽位
+        
+        Args:
+            slot: acquire 得到的槽位编号
+            array: 帧数据
+        
+        Returns:
+            帧描述 {'name', 'offset', 'shape', 'dtype'}，可跨进程传递
+        """
+        if array.nbytes > self.slot_bytes:
+            raise ValueError(f"帧大小 {array.nbytes} 字节超过槽位容量 {self.slot_bytes} 字节")
+        
+        offset = slot * self.slot_bytes
+        target = np.ndarray(array.shape, dtype=array.dtype, buffer=self._shm.buf, offset=offset)
+        target[...] = array
+        del target  # 不保留对共享内存的引用，否则无法关闭
+        
+        return {
+            "name": self._shm.name,
+            "offset": offset,
+            "shape": tuple(array.shape),
+            "dtype": array.dtype.str
+        }
+    
+    def close(self):
+        """释放共享内存"""
+        self._shm.close()
+        self._shm.unlink()
+
+
+def attach_frame(frame: Dict) -> np.ndarray:
+    """
+    按帧描述映射共享内存中的数组（工作进程侧，零拷贝）
+    
+    返回的数组直接引用共享内存，槽位归还后内容可能被覆盖，不要在任务结束后继续持有
+    
+    Args:
+        frame: SharedFrameRing.write 返回的帧描述
+    
+    Returns:
+        NumPy 数组视图
+    """
+    shm = _attached.get(frame["name"])
+    if shm is None:
+        try:
+            # Python 3.13+：映射方不登记资源回收，共享内存由创建方负责释放
+            shm = shared_memory.SharedMemory(name=frame["name"], track=False)
+        except TypeError:
+            shm = shared_memory.SharedMemory(name=frame["name"])
+        _attached[frame["name"]] = shm
+    
+    return np.ndarray(frame["shape"], dtype=np.dtype(frame["dtype"]), buffer=shm.buf, offset=frame["offset"])
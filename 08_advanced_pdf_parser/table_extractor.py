@@ -6,9 +6,13 @@
 import pdfplumber
 import camelot
 import pandas as pd
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Callable
 from pathlib import Path
+from contextlib import nullcontext
 import logging
+import time
+
+from extraction_stats import ExtractionStatsStore, document_signature
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -17,43 +21,99 @@ logger = logging.getLogger(__name__)
 class TableExtractor:
     """PDF 表格提取器"""
     
-    def __init__(self):
-        """初始化表格提取器"""
+    # auto 模式下的默认执行顺序
+    AUTO_METHODS = ['pdfplumber', 'camelot_lattice', 'camelot_stream']
+    
+    def __init__(self, stats_path: Optional[str] = None, exploration_rate: float = 0.1):
+        """
+        初始化表格提取器
+        
+        Args:
+            stats_path: 提取统计文件路径（None 表示不启用自适应选择）
+            exploration_rate: 自适应模式下的探索率
+        """
         self.extraction_methods = ['pdfplumber', 'camelot']
+        self.stats_store = None
+        
+        if stats_path:
+            self.stats_store = ExtractionStatsStore(stats_path, exploration_rate=exploration_rate)
     
-    def extract_with_pdfplumber(self, pdf_path: str, page_num: Optional[int] = None) -> List[pd.DataFrame]:
+    def extract_with_pdfplumber(self, 
+                                pdf_path: str, 
+                                page_num: Optional[int] = None,
+                                page_callback: Optional[Callable] = None,
+                                pdf=None) -> List[pd.DataFrame]:
         """
         使用 pdfplumber 提取表格（适合简单表格）
         
+        每页解析出的字符、线条对象会在表格查找后交给 page_callback 复用
+        （如版面分析提取词/行），随后立即释放该页缓存，内存占用只与单页相关；
+        表格查找与回调按页捕获异常，某页失败时记录日志并继续处理后续页
+        
         Args:
             pdf_path: PDF 文件路径
             page_num: 指定页码（None 表示所有页）
+            page_callback: 每页回调 callback(page)，在页面缓存释放前调用
+            pdf: 已打开的 pdfplumber PDF 对象（None 表示按 pdf_path 打开；传入时由调用方负责关闭）
             
         Returns:
-            提取的表格列表（DataFrame 格式）
+            提取的表格列表（DataFrame 格式，attrs 中记录 page 与 bbox）
         """
         tables = []
         
         try:
-            with pdfplumber.open(pdf_path) as pdf:
+            with (nullcontext(pdf) if pdf is not None else pdfplumber.open(pdf_path)) as pdf:
                 pages = [pdf.pages[page_num]] if page_num is not None else pdf.pages
                 
                 for page in pages:
-                    # 提取当前页的所有表格
-                    page_tables = page.extract_tables()
+                    try:
+                        # 提取当前页的所有表格（单页失败不影响其他页）
+                        try:
+                            tables.extend(self.extract_tables_from_plumber_page(page))
+                        except Exception as e:
+                            logger.error(f"❌ 第 {page.page_number} 页 pdfplumber 表格提取失败: {e}")
+                        
+                        # 复用同一页已解析的对象
+                        if page_callback is not None:
+                            try:
+                                page_callback(page)
+                            except Exception as e:
+                                logger.error(f"❌ 第 {page.page_number} 页回调失败: {e}")
                     
-                    for table in page_tables:
-                        if table and len(table) > 0:
-                            # 转换为 DataFrame
-                            df = pd.DataFrame(table[1:], columns=table[0])
-                            tables.append(df)
-                            logger.info(f"✅ 从第 {page.page_number} 页提取表格，大小: {df.shape}")
+                    finally:
+                        # 释放该页解析缓存，避免所有页对象存活到 with 块结束
+                        page.close()
         
         except Exception as e:
             logger.error(f"❌ pdfplumber 提取失败: {e}")
         
         return tables
     
+    def extract_tables_from_plumber_page(self, page) -> List[pd.DataFrame]:
+        """
+        从已打开的 pdfplumber 页面提取表格
+        
+        Args:
+            page: pdfplumber Page 对象
+            
+        Returns:
+            该页的表格列表（DataFrame 格式，attrs 中记录 page 与 bbox）
+        """
+        tables = []
+        
+        for found in page.find_tables():
+            table = found.extract()
+            
+            if table and len(table) > 0:
+                # 转换为 DataFrame
+                df = pd.DataFrame(table[1:], columns=table[0])
+                df.attrs['page'] = page.page_number
+                df.attrs['bbox'] = tuple(found.bbox)
+                tables.append(df)
+                logger.info(f"✅ 从第 {page.page_number} 页提取表格，大小: {df.shape}")
+        
+        return tables
+    
     def extract_with_camelot(self, pdf_path: str, pages: str = 'all', flavor: str = 'lattice') -> List[pd.DataFrame]:
         """
         使用 camelot 提取表格（适合复杂表格）
@@ -81,6 +141,9 @@ class TableExtractor:
                 df = df.replace('', pd.NA).dropna(how='all').dropna(axis=1, how='all')
                 
                 if not df.empty:
+                    # 记录准确率，供自适应统计使用
+                    df.attrs['accuracy'] = table.accuracy
+                    df.attrs['page'] = int(table.page)
                     tables.append(df)
                     logger.info(f"✅ camelot 提取表格 {i+1}，大小: {df.shape}，准确率: {table.accuracy:.2f}%")
         
@@ -89,13 +152,20 @@ class TableExtractor:
         
         return tables
     
-    def extract_all(self, pdf_path: str, prefer_method: str = 'auto') -> Dict[str, List[pd.DataFrame]]:
+    def extract_all(self, 
+                    pdf_path: str, 
+                    prefer_method: str = 'auto',
+                    page_callback: Optional[Callable] = None) -> Dict[str, List[pd.DataFrame]]:
         """
         综合提取：尝试多种方法并返回最佳结果
         
         Args:
             pdf_path: PDF 文件路径
             prefer_method: 优先方法（'auto', 'pdfplumber', 'camelot'）
+                   auto 模式下若启用了统计（stats_path），将按该来源历史上
+                   最优的方法优先执行，跳过从未产出表格的方法，并在首个成功的方法后停止
+                   （探索模式仍运行全部方法）
+            page_callback: 透传给 pdfplumber 的每页回调（仅在运行 pdfplumber 时调用）
             
         Returns:
             字典：{'method': [tables]}
@@ -104,29 +174,58 @@ class TableExtractor:
         
         logger.info(f"📄 开始提取 PDF 表格: {pdf_path}")
         
-        # 方法 1: pdfplumber（快速，适合简单表格）
-        if prefer_method in ['auto', 'pdfplumber']:
-            pdfplumber_tables = self.extract_with_pdfplumber(pdf_path)
-            if pdfplumber_tables:
-                results['pdfplumber'] = pdfplumber_tables
+        if prefer_method == 'auto':
+            methods = list(self.AUTO_METHODS)
+        elif prefer_method == 'camelot':
+            methods = ['camelot_lattice', 'camelot_stream']
+        else:
+            methods = [prefer_method]
         
-        # 方法 2: camelot-lattice（适合有边框的复杂表格）
-        if prefer_method in ['auto', 'camelot']:
+        # 来源签名与 pdfplumber 方法共用同一次打开的文档
+        adaptive = prefer_method == 'auto' and self.stats_store is not None
+        pdf = None
+        if adaptive or 'pdfplumber' in methods:
             try:
-                camelot_lattice = self.extract_with_camelot(pdf_path, flavor='lattice')
-                if camelot_lattice:
-                    results['camelot_lattice'] = camelot_lattice
+                pdf = pdfplumber.open(pdf_path)
             except Exception as e:
-                logger.warning(f"⚠️ camelot-lattice 失败，尝试 stream 模式: {e}")
+                logger.error(f"❌ pdfplumber 打开失败: {e}")
         
-        # 方法 3: camelot-stream（适合无边框的表格）
-        if prefer_method in ['auto', 'camelot'] and 'camelot_lattice' not in results:
-            try:
-                camelot_stream = self.extract_with_camelot(pdf_path, flavor='stream')
-                if camelot_stream:
-                    results['camelot_stream'] = camelot_stream
-            except Exception as e:
-                logger.warning(f"⚠️ camelot-stream 失败: {e}")
+        try:
+            # 自适应：按该来源的历史表现排序并跳过从未胜出的方法
+            source_key = None
+            ranked = False
+            if adaptive:
+                source_key = document_signature(pdf) if pdf is not None else "unknown"
+                explore = self.stats_store.explore()
+                methods = self.stats_store.plan(source_key, methods, explore=explore)
+                ranked = not explore
+                logger.info(f"🧭 来源 [{source_key}] 执行顺序: {methods}")
+            
+            for method in methods:
+                # 按历史排序执行时，排名最高的成功方法即为结果，不再运行其余方法
+                if ranked and results:
+                    break
+                # camelot 两种模式互为备选：一种已成功则跳过另一种
+                if method.startswith('camelot') and any(m.startswith('camelot') for m in results):
+                    continue
+                
+                start = time.perf_counter()
+                tables = self._run_method(method, pdf_path, page_callback, pdf=pdf)
+                elapsed = time.perf_counter() - start
+                
+                if tables:
+                    results[method] = tables
+                
+                if source_key is not None:
+                    accuracies = [df.attrs['accuracy'] for df in tables if 'accuracy' in df.attrs]
+                    self.stats_store.record(source_key, method, len(tables), elapsed, accuracies)
+        
+        finally:
+            if pdf is not None:
+                pdf.close()
+        
+        if source_key is not None:
+            self.stats_store.save()
         
         # 汇总结果
         total_tables = sum(len(tables) for tables in results.values())
@@ -134,6 +233,39 @@ class TableExtractor:
         
         return results
     
+    def _run_method(self, 
+                    method: str, 
+                    pdf_path: str, 
+                    page_callback: Optional[Callable] = None,
+                    pdf=None) -> List[pd.DataFrame]:
+        """
+        执行单个提取方法
+        
+        Args:
+            method: 方法名（'pdfplumber', 'camelot_lattice', 'camelot_stream'）
+            pdf_path: PDF 文件路径
+            page_callback: pdfplumber 每页回调
+            pdf: 已打开的 pdfplumber PDF 对象（仅 pdfplumber 方法使用）
+            
+        Returns:
+            提取的表格列表
+        """
+        # 方法 1: pdfplumber（快速，适合简单表格）
+        if method == 'pdfplumber':
+            return self.extract_with_pdfplumber(pdf_path, page_callback=page_callback, pdf=pdf)
+        
+        # 方法 2/3: camelot-lattice（有边框）/ camelot-stream（无边框）
+        if method in ['camelot_lattice', 'camelot_stream']:
+            flavor = method.split('_', 1)[1]
+            try:
+                return self.extract_with_camelot(pdf_path, flavor=flavor)
+            except Exception as e:
+                logger.warning(f"⚠️ camelot-{flavor} 失败: {e}")
+                return []
+        
+        logger.warning(f"⚠️ 未知的提取方法: {method}")
+        return []
+    
     def save_tables(self, tables: List[pd.DataFrame], output_dir: str, prefix: str = "table") -> List[str]:
         """
         保存提取的表格为 CSV 或 Excel 文件
@@ -0,0 +1,6 @@
+"""测试配置：模块按平铺方式互相导入（from chunker import ...），把包目录加入导入路径"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,68 @@
+"""BM25 索引测试：varint 编解码、倒排表还原、追加段与检索"""
+
+import numpy as np
+import pytest
+
+from bm25_index import BM25Index, BM25IndexWriter, tokenize, varint_decode, varint_encode
+
+
+def chunk(text, chunk_id):
+    return {"text": text, "metadata": {"chunk_id": chunk_id}}
+
+
+def test_tokenize_cjk_bigrams_and_words():
+    assert tokenize("合同条款 Payment-Terms 2024") == ["合同", "同条", "条款", "payment", "terms", "2024"]
+    assert tokenize("甲") == ["甲"]
+
+
+@pytest.mark.parametrize("values", [
+    [],
+    [0],
+    [127, 128, 16383, 16384],
+    [0, 1, (1 << 21) - 1, 1 << 21, (1 << 35) - 1],
+])
+def test_varint_round_trip(values):
+    encoded = varint_encode(np.asarray(values, dtype=np.int64))
+    np.testing.assert_array_equal(varint_decode(encoded), values)
+
+
+def test_varint_byte_lengths():
+    assert len(varint_encode(np.array([127]))) == 1
+    assert len(varint_encode(np.array([128]))) == 2
+    assert varint_encode(np.array([300])) == bytes([0xAC, 0x02])
+
+
+def test_postings_round_trip(tmp_path):
+    texts = ["付款 付款 期限", "违约 责任", "付款 方式", "保密 义务 付款"]
+    writer = BM25IndexWriter(str(tmp_path), max_buffer_docs=100, tokenizer=str.split)
+    writer.add_all(chunk(text, i) for i, text in enumerate(texts))
+    
+    index = BM25Index(str(tmp_path), tokenizer=str.split)
+    segment = index.segments[0]
+    doc_ids, tfs = segment.postings_of("付款")
+    np.testing.assert_array_equal(doc_ids, [0, 2, 3])
+    np.testing.assert_array_equal(tfs, [2, 1, 1])
+    assert segment.doc_freq("违约") == 1
+    assert len(segment.postings_of("不存在")[0]) == 0
+    assert segment.document(1) == chunk("违约 责任", 1)
+    index.close()
+
+
+def test_appended_segments_visible_after_refresh(tmp_path):
+    writer = BM25IndexWriter(str(tmp_path), max_buffer_docs=2)
+    list(writer.tee(chunk(text, i) for i, text in enumerate(["合同生效日期", "服务费用支付", "争议解决方式"])))
+    
+    index = BM25Index(str(tmp_path))
+    assert [s.name for s in index.segments] == ["seg_000000", "seg_000001"]
+    assert index.num_docs == 3
+    
+    results = index.search("费用支付", top_k=2)
+    assert results[0]["metadata"]["chunk_id"] == 1
+    assert results[0]["score"] > 0
+    
+    BM25IndexWriter(str(tmp_path)).add_all([chunk("费用支付方式与期限", 3)])
+    assert index.num_docs == 3
+    index.refresh()
+    assert index.num_docs == 4
+    assert {r["metadata"]["chunk_id"] for r in index.search("费用支付")} == {1, 3}
+    index.close()
@@ -0,0 +1,99 @@
+"""StructuredChunker 测试：块大小上限、整句回带重叠、标题分节与表格切分"""
+
+import pandas as pd
+import pytest
+
+from chunker import StructuredChunker
+from layout_analyzer import TextBlock
+
+
+def block(text, page=1, block_type="body"):
+    return TextBlock(text=text, bbox=(0.0, 0.0, 100.0, 20.0), page=page,
+                     block_type=block_type, column=0, font_size=10.0, font_name="")
+
+
+SENTENCES = [f"第{i}条规定了合同履行中的第{i}项义务。" for i in range(1, 13)]
+
+
+def test_invalid_overlap_rejected():
+    with pytest.raises(ValueError):
+        StructuredChunker(chunk_size=100, chunk_overlap=100)
+    with pytest.raises(ValueError):
+        StructuredChunker(chunk_size=100, chunk_overlap=-1)
+
+
+def test_chunks_respect_size_and_overlap_whole_sentences():
+    chunker = StructuredChunker(chunk_size=60, chunk_overlap=25)
+    chunks = list(chunker.chunk([block("".join(SENTENCES))], source="a.pdf"))
+    
+    assert len(chunks) > 2
+    for chunk in chunks:
+        assert len(chunk["text"]) <= 60
+        assert chunk["metadata"]["source"] == "a.pdf"
+    
+    for prev, curr in zip(chunks, chunks[1:]):
+        # 相邻块共享的是上一块末尾的整句，且不超过重叠上限
+        shared = prev["metadata"]["end_char"] - curr["metadata"]["start_char"]
+        assert 0 < shared <= 25
+        overlap = curr["text"][:shared]
+        assert prev["text"].endswith(overlap)
+        assert overlap.endswith("。")
+    
+    assert chunks[-1]["text"].endswith(SENTENCES[-1])
+    assert [c["metadata"]["chunk_id"] for c in chunks] == list(range(len(chunks)))
+
+
+def test_zero_overlap_chunks_are_disjoint():
+    chunker = StructuredChunker(chunk_size=60, chunk_overlap=0)
+    chunks = list(chunker.chunk([block("".join(SENTENCES))]))
+    
+    for prev, curr in zip(chunks, chunks[1:]):
+        assert curr["metadata"]["start_char"] >= prev["metadata"]["end_char"]
+    assert "".join(c["text"] for c in chunks) == "".join(SENTENCES)
+
+
+def test_section_title_starts_new_chunk_without_overlap():
+    chunker = StructuredChunker(chunk_size=120, chunk_overlap=50)
+    elements = [block("".join(SENTENCES[:4])), block("第二章 付款", block_type="title"),
+                block("".join(SENTENCES[4:6]))]
+    chunks = list(chunker.chunk(elements))
+    
+    # 当前块已过半时遇到标题即分节，新节不回带上一节的句子
+    assert len(chunks) == 2
+    assert chunks[1]["text"].startswith("第二章 付款")
+    assert chunks[1]["metadata"]["block_types"] == ["title", "body"]
+
+
+def test_long_table_split_repeats_header():
+    table = pd.DataFrame({"项目": [f"条目{i}" for i in range(30)], "金额": [str(i * 100) for i in range(30)]})
+    table.attrs.update(page=2, bbox=(0.0, 0.0, 300.0, 400.0))
+    chunker = StructuredChunker(chunk_size=80, chunk_overlap=0)
+    chunks = list(chunker.chunk([table]))
+    
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunk["text"].startswith("项目 | 金额")
+        assert chunk["metadata"]["pages"] == [2]
+        assert chunk["metadata"]["block_types"] == ["table"]
+
+
+@pytest.mark.parametrize("chunk_size", [40, 60, 97])
+def test_table_long_row_split_within_size(chunk_size):
+    table = pd.DataFrame({"编号": ["1", "2"], "说明": ["很长的条款说明" * 30, "短"]})
+    chunker = StructuredChunker(chunk_size=chunk_size, chunk_overlap=0)
+    chunks = list(chunker.chunk([table]))
+    
+    assert len(chunks) > 2
+    for chunk in chunks:
+        assert len(chunk["text"]) <= chunk_size
+        assert chunk["text"].startswith("编号 | 说明\n")
+    assert "".join(c["text"].split("\n", 1)[1] for c in chunks).replace("\n", "").count("很长的条款说明") == 30
+
+
+def test_table_header_wider_than_chunk_is_not_repeated():
+    table = pd.DataFrame({"列" * 30: ["甲" * 50, "乙"]})
+    chunker = StructuredChunker(chunk_size=20, chunk_overlap=0)
+    chunks = list(chunker.chunk([table]))
+    
+    assert all(len(chunk["text"]) <= 20 for chunk in chunks)
+    assert "".join(chunk["text"] for chunk in chunks).replace("\n", "") == "列" * 30 + "甲" * 50 + "乙"
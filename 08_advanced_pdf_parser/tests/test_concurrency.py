@@ -0,0 +1,98 @@
+"""自适应并发测试：AIMD 调整、阶段固定上限，以及被放弃的阶段在线程结束前占用闸门名额"""
+
+import threading
+import time
+
+import pytest
+
+from concurrency import ConcurrencyController
+from deadlines import StageDeadlines
+
+
+class FixedSampler:
+    def __init__(self, cpu=0.1, memory=0.1):
+        self.cpu_value, self.memory_value = cpu, memory
+    
+    def cpu(self):
+        return self.cpu_value
+    
+    def memory(self):
+        return self.memory_value
+
+
+def waiting(gate):
+    """在后台线程中排队等待闸门，返回 (线程, 释放事件)"""
+    release = threading.Event()
+    
+    def run():
+        with gate:
+            release.wait(5)
+    
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread, release
+
+
+def settle(predicate):
+    for _ in range(200):
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_increase_respects_stage_cap_and_decrease_halves():
+    controller = ConcurrencyController(max_workers=4, initial_workers=4, stage_caps={"ocr": 1},
+                                       sampler=FixedSampler())
+    assert controller.limits() == {"documents": 4, "tables": 4, "ocr": 1}
+    
+    ocr = controller.stages["ocr"]
+    threads = [waiting(ocr) for _ in range(2)]
+    assert settle(lambda: ocr.waiting == 1)
+    controller.step()
+    assert controller.limits()["ocr"] == 1
+    
+    controller.sampler.memory_value = 0.95
+    decision = controller.step()
+    assert decision["action"] == "decrease"
+    assert controller.limits() == {"documents": 2, "tables": 2, "ocr": 1}
+    
+    for thread, release in threads:
+        release.set()
+        thread.join()
+
+
+def test_cap_stage_shrinks_existing_gate_and_rejects_unknown():
+    controller = ConcurrencyController(max_workers=3, initial_workers=3, sampler=FixedSampler())
+    controller.cap_stage("ocr", 1)
+    assert controller.limits()["ocr"] == 1
+    with pytest.raises(ValueError):
+        controller.cap_stage("layout", 1)
+
+
+def test_abandoned_stage_keeps_gate_until_thread_ends():
+    controller = ConcurrencyController(max_workers=2, initial_workers=2, stage_caps={"ocr": 1},
+                                       sampler=FixedSampler())
+    release = threading.Event()
+    deadlines = StageDeadlines(stage_timeouts={"ocr": 0.05})
+    
+    assert deadlines.run("ocr", release.wait, 5, hold=controller.stage("ocr")) is None
+    assert deadlines.abandoned == ["ocr"]
+    assert controller.stages["ocr"].active == 1
+    
+    release.set()
+    assert settle(lambda: controller.stages["ocr"].active == 0)
+
+
+def test_map_runs_every_item_and_reports_errors():
+    controller = ConcurrencyController(max_workers=2, interval=0.01, sampler=FixedSampler())
+    
+    def work(item):
+        if item == 3:
+            raise RuntimeError("boom")
+        return item * 2
+    
+    outcomes = {item: (value, error) for item, value, error in controller.map(work, range(5))}
+    assert {item: value for item, (value, _) in outcomes.items() if item != 3} == {0: 0, 1: 2, 2: 4, 4: 8}
+    assert isinstance(outcomes[3][1], RuntimeError)
+    assert controller.queues()["documents"] == 0
@@ -0,0 +1,60 @@
+"""解析时限测试：超时放弃、被放弃线程的登记与注销、文档时限用尽后跳过阶段"""
+
+import threading
+import time
+
+import pytest
+
+from deadlines import StageDeadlines, abandoned_threads
+
+
+def test_no_limits_runs_inline():
+    deadlines = StageDeadlines()
+    assert not deadlines.enabled
+    assert deadlines.run("tables", lambda: threading.current_thread()) is threading.current_thread()
+    assert deadlines.report()["partial"] is False
+
+
+def test_stage_timeout_abandons_and_unregisters_when_thread_ends():
+    release = threading.Event()
+    deadlines = StageDeadlines(stage_timeouts={"tables": 0.05})
+    before = abandoned_threads()
+    
+    assert deadlines.run("tables", release.wait, 5) is None
+    report = deadlines.report()
+    assert report["partial"] is True
+    assert report["timed_out"] == ["tables"]
+    assert report["abandoned"] == ["tables"]
+    assert abandoned_threads() == before + 1
+    
+    release.set()
+    for _ in range(100):
+        if abandoned_threads() == before:
+            break
+        time.sleep(0.01)
+    assert abandoned_threads() == before
+
+
+def test_stage_error_propagates_within_budget():
+    deadlines = StageDeadlines(stage_timeouts={"ocr": 5})
+    
+    def fail():
+        raise RuntimeError("boom")
+    
+    with pytest.raises(RuntimeError):
+        deadlines.run("ocr", fail)
+    assert deadlines.report()["abandoned"] == []
+
+
+def test_document_budget_exhausted_skips_stage():
+    deadlines = StageDeadlines(document_timeout=0.0)
+    called = []
+    assert deadlines.run("layout", called.append, 1) is None
+    assert called == []
+    assert deadlines.timed_out == ["layout"]
+    assert deadlines.abandoned == []
+
+
+def test_unknown_stage_rejected():
+    with pytest.raises(ValueError):
+        StageDeadlines(stage_timeouts={"render": 1})
@@ -0,0 +1,102 @@
+"""ChunkDeduplicator 测试：文档内折叠、流式反向引用、持久索引的文档键"""
+
+from dedup import ChunkDeduplicator
+
+BASE = "本合同自双方签字盖章之日起生效，有效期三年，期满前三十日内任何一方未提出异议的，自动续期一年。"
+OTHER = "甲方应于每季度结束后十五个工作日内向乙方支付服务费用，逾期按日万分之五计收违约金。"
+
+
+def make_chunks(texts, source="contract.pdf"):
+    return [{"text": text, "metadata": {"chunk_id": i, "pages": [i + 1], "source": source}}
+            for i, text in enumerate(texts)]
+
+
+def test_duplicates_folded_into_kept_chunk():
+    dedup = ChunkDeduplicator()
+    kept = list(dedup.dedup(make_chunks([BASE, OTHER, BASE + " "])))
+    
+    assert [c["metadata"]["chunk_id"] for c in kept] == [0, 1]
+    assert kept[0]["metadata"]["duplicates"] == [{"chunk_id": 2, "pages": [3], "similarity": 1.0}]
+    assert dedup.last_stats["duplicates"] == 1
+    assert dedup.last_stats["embeddings_avoided"] == 1
+
+
+def test_back_references_visible_when_streaming():
+    dedup = ChunkDeduplicator()
+    stream = dedup.dedup(make_chunks([BASE, OTHER, BASE]))
+    
+    # 消费第一个块时，文档末尾的重复块已经记录在它的 metadata 中
+    first = next(stream)
+    assert first["metadata"]["duplicates"][0]["chunk_id"] == 2
+    assert [c["metadata"]["chunk_id"] for c in stream] == [1]
+
+
+def test_empty_chunks_keep_order():
+    dedup = ChunkDeduplicator()
+    kept = list(dedup.dedup(make_chunks([BASE, "  ", OTHER])))
+    assert [c["metadata"]["chunk_id"] for c in kept] == [0, 1, 2]
+
+
+def test_persistent_index_keys_on_full_path(tmp_path):
+    index = tmp_path / "dedup.db"
+    dedup = ChunkDeduplicator(index_path=str(index))
+    
+    # 不同目录下的同名文件：第二个文件中与第一个重复的块应被识别为跨批次重复
+    list(dedup.dedup(make_chunks([BASE]), source="/data/a/contract.pdf"))
+    kept = list(dedup.dedup(make_chunks([OTHER, BASE]), source="/data/b/contract.pdf"))
+    assert [c["text"] for c in kept] == [OTHER]
+    assert kept[0]["metadata"].get("duplicate_of") is None
+    assert dedup.last_stats["cross_batch_duplicates"] == 1
+    
+    # 重新入库第一个文件只替换它自己的记录，不删除另一个同名文件的签名
+    list(dedup.dedup(make_chunks([BASE]), source="/data/a/contract.pdf"))
+    kept = list(dedup.dedup(make_chunks([OTHER]), source="/data/c/contract.pdf"))
+    assert kept == []
+    assert dedup.last_stats["cross_batch_duplicates"] == 1
+    dedup.close()
+
+
+def test_reingest_same_source_is_not_self_duplicate(tmp_path):
+    dedup = ChunkDeduplicator(index_path=str(tmp_path / "dedup.db"))
+    list(dedup.dedup(make_chunks([BASE, OTHER]), source="/data/a/contract.pdf"))
+    kept = list(dedup.dedup(make_chunks([BASE, OTHER]), source="/data/a/contract.pdf"))
+    assert len(kept) == 2
+    dedup.close()
+
+
+def test_dependants_repointed_when_canonical_reingested(tmp_path):
+    dedup = ChunkDeduplicator(index_path=str(tmp_path / "dedup.db"))
+    list(dedup.dedup(make_chunks([BASE]), source="/data/a.pdf"))
+    assert list(dedup.dedup(make_chunks([BASE]), source="/data/b.pdf")) == []
+    
+    # 新版本仍包含该块：依赖它的重复记录指向新的规范块，不重新收录
+    kept = list(dedup.dedup(make_chunks([OTHER, BASE]), source="/data/a.pdf"))
+    assert [c["text"] for c in kept] == [OTHER, BASE]
+    assert dedup.last_stats["readmitted"] == 0
+    assert dedup.remove("/data/c.pdf") == []
+    dedup.close()
+
+
+def test_dependants_readmitted_when_canonical_disappears(tmp_path):
+    index = tmp_path / "dedup.db"
+    dedup = ChunkDeduplicator(index_path=str(index))
+    list(dedup.dedup(make_chunks([BASE, OTHER]), source="/data/a.pdf"))
+    assert list(dedup.dedup(make_chunks([BASE], source="b.pdf"), source="/data/b.pdf")) == []
+    assert list(dedup.dedup(make_chunks([OTHER], source="c.pdf"), source="/data/c.pdf")) == []
+    
+    # 重新入库的新版本不再包含 BASE：b.pdf 中被折叠的块随本文档的分块之后重新产出
+    kept = list(dedup.dedup(make_chunks([OTHER]), source="/data/a.pdf"))
+    assert [c["text"] for c in kept] == [OTHER, BASE]
+    readmitted = kept[1]["metadata"]
+    assert readmitted["source"] == "b.pdf" and readmitted["readmitted"] is True
+    assert "duplicate_of" not in readmitted
+    assert dedup.last_stats["readmitted"] == 1
+    dedup.close()
+    
+    # 下线 a.pdf：c.pdf 的块重新收录，之后 BASE 与 OTHER 仍能被识别为跨批次重复
+    dedup = ChunkDeduplicator(index_path=str(index))
+    readmitted = dedup.remove("/data/a.pdf")
+    assert [c["text"] for c in readmitted] == [OTHER]
+    assert readmitted[0]["metadata"]["source"] == "c.pdf"
+    assert list(dedup.dedup(make_chunks([BASE, OTHER]), source="/data/d.pdf")) == []
+    dedup.close()
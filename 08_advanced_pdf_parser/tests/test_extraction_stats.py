@@ -0,0 +1,36 @@
+"""表格提取统计测试：准确率参与得分排序、基于已打开文档的来源签名"""
+
+import fitz
+import pdfplumber
+
+from extraction_stats import ExtractionStatsStore, document_signature
+
+
+def test_low_accuracy_wins_rank_below_accurate_method(tmp_path):
+    store = ExtractionStatsStore(str(tmp_path / "stats.json"), exploration_rate=0.0)
+    for _ in range(5):
+        store.record("src", "camelot_stream", 1, 0.5, [40.0])
+        store.record("src", "camelot_lattice", 1, 0.5, [95.0])
+        store.record("src", "pdfplumber", 1, 0.5)
+    
+    assert store.score("src", "camelot_lattice") > store.score("src", "camelot_stream")
+    # 没有准确率记录的方法不受影响
+    assert store.score("src", "pdfplumber") > store.score("src", "camelot_lattice")
+    assert store.plan("src", ["camelot_stream", "camelot_lattice", "pdfplumber"], explore=False) == [
+        "pdfplumber", "camelot_lattice", "camelot_stream"]
+
+
+def test_document_signature_uses_open_document(tmp_path):
+    path = tmp_path / "doc.pdf"
+    document = fitz.open()
+    document.new_page(width=595, height=842).insert_text((72, 72), "Quarterly report")
+    document.set_metadata({"producer": "UnitTest", "creator": "Writer"})
+    document.save(str(path))
+    document.close()
+    
+    with pdfplumber.open(str(path)) as pdf:
+        signature = document_signature(pdf)
+        # 签名计算不关闭文档，调用方可继续使用
+        assert pdf.pages[0].extract_text().strip() == "Quarterly report"
+    
+    assert signature.startswith("UnitTest|Writer|595x842|")
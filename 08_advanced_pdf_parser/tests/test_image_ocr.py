@@ -0,0 +1,125 @@
+"""图片 OCR 测试（桩后端）：逐页处理、候选页、文本层覆盖检查与同一文档内的跨页复用"""
+
+import cv2
+import fitz
+import numpy as np
+import pytest
+
+from image_ocr import ImageOCR
+from ocr_backends import OCRBackend, StubOCRBackend
+
+
+def scan_png(seed: int) -> bytes:
+    """白底深色横条纹的"扫描件"，桩后端会把每条横条识别为一行"""
+    image = np.full((300, 400, 3), 255, dtype=np.uint8)
+    for k in range(3):
+        top = 40 + 80 * k
+        image[top:top + 20, 30:370 - 40 * ((seed + k) % 3)] = 0
+    ok, encoded = cv2.imencode(".png", image)
+    assert ok
+    return encoded.tobytes()
+
+
+@pytest.fixture
+def mixed_pdf(tmp_path):
+    """第 1、3 页为文本，第 2 页为扫描图片，第 4 页重复第 2 页的图片"""
+    path = tmp_path / "mixed.pdf"
+    document = fitz.open()
+    scan = scan_png(0)
+    for page_num in range(1, 5):
+        page = document.new_page(width=595, height=842)
+        if page_num in (2, 4):
+            page.insert_image(fitz.Rect(50, 100, 450, 400), stream=scan)
+        else:
+            page.insert_text((72, 72), f"Text layer page {page_num}")
+    document.save(str(path))
+    document.close()
+    return str(path)
+
+
+@pytest.fixture
+def ocr():
+    engine = ImageOCR(backend="stub", pipeline_depth=0)
+    yield engine
+    engine.close()
+
+
+def test_candidate_pages_only_pages_with_images(ocr, mixed_pdf):
+    assert ocr.ocr_candidate_pages(mixed_pdf) == {2, 4}
+
+
+def test_pages_filter_limits_processing(ocr, mixed_pdf):
+    assert ocr.process_pdf_structured(mixed_pdf, pages={1}) == {}
+    
+    results = ocr.process_pdf_structured(mixed_pdf, pages={2})
+    assert list(results) == [2]
+    assert len(results[2]) > 0
+
+
+def test_text_layer_coverage_skips_covered_image(ocr, mixed_pdf):
+    covered = {2: [(40.0, 90.0, 460.0, 410.0)]}
+    assert ocr.process_pdf_structured(mixed_pdf, pages={2}, text_boxes=covered) == {}
+
+
+def test_memo_reuses_repeated_image_across_page_calls(ocr, mixed_pdf):
+    memo = {}
+    first = ocr.process_pdf_structured(mixed_pdf, pages={2}, memo=memo)
+    assert ocr.last_run_stats["cache_hits"] == 0
+    assert len(memo) == 1
+    
+    second = ocr.process_pdf_structured(mixed_pdf, pages={4}, memo=memo)
+    assert ocr.last_run_stats["cache_hits"] == 1
+    assert second[4].texts() == first[2].texts()
+
+
+class FlakyBackend(StubOCRBackend):
+    """前几次调用失败的桩后端（模拟模型服务的瞬时错误）"""
+    
+    def __init__(self, failures: int = 1):
+        super().__init__()
+        self.failures = failures
+    
+    def _maybe_fail(self):
+        if self.failures > 0:
+            self.failures -= 1
+            raise RuntimeError("transient backend error")
+    
+    def ocr(self, image, cls=True):
+        self._maybe_fail()
+        return super().ocr(image, cls)
+    
+    def recognize_batch(self, crops):
+        self._maybe_fail()
+        return super().recognize_batch(crops)
+
+
+@pytest.mark.parametrize("pipeline_depth, batch_size", [(0, None), (0, 8), (2, None), (2, 8)])
+def test_failed_recognition_is_reported_and_not_cached(tmp_path, mixed_pdf, pipeline_depth, batch_size):
+    backend = FlakyBackend()
+    ocr = ImageOCR(backend=backend, cache_path=str(tmp_path / "ocr.db"), pipeline_depth=pipeline_depth)
+    try:
+        memo = {}
+        failed = ocr.process_pdf_structured(mixed_pdf, pages={2}, batch_size=batch_size, memo=memo)
+        assert failed[2].failed
+        assert len(failed[2]) == 0
+        assert memo == {}
+        
+        retried = ocr.process_pdf_structured(mixed_pdf, pages={2}, batch_size=batch_size, memo=memo)
+        assert ocr.last_run_stats["cache_hits"] == 0
+        assert not retried[2].failed
+        assert len(retried[2]) > 0
+        
+        cached = ocr.process_pdf_structured(mixed_pdf, pages={2}, batch_size=batch_size)
+        assert ocr.last_run_stats["cache_hits"] == 1
+        assert cached[2].texts() == retried[2].texts()
+    finally:
+        ocr.close()
+
+
+def test_backend_without_recognize_batch_cannot_be_instantiated():
+    class DetectOnly(OCRBackend):
+        def detect(self, image):
+            return []
+    
+    with pytest.raises(TypeError):
+        DetectOnly()
@@ -0,0 +1,184 @@
+"""入库账本测试：跳过、内容去重、退避重试、中断恢复，以及与 JSONL 导出器配合的断点续跑"""
+
+import json
+import os
+
+import pytest
+
+import ingest_ledger
+from ingest_ledger import IngestLedger, discover_inputs
+from jsonl_export import ShardedJSONLWriter, read_shard
+
+
+@pytest.fixture
+def files(tmp_path):
+    data = tmp_path / "data"
+    (data / "sub").mkdir(parents=True)
+    paths = {}
+    for name, content in (("a.pdf", b"%PDF-a"), ("sub/b.pdf", b"%PDF-b"), ("copy.pdf", b"%PDF-a")):
+        path = data / name
+        path.write_bytes(content)
+        paths[name] = str(path.resolve())
+    return paths
+
+
+def exported(output_dir):
+    manifest = json.loads((output_dir / "manifest.json").read_text(encoding="utf-8"))
+    records = [r for shard in manifest["shards"] for r in read_shard(str(output_dir / shard["path"]))]
+    return manifest, records
+
+
+def test_discover_inputs_directory_and_list(tmp_path, files):
+    assert discover_inputs(str(tmp_path / "data")) == sorted(files.values())
+    
+    listing = tmp_path / "data" / "inputs.txt"
+    listing.write_text("# 待入库\nsub/b.pdf\n\na.pdf\nsub/b.pdf\n", encoding="utf-8")
+    assert discover_inputs(str(listing)) == [files["sub/b.pdf"], files["a.pdf"]]
+
+
+def test_done_and_duplicate_files_are_skipped(tmp_path, files):
+    ledger = IngestLedger(str(tmp_path / "ledger.db"))
+    
+    assert ledger.claim(files["a.pdf"])["action"] == "process"
+    ledger.complete(files["a.pdf"], output="out/a.pdfr", records=3)
+    assert ledger.claim(files["a.pdf"])["action"] == "done"
+    
+    duplicate = ledger.claim(files["copy.pdf"])
+    assert duplicate["action"] == "duplicate"
+    assert duplicate["duplicate_of"] == files["a.pdf"]
+    assert duplicate["output"] == "out/a.pdfr"
+    
+    # 内容变化后重新处理
+    with open(files["a.pdf"], "ab") as f:
+        f.write(b" v2")
+    claim = ledger.claim(files["a.pdf"])
+    assert (claim["action"], claim["attempt"]) == ("process", 1)
+    
+    summary = ledger.summary()
+    assert (summary["running"], summary["duplicate"]) == (1, 1)
+    ledger.close()
+
+
+def test_running_file_with_same_content_is_duplicate(tmp_path, files):
+    ledger = IngestLedger(str(tmp_path / "ledger.db"))
+    assert ledger.claim(files["a.pdf"])["action"] == "process"
+    
+    # 相同内容的文件仍在处理中：记为重复，不再解析第二遍
+    duplicate = ledger.claim(files["copy.pdf"])
+    assert (duplicate["action"], duplicate["duplicate_of"]) == ("duplicate", files["a.pdf"])
+    assert duplicate["output"] is None
+    
+    # 原文件完成后补记输出位置
+    ledger.complete(files["a.pdf"], output="out/a.pdfr", records=3)
+    assert ledger.claim(files["copy.pdf"])["output"] == "out/a.pdfr"
+    ledger.close()
+
+
+def test_duplicate_reprocessed_when_original_fails(tmp_path, files):
+    ledger = IngestLedger(str(tmp_path / "ledger.db"))
+    ledger.claim(files["a.pdf"])
+    assert ledger.claim(files["copy.pdf"])["action"] == "duplicate"
+    
+    ledger.fail(files["a.pdf"], "ValueError: bad xref")
+    assert ledger.claim(files["copy.pdf"])["action"] == "process"
+    ledger.close()
+
+
+def test_digest_computed_outside_ledger_lock(tmp_path, files, monkeypatch):
+    ledger = IngestLedger(str(tmp_path / "ledger.db"))
+    digest = ingest_ledger.file_digest
+    
+    def unlocked_digest(path):
+        assert not ledger._lock.locked()
+        return digest(path)
+    
+    monkeypatch.setattr(ingest_ledger, "file_digest", unlocked_digest)
+    assert ledger.claim(files["a.pdf"])["action"] == "process"
+    ledger.close()
+
+
+def test_failures_back_off_and_exhaust(tmp_path, files):
+    ledger = IngestLedger(str(tmp_path / "ledger.db"), max_attempts=2, backoff_base=3600)
+    path = files["sub/b.pdf"]
+    
+    ledger.claim(path)
+    retry_at = ledger.fail(path, "ValueError: bad xref")
+    assert retry_at is not None
+    assert ledger.claim(path)["action"] == "deferred"
+    assert ledger.next_retry([path]) == pytest.approx(retry_at)
+    
+    ledger.backoff_base = 0
+    ledger._conn.execute("UPDATE ingest_files SET next_attempt = 0")
+    assert ledger.claim(path)["attempt"] == 2
+    assert ledger.fail(path, "ValueError: bad xref") is None
+    assert ledger.claim(path)["action"] == "exhausted"
+    assert ledger.failures()[0]["attempts"] == 2
+    ledger.close()
+
+
+def test_running_files_requeued_after_restart(tmp_path, files):
+    ledger_path = str(tmp_path / "ledger.db")
+    ledger = IngestLedger(ledger_path)
+    ledger.claim(files["a.pdf"])
+    ledger.close()
+    
+    ledger = IngestLedger(ledger_path)
+    assert ledger.failures() == [{"path": files["a.pdf"], "attempts": 1,
+                                  "last_error": "interrupted", "next_attempt": 0}]
+    assert ledger.claim(files["a.pdf"])["attempt"] == 2
+    ledger.close()
+
+
+def test_writer_resumes_existing_manifest(tmp_path):
+    output_dir = tmp_path / "export"
+    with ShardedJSONLWriter(str(output_dir)) as writer:
+        writer.write({"a": 1})
+    with ShardedJSONLWriter(str(output_dir)) as writer:
+        writer.write({"b": 2})
+    
+    manifest, records = exported(output_dir)
+    assert records == [{"a": 1}, {"b": 2}]
+    assert [s["path"] for s in manifest["shards"]] == ["part-00000.jsonl", "part-00001.jsonl"]
+    assert manifest["total_records"] == 2
+    assert manifest["complete"] is True
+    
+    with pytest.raises(ValueError):
+        ShardedJSONLWriter(str(output_dir), compression="gzip")
+
+
+def test_interrupted_export_resumes_without_losing_records(tmp_path, files):
+    output_dir = tmp_path / "export"
+    ledger_path = str(tmp_path / "ledger.db")
+    a, b = files["a.pdf"], files["sub/b.pdf"]
+    
+    def ingest(ledger, writer, path, record):
+        if ledger.claim(path)["action"] != "process":
+            return False
+        writer.write_all([record], committed=lambda count: ledger.complete(path, str(output_dir), count))
+        return True
+    
+    # 第一次运行：a 的分片已写完，b 的记录还在未写完的分片中时进程被终止
+    ledger = IngestLedger(ledger_path)
+    writer = ShardedJSONLWriter(str(output_dir))
+    assert ingest(ledger, writer, a, {"source": "a", "page": 1})
+    writer.flush()
+    assert ingest(ledger, writer, b, {"source": "b", "page": 1})
+    assert ledger.summary()["done"] == 1  # b 尚未落盘，不能标记完成
+    writer._raw.close()
+    ledger.close()
+    assert os.path.exists(output_dir / "part-00001.jsonl.tmp")
+    
+    # 第二次运行：a 跳过，b 重新处理，续写的分片接着编号
+    ledger = IngestLedger(ledger_path)
+    with ShardedJSONLWriter(str(output_dir)) as writer:
+        assert not ingest(ledger, writer, a, {"source": "a", "page": 1})
+        assert ingest(ledger, writer, b, {"source": "b", "page": 1})
+    
+    manifest, records = exported(output_dir)
+    assert records == [{"source": "a", "page": 1}, {"source": "b", "page": 1}]
+    assert manifest["total_records"] == 2
+    assert not os.path.exists(output_dir / "part-00001.jsonl.tmp")
+    
+    summary = ledger.summary()
+    assert (summary["done"], summary["records"]) == (2, 2)
+    ledger.close()
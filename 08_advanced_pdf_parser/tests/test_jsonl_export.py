@@ -0,0 +1,92 @@
+"""JSONL 分片导出测试：按记录数 / 字节数轮转、压缩、清单与逐页记录"""
+
+import json
+
+import pandas as pd
+import pytest
+
+from jsonl_export import ShardedJSONLWriter, page_records, read_shard
+from layout_analyzer import TextBlock
+
+
+def manifest_of(output_dir):
+    return json.loads((output_dir / "manifest.json").read_text(encoding="utf-8"))
+
+
+def test_rotates_by_record_count(tmp_path):
+    with ShardedJSONLWriter(str(tmp_path), max_shard_records=3) as writer:
+        assert writer.write_all({"id": i} for i in range(7)) == 7
+    
+    manifest = manifest_of(tmp_path)
+    assert [s["records"] for s in manifest["shards"]] == [3, 3, 1]
+    assert manifest["total_records"] == 7
+    assert manifest["complete"] is True
+    records = [r for s in manifest["shards"] for r in read_shard(str(tmp_path / s["path"]))]
+    assert records == [{"id": i} for i in range(7)]
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_rotates_by_uncompressed_bytes(tmp_path):
+    record = {"text": "x" * 100}
+    line_bytes = len(json.dumps(record)) + 1
+    with ShardedJSONLWriter(str(tmp_path), max_shard_bytes=line_bytes * 2) as writer:
+        writer.write_all([record] * 5)
+    
+    shards = manifest_of(tmp_path)["shards"]
+    assert [s["records"] for s in shards] == [2, 2, 1]
+    assert all(s["bytes"] == s["records"] * line_bytes for s in shards)
+
+
+def test_manifest_lists_only_finished_shards(tmp_path):
+    writer = ShardedJSONLWriter(str(tmp_path), max_shard_records=2)
+    writer.write_all({"id": i} for i in range(3))
+    
+    manifest = manifest_of(tmp_path)
+    assert manifest["complete"] is False
+    assert [s["path"] for s in manifest["shards"]] == ["part-00000.jsonl"]
+    assert (tmp_path / "part-00001.jsonl.tmp").exists()
+    
+    writer.close()
+    assert manifest_of(tmp_path)["total_records"] == 3
+
+
+@pytest.mark.parametrize("compression,suffix", [("gzip", ".gz"), ("zstd", ".zst")])
+def test_compressed_shards_round_trip(tmp_path, compression, suffix):
+    if compression == "zstd":
+        pytest.importorskip("zstandard")
+    records = [{"id": i, "text": "合同条款" * 20} for i in range(50)]
+    with ShardedJSONLWriter(str(tmp_path), max_shard_records=20, compression=compression) as writer:
+        writer.write_all(records)
+    
+    shards = manifest_of(tmp_path)["shards"]
+    assert all(s["path"].endswith(".jsonl" + suffix) for s in shards)
+    assert all(s["file_bytes"] < s["bytes"] for s in shards)
+    assert [r for s in shards for r in read_shard(str(tmp_path / s["path"]))] == records
+
+
+def test_unknown_compression_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        ShardedJSONLWriter(str(tmp_path), compression="lz4")
+
+
+def test_page_records():
+    table = pd.DataFrame([["A", None]], columns=["项目", None])
+    table.attrs.update(page=2, bbox=(0.0, 0.0, 10.0, 10.0))
+    result = {
+        "metadata": {"file_name": "contract.pdf"},
+        "layout": {"blocks": [
+            TextBlock("标题", (0, 0, 1, 1), 1, "title", 0, 16.0, ""),
+            TextBlock("正文", (0, 0, 1, 1), 1, "body", 0, 10.0, ""),
+            TextBlock("页脚", (0, 0, 1, 1), 1, "footer", 0, 8.0, ""),
+        ]},
+        "tables": [table],
+        "ocr_results": {3: ["扫描行"]}
+    }
+    
+    assert list(page_records(result)) == [
+        {"source": "contract.pdf", "page": 1, "text": "标题\n\n正文", "tables": [], "ocr_lines": []},
+        {"source": "contract.pdf", "page": 2, "text": "",
+         "tables": [{"columns": ["项目", ""], "rows": [["A", ""]], "bbox": [0.0, 0.0, 10.0, 10.0]}],
+         "ocr_lines": []},
+        {"source": "contract.pdf", "page": 3, "text": "", "tables": [], "ocr_lines": ["扫描行"]},
+    ]
@@ -0,0 +1,94 @@
+"""二进制结果容器测试：文本块、表格、OCR 列式结果与全文的往返"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from layout_analyzer import TextBlock
+from ocr_result import OCRPageResult
+from result_store import ResultReader, write_result
+
+
+def box(x, y):
+    return np.array([[x, y], [x + 50, y], [x + 50, y + 10], [x, y + 10]], dtype=np.float32)
+
+
+def ocr_page(page, lines):
+    return OCRPageResult.from_lines(page, [(0, box(0, 12 * i), box(0, 12 * i) / 2, text, 0.9)
+                                           for i, text in enumerate(lines)])
+
+
+def test_layout_and_tables_round_trip(tmp_path):
+    blocks = [
+        TextBlock("服务协议", (50.0, 40.0, 200.0, 60.0), 1, "title", 0, 18.0, "SimHei"),
+        TextBlock("第一条 服务内容", (50.0, 80.0, 500.0, 120.0), 1, "body", 0, 10.5, "SimSun"),
+        TextBlock("第 2 页", (280.0, 800.0, 320.0, 815.0), 2, "footer", 0, 8.0, "SimSun"),
+    ]
+    table = pd.DataFrame([["A", "100"], ["B", None]], columns=["项目", "金额"])
+    table.attrs.update(page=2, bbox=(50.0, 100.0, 400.0, 300.0), accuracy=97.5)
+    result = {
+        "text": "服务协议\n\n第一条 服务内容",
+        "tables": [table],
+        "layout": {"blocks": blocks, "summary": {"total_blocks": 3}},
+        "metadata": {"file_name": "contract.pdf", "file_path": "/data/contract.pdf"}
+    }
+    
+    path = write_result(result, str(tmp_path / "contract.pdfr"))
+    with ResultReader(path) as reader:
+        assert reader.pages == [1, 2]
+        assert reader.blocks(2) == blocks[2:]
+        restored = reader.to_result()
+    
+    assert restored["text"] == result["text"]
+    assert restored["layout"]["blocks"] == blocks
+    assert restored["layout"]["summary"] == {"total_blocks": 3}
+    assert restored["metadata"] == result["metadata"]
+    
+    restored_table = restored["tables"][0]
+    assert list(restored_table.columns) == ["项目", "金额"]
+    assert restored_table.iloc[0].tolist() == ["A", "100"]
+    assert restored_table.attrs == {"page": 2, "bbox": (50.0, 100.0, 400.0, 300.0), "accuracy": 97.5}
+
+
+def test_ocr_only_result_round_trip(tmp_path):
+    pages = {1: ocr_page(1, ["扫描件第一行", "扫描件第二行"]), 3: ocr_page(3, ["签字页", "扫描件第一行"])}
+    result = {
+        "text": "扫描件第一行\n扫描件第二行\n签字页\n扫描件第一行",
+        "tables": [],
+        "ocr_results": {1: ["扫描件第一行", "扫描件第二行"], 3: ["签字页", "扫描件第一行"]},
+        "ocr_pages": pages,
+        "metadata": {"file_name": "scan.pdf"}
+    }
+    
+    path = write_result(result, str(tmp_path / "scan.pdfr"))
+    with ResultReader(path) as reader:
+        restored = reader.to_result()
+        page = reader.ocr_page(3)
+        assert reader.ocr_page(2) is None
+        
+        assert restored["text"] == result["text"]
+        assert restored["layout"] == {}
+        assert restored["ocr_results"] == result["ocr_results"]
+        assert page.texts() == ["签字页", "扫描件第一行"]
+        np.testing.assert_array_equal(page.boxes, pages[3].boxes)
+        np.testing.assert_array_equal(page.page_boxes, pages[3].page_boxes)
+        np.testing.assert_allclose(page.confidences, pages[3].confidences)
+
+
+def test_container_without_text_section_falls_back_to_ocr(tmp_path):
+    result = {"text": "", "ocr_pages": {1: ocr_page(1, ["第一行", "第二行"])}, "metadata": {}}
+    path = write_result(result, str(tmp_path / "old.pdfr"))
+    
+    with ResultReader(path) as reader:
+        del reader._sections["text"]  # 模拟加入全文段之前写出的容器
+        assert reader.text() == "第一行\n第二行"
+
+
+def test_rejects_truncated_container(tmp_path):
+    path = write_result({"text": "x", "metadata": {}}, str(tmp_path / "x.pdfr"))
+    data = open(path, "rb").read()
+    truncated = tmp_path / "truncated.pdfr"
+    truncated.write_bytes(data[:-4])
+    
+    with pytest.raises(ValueError):
+        ResultReader(str(truncated))
@@ -0,0 +1,117 @@
+"""
+文字可能性预筛模块
+在缩略图上用边缘密度、连通域统计、颜色直方图快速估计图片包含文字的可能性，
+照片、无标注图表、背景纹理等可在 OCR 前跳过
+"""
+
+import logging
+from typing import Dict
+
+import numpy as np
+import cv2
+from PIL import Image
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class TextLikelihoodScorer:
+    """图片文字可能性打分器（0 ~ 1，越大越可能包含文字）"""
+    
+    def __init__(self, thumbnail_size: int = 256):
+        """
+        初始化打分器
+        
+        Args:
+            thumbnail_size: 缩略图长边（像素），所有特征都在缩略图上计算
+        """
+        self.thumbnail_size = thumbnail_size
+    
+    def _thumbnail(self, image: Image.Image) -> np.ndarray:
+        """生成灰度缩略图（JPEG 通过 draft 在解码阶段直接降采样）"""
+        image.draft("L", (self.thumbnail_size, self.thumbnail_size))
+        image = image.convert("L")
+        image.thumbnail((self.thumbnail_size, self.thumbnail_size))
+        return np.asarray(image)
+    
+    @staticmethod
+    def _edge_score(gray: np.ndarray) -> float:
+        """边缘密度：文字区域有大量短而密集的强边缘，照片边缘平缓、纹理边缘弱"""
+        gx = cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=3)
+        gy = cv2.Sobel(gray, cv2.CV_32F, 0, 1, ksize=3)
+        magnitude = cv2.magnitude(gx, gy)
+        density = float((magnitude > 200).mean())
+        # 文字图片强边缘密度通常在 5% ~ 30%，过低为平滑图，过高为噪声纹理
+        if density < 0.02 or density > 0.5:
+            return 0.0
+        return min(density / 0.08, 1.0)
+    
+    @staticmethod
+    def _component_score(gray: np.ndarray) -> float:
+        """连通域统计：文字二值化后是大量高度相近的小连通域"""
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        # 保证前景为深色文字
+        if binary.mean() < 127:
+            binary = 255 - binary
+        num, _, stats, _ = cv2.connectedComponentsWithStats(255 - binary, connectivity=8)
+        if num <= 1:
+            return 0.0
+        
+        heights = stats[1:, cv2.CC_STAT_HEIGHT]
+        widths = stats[1:, cv2.CC_STAT_WIDTH]
+        height_limit = max(3, gray.shape[0] * 0.15)
+        
+        # 字符状连通域：尺寸小、宽高比适中
+        glyph_like = (heights >= 2) & (heights <= height_limit) & (widths <= height_limit * 3)
+        num_glyphs = int(glyph_like.sum())
+        if num_glyphs < 10:
+            return 0.0
+        
+        # 字符高度越集中越像文字（变异系数小）
+        glyph_heights = heights[glyph_like].astype(np.float32)
+        uniformity = 1.0 - min(float(glyph_heights.std() / (glyph_heights.mean() + 1e-6)), 1.0)
+        return min(num_glyphs / 60.0, 1.0) * (0.5 + 0.5 * uniformity)
+    
+    @staticmethod
+    def _histogram_score(gray: np.ndarray) -> float:
+        """颜色直方图：文字图片以少数几个灰度级（背景 + 前景）为主，照片分布分散"""
+        hist = np.bincount((gray >> 4).ravel(), minlength=16).astype(np.float32)
+        hist /= hist.sum()
+        top_two = float(np.sort(hist)[-2:].sum())
+        return float(np.clip((top_two - 0.4) / 0.4, 0.0, 1.0))
+    
+    def features(self, image: Image.Image) -> Dict[str, float]:
+        """
+        计算各项特征得分
+        
+        Args:
+            image: PIL Image 对象
+        
+        Returns:
+            {'edge': ..., 'components': ..., 'histogram': ...}
+        """
+        gray = self._thumbnail(image)
+        return {
+            "edge": self._edge_score(gray),
+            "components": self._component_score(gray),
+            "histogram": self._histogram_score(gray)
+        }
+    
+    def score(self, image: Image.Image) -> float:
+        """
+        综合文字可能性得分
+        
+        Args:
+            image: PIL Image 对象
+        
+        Returns:
+            0 ~ 1 的得分
+        """
+        try:
+            f = self.features(image)
+        except Exception as e:
+            # 无法判断时按"可能有文字"处理，不影响 OCR
+            logger.warning(f"⚠️ 文字可能性评估失败: {e}")
+            return 1.0
+        
+        return 0.3 * f["edge"] + 0.5 * f["components"] + 0.2 * f["histogram"]